@@ -2,8 +2,15 @@ from fastapi import APIRouter, HTTPException, Depends
 from fastapi.responses import StreamingResponse
 import asyncio
 import json
+from app.core.json_codec import ndjson_line
 from app.schemas.agent import ChatRequest, AgentResponse, ReviewRequest, ReviewResponse
+from app.core.http_client import model_http_clients
 from app.services.agent_workflow import llm_service
+from app.services.conversion_executor import conversion_executor
+from app.services.format_converter import delta_markdown_cache
+from app.services.speculation import speculation
+from app.services import quality_gate
+from app.services.single_flight import normalize_text, request_key, single_flight
 # [新增] 导入我们刚才测试通过的联网搜索工具
 from app.services.tools.web_search import perform_web_search
 from app.services.tools.rag_retriever import retrieve_resume_examples
@@ -23,9 +30,9 @@ async def ai_review_process(
         print(f"用户: {current_user.email}")
         
         # 调用 Service
-        # 注意：如果 process_review_request 是异步函数，记得加 await
-        # 这里保持你原有的同步调用写法，如果报错 'coroutine object'，请改为 await llm_service...
-        result = await llm_service.process_review_request(request.resume_content)
+        # 同一用户相同内容的诊断进行中时 (重复点击、前端重试)，直接等待同一次调用的结果
+        key = request_key("review", current_user.id, normalize_text(request.resume_content))
+        result = await single_flight.do(key, lambda: llm_service.process_review_request(request.resume_content))
         
         print("诊断完成:", result)
         
@@ -63,7 +70,10 @@ async def execute_agent_workflow(
             "retry_count": 0,
             "is_pass": True,
             "evaluation_feedback": "",
-            "block_size": request.block_size
+            "block_size": request.block_size,
+            "incremental": request.incremental,
+            "delta_format": request.delta_format,
+            "user_id": current_user.id
         }
         
         # 生成临时的 thread_id
@@ -72,35 +82,49 @@ async def execute_agent_workflow(
         
         print(f"--- [LangGraph] Start Workflow for: {request.prompt[:20]}... (Thread: {thread_id}) ---")
 
+        # 相同请求 (同一用户、指令、上下文、历史与输出参数) 进行中时合并：重复请求订阅同一次执行的事件流
+        key = request_key(
+            "agent", current_user.id, normalize_text(request.prompt), request.context, request.history,
+            request.block_size, request.incremental, request.delta_format,
+        )
+
         async def event_generator():
             try:
                 # 1. 初始状态
-                yield json.dumps({"type": "status", "content": "正在分析您的意图..."}) + "\n"
+                yield ndjson_line({"type": "status", "content": "正在分析您的意图..."})
                 
                 # 2. 监听图执行事件
-                async for event in app_graph.astream(inputs, config=config):
+                # updates: 每个节点完成后的状态更新；custom: 节点内推送的事件 (reply 的 token、逐块的 delta)
+                async for mode, event in app_graph.astream(inputs, config=config, stream_mode=["updates", "custom"]):
+                    if mode == "custom":
+                        yield ndjson_line(event)
+                        continue
+
                     for node_name, state_update in event.items():
                         # 根据当前完成的节点，预测下一个状态并发送反馈
                         if node_name == "supervisor":
                             next_step = state_update.get("next_step")
                             if next_step in ["research_consult", "research_modify", "research_create"]:
-                                yield json.dumps({"type": "status", "content": "正在进行深度调研 (联网/RAG)..."}) + "\n"
+                                yield ndjson_line({"type": "status", "content": "正在进行深度调研 (联网/RAG)..."})
                             elif next_step in ["modify", "create"]:
-                                yield json.dumps({"type": "status", "content": "正在撰写/修改简历..."}) + "\n"
-                            else:
-                                yield json.dumps({"type": "status", "content": "正在思考回复..."}) + "\n"
+                                yield ndjson_line({"type": "status", "content": "正在撰写/修改简历..."})
+                            elif next_step != "cached":  # 命中语义答案缓存时直接返回结果
+                                yield ndjson_line({"type": "status", "content": "正在思考回复..."})
                         
                         elif node_name == "research":
-                            yield json.dumps({"type": "status", "content": "调研完成，正在整理信息..."}) + "\n"
+                            yield ndjson_line({"type": "status", "content": "调研完成，正在整理信息..."})
 
                         elif node_name == "modify":
-                            yield json.dumps({"type": "status", "content": "正在评估修改质量..."}) + "\n"
+                            yield ndjson_line({"type": "status", "content": "正在评估修改质量..."})
 
                         elif node_name == "evaluation":
                             if state_update.get("is_pass"):
-                                yield json.dumps({"type": "status", "content": "评估通过，正在生成最终回复..."}) + "\n"
+                                yield ndjson_line({"type": "status", "content": "评估通过，正在生成最终回复..."})
+                            elif state_update.get("review_warning"):
+                                # 多稿模式不重写，直接返回选中稿
+                                yield ndjson_line({"type": "status", "content": "评估未通过，返回当前最佳稿..."})
                             else:
-                                yield json.dumps({"type": "status", "content": "评估未通过，正在重新优化..."}) + "\n"
+                                yield ndjson_line({"type": "status", "content": "评估未通过，正在重新优化..."})
 
                         # 3. 检查是否有最终结果
                         if "final_response" in state_update:
@@ -110,21 +134,41 @@ async def execute_agent_workflow(
                                 "reply": final_res.get("reply", ""),
                                 "modified_data": final_res.get("modified_data")
                             }
-                            yield json.dumps({"type": "result", "data": response_data}) + "\n"
+                            if final_res.get("modified_patch"):
+                                response_data["modified_patch"] = final_res["modified_patch"]
+                            if final_res.get("review_warning"):
+                                response_data["review_warning"] = final_res["review_warning"]
+                            yield ndjson_line({"type": "result", "data": response_data})
             except Exception as e:
                 print(f"Stream Error: {e}")
-                yield json.dumps({"type": "status", "content": f"处理过程中发生错误: {str(e)}"}) + "\n"
+                yield ndjson_line({"type": "status", "content": f"处理过程中发生错误: {str(e)}"})
                 # 返回一个错误的最终结果，避免前端无限等待
                 error_data = {
                     "intention": "chat",
                     "reply": f"抱歉，系统处理您的请求时遇到问题: {str(e)}",
                     "modified_data": None
                 }
-                yield json.dumps({"type": "result", "data": error_data}) + "\n"
+                yield ndjson_line({"type": "result", "data": error_data})
 
-        return StreamingResponse(event_generator(), media_type="application/x-ndjson")
+        return StreamingResponse(single_flight.stream(key, event_generator), media_type="application/x-ndjson")
 
     except Exception as e:
         import traceback
         traceback.print_exc()
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+# 3. 运行指标 (格式转换进程池、转换缓存、模型调用连接池、历史摘要缓存、本地意图分类、推测执行、评估前置检查、模型分级、请求合并、语义答案缓存)
+@router.get("/metrics")
+async def get_ai_metrics(current_user: User = Depends(deps.get_current_user)):
+    return {
+        "conversion_executor": conversion_executor.stats(),
+        "delta_markdown_cache": delta_markdown_cache.stats(),
+        "model_http": model_http_clients.stats(),
+        "history_summary": llm_service.summary_store.stats(),
+        "intent_fastpath": llm_service.intent_classifier.stats(),
+        "speculation": speculation.stats(),
+        "quality_gate": quality_gate.stats(),
+        "model_cascade": llm_service.cascade.stats(),
+        "single_flight": single_flight.stats(),
+        "answer_cache": llm_service.answer_cache.stats(),
+    }
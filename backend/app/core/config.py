@@ -61,6 +61,43 @@ class Settings(BaseSettings):
     SEARCH_PROVIDER: str = "bocha"  # Options: "duckduckgo", "bocha"
     BOCHA_API_KEY: str | None = None
 
+    # 格式转换进程池：超过阈值 (字符数) 的 Delta/Markdown 转换放到进程池，避免阻塞事件循环
+    CONVERSION_POOL_WORKERS: int = 2
+    CONVERSION_INLINE_MAX_CHARS: int = 100_000
+
+    # 模型调用共享 HTTP 连接池 (所有 LLM / Embedding 客户端复用，保持长连接)
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_EXPIRY: float = 60.0   # 空闲连接保留秒数
+    HTTP_CONNECT_TIMEOUT: float = 5.0
+    HTTP_READ_TIMEOUT: float = 120.0      # 长文本生成耗时较长
+    HTTP2_ENABLED: bool = True            # 需安装 h2 (pip install httpx[http2])，未安装时自动回退 HTTP/1.1
+
+    # 本地意图分类快速通道：置信度达标直接路由，否则回退 LLM Supervisor
+    INTENT_FASTPATH_ENABLED: bool = True
+    INTENT_FASTPATH_THRESHOLD: float = 0.7         # 近邻投票中胜出意图的占比
+    INTENT_FASTPATH_MIN_SIMILARITY: float = 0.15   # 最近样例的余弦相似度下限 (过低说明是训练集外的说法)
+
+    # 推测执行 (默认关闭)：与 supervisor 并行启动的任务，逗号分隔 "research" / "modify"，如 "research,modify"
+    # 路线确认后命中的结果直接使用，未命中的取消；命中率与浪费的 token 见 /api/ai/metrics
+    SPECULATIVE_MODE: str = ""
+
+    # 并行多稿 (best-of-N，默认关闭)：>1 时 modify 并发生成 N 份草稿 (温度依次取自列表，不足时循环)，
+    # 由本地规则检查 + 至多一次批量 LLM 评估选出最佳稿，代替 "评估不通过 -> 重写" 的串行重试
+    BEST_OF_N_DRAFTS: int = 1
+    BEST_OF_N_TEMPERATURES: str = "0.1,0.5,0.9"
+
+    # 模型分级策略：每条链 pro (仅 Pro) / lite (仅 Lite) / cascade (先 Lite，JSON 解析失败、本地检查不通过或置信度低时升级 Pro)
+    # 未列出的链使用 pro；升级率与各档耗时分布见 /api/ai/metrics
+    MODEL_POLICY: str = "supervisor=cascade,chat=cascade,review=cascade,evaluation=cascade,agent=pro"
+
+    # 语义答案缓存：咨询/闲聊的回答按问题向量缓存，相似问题直接返回 (跳过调研与 LLM)
+    # 只对确定为 chat / research_consult 的请求生效；带简历内容的请求不缓存，带历史的只在同一用户、同一段历史内复用
+    ANSWER_CACHE_ENABLED: bool = True
+    ANSWER_CACHE_THRESHOLD: float = 0.92          # 问题向量的余弦相似度下限
+    ANSWER_CACHE_TTL_SECONDS: int = 6 * 3600      # 薪资、行情等信息会过时
+    ANSWER_CACHE_MAX_ENTRIES: int = 500
+
     # Pydantic 配置
     model_config = SettingsConfigDict(
         # 核心修复点：强制使用计算出的【绝对路径】，而非默认的相对路径
@@ -0,0 +1,115 @@
+import threading
+from typing import Any, Dict, Optional
+
+import httpx
+from openai import AsyncOpenAI, OpenAI
+
+from app.core.config import settings
+
+# h2 是可选依赖：安装后走 HTTP/2 (单连接多路复用)，否则回退 HTTP/1.1 长连接
+try:
+    import h2  # noqa: F401
+except ImportError:
+    h2 = None
+
+
+def http2_enabled() -> bool:
+    return settings.HTTP2_ENABLED and h2 is not None
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=settings.HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+    )
+
+
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(settings.HTTP_READ_TIMEOUT, connect=settings.HTTP_CONNECT_TIMEOUT)
+
+
+class ModelHttpClients:
+    """
+    进程内共享的模型调用客户端：
+    - 一个异步连接池 (LangChain ChatOpenAI 的 ainvoke/astream)
+    - 一个同步连接池 (在线程中执行的 RAG 检索：Embedding、子查询、答案生成)
+    两者共用同一组连接上限、超时与 keep-alive 配置；OpenAI SDK 客户端也只构建一次。
+    首次使用时惰性创建 (LLMService 在导入阶段就需要)，应用关闭时由 lifespan 统一释放。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._async_http: Optional[httpx.AsyncClient] = None
+        self._sync_http: Optional[httpx.Client] = None
+        self._async_openai: Optional[AsyncOpenAI] = None
+        self._sync_openai: Optional[OpenAI] = None
+
+    @property
+    def async_http(self) -> httpx.AsyncClient:
+        with self._lock:
+            if self._async_http is None or self._async_http.is_closed:
+                self._async_http = httpx.AsyncClient(http2=http2_enabled(), limits=_limits(), timeout=_timeout())
+            return self._async_http
+
+    @property
+    def sync_http(self) -> httpx.Client:
+        with self._lock:
+            if self._sync_http is None or self._sync_http.is_closed:
+                self._sync_http = httpx.Client(http2=http2_enabled(), limits=_limits(), timeout=_timeout())
+            return self._sync_http
+
+    @property
+    def async_openai(self) -> AsyncOpenAI:
+        if self._async_openai is None:
+            self._async_openai = AsyncOpenAI(
+                api_key=settings.OPENAI_API_KEY,
+                base_url=settings.OPENAI_API_BASE,
+                timeout=_timeout(),
+                http_client=self.async_http,
+            )
+        return self._async_openai
+
+    @property
+    def sync_openai(self) -> OpenAI:
+        if self._sync_openai is None:
+            self._sync_openai = OpenAI(
+                api_key=settings.OPENAI_API_KEY,
+                base_url=settings.OPENAI_API_BASE,
+                timeout=_timeout(),
+                http_client=self.sync_http,
+            )
+        return self._sync_openai
+
+    def chat_model_clients(self) -> Dict[str, Any]:
+        """
+        供 ChatOpenAI(**...) 使用：直接注入共享的 completions 客户端，
+        LangChain 不再为每个模型实例各建一套 OpenAI 客户端和连接池
+        """
+        return {
+            "client": self.sync_openai.chat.completions,
+            "async_client": self.async_openai.chat.completions,
+        }
+
+    async def aclose(self) -> None:
+        with self._lock:
+            async_http, self._async_http = self._async_http, None
+            sync_http, self._sync_http = self._sync_http, None
+            self._async_openai = None
+            self._sync_openai = None
+        if async_http is not None:
+            await async_http.aclose()
+        if sync_http is not None:
+            sync_http.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "http2": http2_enabled(),
+            "max_connections": settings.HTTP_MAX_CONNECTIONS,
+            "max_keepalive_connections": settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            "async_open": self._async_http is not None and not self._async_http.is_closed,
+            "sync_open": self._sync_http is not None and not self._sync_http.is_closed,
+        }
+
+
+model_http_clients = ModelHttpClients()
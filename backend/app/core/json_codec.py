@@ -0,0 +1,35 @@
+import json
+from typing import Any
+
+# orjson 是可选依赖：安装后序列化/反序列化走 orjson 快速路径，否则回退到标准库 json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(obj: Any, sort_keys: bool = False) -> str:
+    """紧凑 JSON 文本 (UTF-8 原样输出，不转义中文)"""
+    if orjson is not None:
+        option = orjson.OPT_SORT_KEYS if sort_keys else 0
+        return orjson.dumps(obj, default=str, option=option).decode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), sort_keys=sort_keys, default=str)
+
+
+def dumps_bytes(obj: Any) -> bytes:
+    """紧凑 JSON 字节串，直接用于响应写出"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=str)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+
+def loads(data: str | bytes) -> Any:
+    """解析 JSON；失败时抛出 json.JSONDecodeError (orjson.JSONDecodeError 是其子类)"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def ndjson_line(obj: Any) -> bytes:
+    """NDJSON 流的一行：一次序列化，直接写出字节"""
+    return dumps_bytes(obj) + b"\n"
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Literal
 
 # --- Agent (Modify) Models ---
 class ChatRequest(BaseModel):
@@ -7,11 +7,15 @@ class ChatRequest(BaseModel):
     context: str
     history: List[Dict[str, str]] = []  # 新增：历史对话记录
     block_size: Optional[Dict[str, float]] = None # 新增：文本块大小限制 {width, height}
+    incremental: bool = False # 增量模式：context 为 DeltaSet 时只返回变更块 (modified_patch)
+    delta_format: Literal["both", "data", "slate"] = "both" # 客户端渲染的格式：只生成 DATA 或 ORIGIN_DATA 可减半响应体积
 
 class AgentResponse(BaseModel):
     intention: str
     reply: str
     modified_data: Optional[Dict[str, Any]] = None
+    modified_patch: Optional[Dict[str, Any]] = None # {inserted, updated, moved, deleted}
+    review_warning: Optional[str] = None # best-of-N 选中稿未通过评估时的评估反馈 (未重试)
 
 # --- Review Models ---
 class ReviewRequest(BaseModel):
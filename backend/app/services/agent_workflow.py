@@ -3,14 +3,27 @@ from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.output_parsers import JsonOutputParser, StrOutputParser
 from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
 from app.core.config import settings
+from app.core.http_client import model_http_clients
 import json
-from app.services.format_converter import delta_to_markdown, markdown_to_delta
+from app.services.format_converter import expand_style_placeholders, is_text_delta_set, measure_markdown, MarkdownDeltaStream
+from app.services.conversion_executor import delta_to_compact_markdown_async, markdown_to_delta_set_async, markdown_to_delta_patch_async
+from app.services import text_layout
+from app.services.json_stream import JsonFieldStream
+from app.services.history_summary import RollingSummaryStore, format_messages
+from app.services.intent_classifier import IntentClassifier
+from app.services.intent_examples import INTENT_EXAMPLES, labeled_examples
+from app.services.model_cascade import ModelCascade, parse_policy
+from app.services import quality_gate
+from app.services.answer_cache import SemanticAnswerCache
+from app.services.cache import BoundedLRUCache
+from app.services.fit_to_box import compact_markdown
 
 # ================= 0. SUMMARY PROMPT (新增：摘要记忆) =================
 SUMMARY_SYSTEM_PROMPT = """
 你是对话摘要助手。
 请将对话历史总结为简洁摘要，保留关键信息（背景、技能、意向、修改点）。
 不含寒暄，直接陈述事实。
+如果提供了[已有摘要]，请把[新增对话]中的信息合并进去，输出更新后的完整摘要。
 """
 
 # ================= 1. SUPERVISOR PROMPT (核心修改：细分意图) =================
@@ -26,6 +39,11 @@ SUPERVISOR_SYSTEM_PROMPT = """
 5. **create**: 仅基于用户指令**从头撰写**简历内容（针对空白块），**不涉及**外部信息或专业方法。
 6. **chat**: 闲聊、问候或无法归类。
 
+research_* 意图还需选择信息源 tool：
+- web: 需要实时/外部信息 (JD、薪资、公司新闻、市场行情)。
+- rag: 需要方法论/内部知识 (STAR法则、简历模板、写作技巧)。
+- both: 明确需要**同时**结合外部数据和内部方法论。
+
 摘要: {summary}
 指令: {input}
 
@@ -33,7 +51,9 @@ SUPERVISOR_SYSTEM_PROMPT = """
 {{
     "next_agent": "research_consult" | "research_modify" | "modify" | "research_create" | "create" | "chat",
     "reasoning": "简短理由",
-    "search_query": "关键词(仅research_*需)"
+    "search_query": "关键词(仅research_*需)",
+    "tool": "web" | "rag" | "both" (仅research_*需),
+    "rag_query": "面向简历知识库的检索语句(仅tool为rag/both时需，可省略)"
 }}
 """
 
@@ -100,9 +120,37 @@ EVALUATION_SYSTEM_PROMPT = """
     "suggestion": "建议"
 }}
 """
+
+BATCH_EVALUATION_SYSTEM_PROMPT = """
+对比评估同一指令的多个候选修改结果，选出最满足用户需求的一个。
+标准: 意图一致，准确无幻觉，格式正确。
+每个候选单独判断：核心任务完成且无严重错误即通过(is_pass: true)。
+
+输出JSON:
+{{
+    "best": 最佳候选编号,
+    "results": [
+        {{"index": 0, "is_pass": true/false, "score": 0-100, "missing_points": ["遗漏"], "reason": "理由", "suggestion": "建议"}}
+    ]
+}}
+"""
+
+SHORTEN_SYSTEM_PROMPT = """
+简历精简助手。将Markdown内容压缩到指定行数以内。
+要求: 保留事实、数字和列表结构；删减修饰词与重复表述；不新增内容。
+
+输出JSON:
+{{
+    "modified_content": "精简后的Markdown"
+}}
+"""
 # ================= SERVICE CLASS =================
 
 class LLMService:
+    WINDOW_SIZE = 6  # 保留最近 6 条对话 (3轮)
+    SUMMARY_THRESHOLD = 10 # 如果超过 10 条，触发摘要生成
+    CASCADE_DISAGREE_CONFIDENCE = 0.5 # Lite 的路由与本地分类器 (置信度不低于此值) 不一致时升级 Pro
+
     def __init__(self):
         # 1. 初始化 Lite 模型 (用于摘要、简单分类)
         self.llm_lite = ChatOpenAI(
@@ -110,6 +158,7 @@ class LLMService:
             openai_api_key=settings.OPENAI_API_KEY,
             openai_api_base=settings.OPENAI_API_BASE,
             temperature=0.1,
+            **model_http_clients.chat_model_clients(),
         )
         
         # 2. 初始化 Pro 模型 (用于生成、推理、复杂指令)
@@ -118,15 +167,36 @@ class LLMService:
             openai_api_key=settings.OPENAI_API_KEY,
             openai_api_base=settings.OPENAI_API_BASE,
             temperature=0.1,
+            **model_http_clients.chat_model_clients(),
         )
         
         # 3. 默认 LLM (指向 Pro，保证默认高质量)
         self.llm = self.llm_pro
         
         self.parser = JsonOutputParser()
+        # 滚动摘要缓存：按历史前缀哈希存摘要，新请求只把新移出窗口的消息并入上一版摘要
+        self.summary_store = RollingSummaryStore()
+        # 本地意图分类器 (char n-gram TF-IDF + kNN)：置信度高的请求不再调用 Supervisor LLM
+        self.intent_classifier = IntentClassifier(
+            labeled_examples(),
+            threshold=settings.INTENT_FASTPATH_THRESHOLD,
+            min_similarity=settings.INTENT_FASTPATH_MIN_SIMILARITY,
+        )
+        # 模型分级：按 MODEL_POLICY 决定每条链先用 Lite 还是直接用 Pro
+        self.cascade = ModelCascade(parse_policy(settings.MODEL_POLICY))
+        # 语义答案缓存 (咨询/闲聊)；问题向量按原文缓存，查询与回写只需一次 Embedding 调用
+        self.answer_cache = SemanticAnswerCache(
+            threshold=settings.ANSWER_CACHE_THRESHOLD,
+            ttl_seconds=settings.ANSWER_CACHE_TTL_SECONDS,
+            max_entries=settings.ANSWER_CACHE_MAX_ENTRIES,
+        )
+        self._query_embeddings = BoundedLRUCache(max_entries=1024)
         self._init_chains()
 
     def _init_chains(self):
+        # 以下 self.xxx_chain 为 Pro 版本，self.lite_chains["xxx"] 为对应的 Lite 版本 (模型分级使用)
+        self.lite_chains = {}
+
         # 0. Summary Chain (使用 Lite 模型)
         summary_prompt = ChatPromptTemplate.from_messages([
             ("system", SUMMARY_SYSTEM_PROMPT),
@@ -141,6 +211,7 @@ class LLMService:
             ("user", "{input}")
         ])
         self.supervisor_chain = supervisor_prompt | self.llm_pro | self.parser
+        self.lite_chains["supervisor"] = supervisor_prompt | self.llm_lite | self.parser
 
         # 2. Modify Agent Chain (核心修改：模版增加 reference_info)
         agent_prompt = ChatPromptTemplate.from_messages([
@@ -148,7 +219,12 @@ class LLMService:
             MessagesPlaceholder(variable_name="chat_history"),
             ("user", "用户的指令：{user_prompt}\n参考信息：{reference_info}\n上下文内容：{context_json}")
         ])
+        self.agent_prompt = agent_prompt
         self.agent_chain = agent_prompt | self.llm_pro | self.parser
+        # 流式版本 (不带 JSON Parser)：用于边生成边推送 delta
+        self.agent_stream_chain = agent_prompt | self.llm_pro
+        self.lite_chains["agent"] = agent_prompt | self.llm_lite | self.parser
+        self.lite_chains["agent_stream"] = agent_prompt | self.llm_lite
 
         # 3. Review Agent Chain
         review_prompt = ChatPromptTemplate.from_messages([
@@ -156,6 +232,7 @@ class LLMService:
             ("user", "请诊断以下简历内容：\n{resume_content}")
         ])
         self.review_chain = review_prompt | self.llm_pro | self.parser
+        self.lite_chains["review"] = review_prompt | self.llm_lite | self.parser
 
         # 4. Chat Agent Chain
         chat_prompt = ChatPromptTemplate.from_messages([
@@ -164,6 +241,10 @@ class LLMService:
             ("user", "用户输入：{user_input}\n\n当前简历内容（供参考）：\n{context}")
         ])
         self.chat_chain = chat_prompt | self.llm_pro | self.parser
+        # 流式版本：边生成边推送 reply 的 token
+        self.chat_stream_chain = chat_prompt | self.llm_pro
+        self.lite_chains["chat"] = chat_prompt | self.llm_lite | self.parser
+        self.lite_chains["chat_stream"] = chat_prompt | self.llm_lite
 
         # 5. Evaluation Chain (质检链)
         eval_prompt = ChatPromptTemplate.from_messages([
@@ -186,25 +267,123 @@ class LLMService:
         ])
         # 管道：Prompt -> LLM -> JSON Parser
         self.evaluation_chain = eval_prompt | self.llm_pro | self.parser
+        self.lite_chains["evaluation"] = eval_prompt | self.llm_lite | self.parser
+
+        # 5.1 Batch Evaluation Chain (best-of-N：一次调用对比多份草稿)
+        batch_eval_prompt = ChatPromptTemplate.from_messages([
+            ("system", BATCH_EVALUATION_SYSTEM_PROMPT),
+            ("user", """
+            [用户原始指令]
+            {user_prompt}
+
+            [参考信息]
+            {reference_info}
+
+            [候选结果]
+            {candidates}
+            
+            请开始评估：
+            """)
+        ])
+        self.batch_evaluation_chain = batch_eval_prompt | self.llm_pro | self.parser
+        self.lite_chains["batch_evaluation"] = batch_eval_prompt | self.llm_lite | self.parser
+
+        # 6. Shorten Chain (超出区域时的兜底精简，使用 Lite 模型)
+        shorten_prompt = ChatPromptTemplate.from_messages([
+            ("system", SHORTEN_SYSTEM_PROMPT),
+            ("user", "目标: 不超过 {max_lines} 行，每行约 {chars_per_line} 个汉字 (当前约 {line_count} 行)。\n内容：\n{content}")
+        ])
+        self.shorten_chain = shorten_prompt | self.llm_lite | self.parser
 
     # === Methods ===
 
-    async def _process_history_with_strategy(self, raw_history: list) -> dict:
+    def _chain(self, name: str, tier: str):
+        """按模型档位取链 ("pro" / "lite")"""
+        return getattr(self, f"{name}_chain") if tier == "pro" else self.lite_chains[name]
+
+    async def embed_query(self, text: str) -> list:
+        """问题的向量表示 (与 RAG 相同的 Embedding 模型)"""
+        key = " ".join(text.split())
+        vector = self._query_embeddings.get(key)
+        if vector is None:
+            resp = await model_http_clients.async_openai.embeddings.create(
+                model=settings.EMBEDDING_MODEL_NAME, input=[key], encoding_format="float"
+            )
+            vector = resp.data[0].embedding
+            self._query_embeddings.set(key, vector)
+        return vector
+
+    # --- 模型分级的本地检查：返回升级原因 ("check" / "confidence")，None 表示采用 Lite 结果 ---
+
+    def _check_supervisor(self, prompt: str, res) -> str:
+        intent = (res.get("next_agent") or "").strip() if isinstance(res, dict) else ""
+        if intent not in INTENT_EXAMPLES:
+            return "check"
+        # Lite 的路由与本地分类器明显不一致时交给 Pro 复核
+        guess = self.intent_classifier.predict(prompt)
+        if guess["intent"] != intent and guess["confidence"] >= self.CASCADE_DISAGREE_CONFIDENCE:
+            return "confidence"
+        return None
+
+    @staticmethod
+    def _check_reply(res) -> str:
+        reply = res.get("reply") if isinstance(res, dict) else None
+        return None if isinstance(reply, str) and reply.strip() else "check"
+
+    @staticmethod
+    def _check_agent(res) -> str:
+        content = res.get("modified_content") if isinstance(res, dict) else None
+        if not isinstance(content, str) or not content.strip():
+            return "check"
+        return "check" if quality_gate.evaluate(content, record=False)["decision"] == "fail" else None
+
+    @staticmethod
+    def _check_review(res) -> str:
+        score = res.get("score") if isinstance(res, dict) else None
+        return None if isinstance(score, (int, float)) and res.get("summary") else "check"
+
+    @staticmethod
+    def _check_evaluation(res) -> str:
+        is_pass = res.get("is_pass") if isinstance(res, dict) else None
+        if not isinstance(is_pass, bool):
+            return "check"
+        # 不通过会触发整轮重写，Lite 的否决交给 Pro 复核
+        return None if is_pass else "confidence"
+
+    async def _fold_summary(self, previous_summary, new_messages: list) -> str:
+        conversation_text = format_messages(new_messages)
+        if previous_summary:
+            conversation_text = f"[已有摘要]\n{previous_summary}\n\n[新增对话]\n{conversation_text}"
+        return await self.summary_chain.ainvoke({"conversation": conversation_text})
+
+    async def summarize_history(self, raw_history: list) -> str:
+        """
+        窗口之外的旧历史摘要 (历史不够长时为 "无")。
+        同一次图运行只需调用一次，结果经 AgentState.history_summary 传给各节点
+        """
+        if not raw_history or len(raw_history) <= self.SUMMARY_THRESHOLD:
+            return "无"
+        older_history = raw_history[:-self.WINDOW_SIZE]
+        if not older_history:
+            return "无"
+        try:
+            return await self.summary_store.summarize(older_history, self._fold_summary)
+        except Exception as e:
+            print(f"Summary Generation Error: {e}")
+            return "无法生成摘要"
+
+    async def _process_history_with_strategy(self, raw_history: list, summary: str = None) -> dict:
         """
         综合处理历史记录：
         1. 结构化转换 (Dict -> Message)
         2. 滑动窗口 (保留最近 N 条)
-        3. 摘要生成 (如果历史过长)
+        3. 摘要生成 (如果历史过长；已算好的 summary 直接复用)
         """
-        WINDOW_SIZE = 6  # 保留最近 6 条对话 (3轮)
-        SUMMARY_THRESHOLD = 10 # 如果超过 10 条，触发摘要生成
-        
         if not raw_history:
             return {"summary": "无", "chat_history": []}
 
-        # 1. 分离新旧历史
-        recent_history = raw_history[-WINDOW_SIZE:]
-        older_history = raw_history[:-WINDOW_SIZE]
+        # 1. 取窗口内的近期历史
+        recent_history = raw_history[-self.WINDOW_SIZE:]
         
         # 2. 转换最近历史为 Message 对象
         chat_messages = []
@@ -216,35 +395,57 @@ class LLMService:
             elif role == "assistant":
                 chat_messages.append(AIMessage(content=content))
         
-        # 3. 处理摘要 (如果历史很长)
-        summary_text = "无"
-        if len(raw_history) > SUMMARY_THRESHOLD and older_history:
-            # 为了性能，我们只对 older_history 进行摘要
-            # 将 older_history 格式化为文本
-            conversation_text = "\n".join([f"{m.get('role')}: {m.get('content')}" for m in older_history])
-            try:
-                # 异步生成摘要
-                summary_text = await self.summary_chain.ainvoke({"conversation": conversation_text})
-            except Exception as e:
-                print(f"Summary Generation Error: {e}")
-                summary_text = "无法生成摘要"
-
-        return {"summary": summary_text, "chat_history": chat_messages}
-
-    async def process_supervisor_request(self, prompt: str, history: list = []):
+        # 3. 处理摘要 (如果历史很长)：只对窗口之外的旧历史做增量摘要
+        if summary is None:
+            summary = await self.summarize_history(raw_history)
+
+        return {"summary": summary, "chat_history": chat_messages}
+
+    async def process_supervisor_request(self, prompt: str, history: list = [], summary: str = None):
+        if settings.INTENT_FASTPATH_ENABLED:
+            fast = self.intent_classifier.route(prompt)
+            if fast:
+                print(f"⚡ [Supervisor] Fast path: {fast['intent']} (confidence {fast['confidence']}, {fast['latency_ms']} ms)")
+                # search_query 留空：supervisor_node 会回退为用户原话，web 搜索内部还会再做关键词改写
+                return {"next_agent": fast["intent"], "reasoning": "local intent classifier", "search_query": "", "fast_path": True}
         try:
-            processed = await self._process_history_with_strategy(history)
-            return await self.supervisor_chain.ainvoke({
+            processed = await self._process_history_with_strategy(history, summary)
+            inputs = {
                 "input": prompt, 
                 "chat_history": processed["chat_history"],
                 "summary": processed["summary"]
-            })
+            }
+            return await self.cascade.run(
+                "supervisor",
+                lambda tier: self._chain("supervisor", tier).ainvoke(inputs),
+                check=lambda res: self._check_supervisor(prompt, res),
+            )
         except Exception as e:
             print(f"Supervisor Error: {e}")
             # Fallback to chat if supervisor fails
-            return {"next_agent": "chat", "reasoning": "Supervisor failed, fallback to chat.", "search_query": ""}
+            return {"next_agent": "chat", "reasoning": "Supervisor failed, fallback to chat.", "search_query": "", "fallback": True}
 
-    async def process_chat_request(self, prompt: str, context: str = "", history: list = []):
+    async def _astream_json(self, chain, inputs: dict, stream_writer, fields: JsonFieldStream, on_piece=None):
+        """
+        流式调用返回 JSON 的链：reply 字段每到一段即推送 {"type": "token", "content": ...}，
+        其它被关注的字段交给 on_piece(field, text) 处理；结束后解析完整 JSON 返回
+        """
+        raw_chunks = []
+        async for chunk in chain.astream(inputs):
+            text = chunk.content if isinstance(chunk.content, str) else ""
+            raw_chunks.append(text)
+            for field, piece in fields.feed(text):
+                if field == "reply":
+                    stream_writer({"type": "token", "content": piece})
+                elif on_piece is not None:
+                    on_piece(field, piece)
+        return self.parser.parse("".join(raw_chunks))
+
+    async def process_chat_request(self, prompt: str, context: str = "", history: list = [], stream_writer=None, summary: str = None):
+        """
+        stream_writer: 若提供，则流式生成，reply 逐段推送 token 事件
+        summary: 已算好的历史摘要 (AgentState.history_summary)，为 None 时现算
+        """
         try:
             # 1. 预处理：将 context (Delta) 转为 Markdown
             context_data = {}
@@ -258,8 +459,9 @@ class LLMService:
             if isinstance(context_data, dict) and "content" in context_data:
                 original_content = context_data["content"]
             
-            # 转换 content 为 Markdown
-            markdown_context = delta_to_markdown(original_content)
+            # 转换 content 为紧凑 Markdown；闲聊不回写内容，样式占位标签直接去掉
+            markdown_context, _ = await delta_to_compact_markdown_async(original_content)
+            markdown_context = expand_style_placeholders(markdown_context, {})
             
             # Fallback
             if not markdown_context and original_content:
@@ -268,31 +470,106 @@ class LLMService:
                 else:
                     markdown_context = str(original_content)
 
-            processed = await self._process_history_with_strategy(history)
-            return await self.chat_chain.ainvoke({
+            processed = await self._process_history_with_strategy(history, summary)
+            chat_inputs = {
                 "user_input": prompt, 
                 "context": markdown_context,
                 "chat_history": processed["chat_history"],
                 "summary": processed["summary"]
-            })
+            }
+            if stream_writer:
+                # 升级 Pro 时通知前端丢弃 Lite 已推送的 token
+                return await self.cascade.run(
+                    "chat",
+                    lambda tier: self._astream_json(self._chain("chat_stream", tier), chat_inputs, stream_writer, JsonFieldStream(["reply"])),
+                    check=self._check_reply,
+                    on_escalate=lambda: stream_writer({"type": "reset"}),
+                )
+            return await self.cascade.run("chat", lambda tier: self._chain("chat", tier).ainvoke(chat_inputs), check=self._check_reply)
         except Exception as e:
             print(f"Chat Error: {e}")
-            return {"reply": "抱歉，我现在无法回答您的问题，请稍后再试。"}
+            return {"reply": "抱歉，我现在无法回答您的问题，请稍后再试。", "error": True}
 
     async def process_review_request(self, resume_content: str):
         try:
-            return await self.review_chain.ainvoke({"resume_content": resume_content})
+            return await self.cascade.run(
+                "review",
+                lambda tier: self._chain("review", tier).ainvoke({"resume_content": resume_content}),
+                check=self._check_review,
+            )
         except Exception as e:
             print(f"Review Error: {e}")
             return {"score": 0, "summary": "诊断服务暂时不可用", "pros": [], "cons": [], "suggestions": []}
 
     # [核心修改]：改为 async，增加 reference_info 参数
-    async def process_agent_request(self, prompt: str, context: str, reference_info: str = "无", history: list = [], block_size: dict = None, intent: str = "modify"):
-        """调用修改 Agent"""
+    async def _astream_agent(self, inputs: dict, stream_writer, delta_format: str = "both", styles: dict = None, stream_deltas: bool = True, tier: str = "pro"):
+        """
+        流式调用修改 Agent：从生成中的 JSON 里增量提取 reply 与 modified_content。
+        reply 逐段推送 token 事件；stream_deltas 时每完成一行 Markdown 即转换为一个 Delta 块并推送 delta 事件
+        (增量模式最终返回 patch，不推送整块，返回的 converter 为 None)。
+        """
+        chain = self._chain("agent_stream", tier)
+        if not stream_deltas:
+            res = await self._astream_json(chain, inputs, stream_writer, JsonFieldStream(["reply"]))
+            return res, None
+
+        converter = MarkdownDeltaStream(delta_format=delta_format, styles=styles)
+
+        def on_content(_, piece):
+            for delta in converter.feed(piece):
+                stream_writer({"type": "delta", "data": delta})
+
+        res = await self._astream_json(chain, inputs, stream_writer,
+                                       JsonFieldStream(["reply", "modified_content"]), on_content)
+        for delta in converter.close():
+            stream_writer({"type": "delta", "data": delta})
+        return res, converter
+
+    async def _fit_to_box(self, markdown: str, width: float, height: float) -> str:
+        """
+        生成后校验：排版后超出区域时，先做本地确定性压缩，仍超出才调用一次 LLM 精简
+        """
+        compacted, report = compact_markdown(markdown, width, height)
+        if report["steps"]:
+            print(f"📏 [Agent] Local compaction {report['steps']}: {report['line_count']} lines, fits={report['fits']}")
+        if report["fits"]:
+            return compacted
+
+        capacity = text_layout.box_capacity(width, height)
+        try:
+            res = await self.shorten_chain.ainvoke({
+                "max_lines": capacity["lines"],
+                "chars_per_line": capacity["chars_per_line"],
+                "line_count": report["line_count"],
+                "content": compacted
+            })
+        except Exception as e:
+            print(f"Shorten Error: {e}")
+            return compacted
+
+        shortened = res.get("modified_content") if isinstance(res, dict) else None
+        if not shortened:
+            return compacted
+        shortened, report = compact_markdown(shortened, width, height)
+        print(f"📏 [Agent] LLM shortening: {report['line_count']} lines, fits={report['fits']}")
+        return shortened
+
+    async def process_agent_request(self, prompt: str, context: str, reference_info: str = "无", history: list = [], block_size: dict = None, intent: str = "modify", incremental: bool = False, stream_writer=None, delta_format: str = "both", summary: str = None, temperature: float = None):
+        """
+        调用修改 Agent
+        incremental: 若原内容为 DeltaSet，则只返回变更块 (modified_patch)，保留未变块的 id 与位置
+        stream_writer: 若提供，则流式生成：reply 逐段推送 {"type": "token", "content": ...}；
+                       非增量模式下每完成一行即推送 {"type": "delta", "data": delta}
+        delta_format: 生成的文本属性 ("both" / "data" 仅 DATA / "slate" 仅 ORIGIN_DATA)
+        summary: 已算好的历史摘要 (AgentState.history_summary)，为 None 时现算
+        temperature: 覆盖默认采样温度 (best-of-N 多稿使用，仅非流式生成)
+        """
         try:
             # 1. 预处理：将 context (Delta) 转为 Markdown
             context_data = {}
             markdown_context = ""
+            original_content = None
+            styles = {}
             
             # 如果是创建意图，忽略 context
             if intent in ["create", "research_create"]:
@@ -308,8 +585,8 @@ class LLMService:
                 if isinstance(context_data, dict) and "content" in context_data:
                     original_content = context_data["content"]
                 
-                # 转换 content 为 Markdown
-                markdown_context = delta_to_markdown(original_content)
+                # 转换 content 为紧凑 Markdown：颜色/字号等样式替换为 <t1> 占位标签，生成后再还原
+                markdown_context, styles = await delta_to_compact_markdown_async(original_content)
                 
                 # Fallback: 如果转换结果为空但原始内容不为空，直接使用原始内容字符串
                 if not markdown_context and original_content:
@@ -328,32 +605,74 @@ class LLMService:
 
             # 2. 构造约束信息
             constraint_msg = ""
+            fit_box = None
             if block_size:
                 width = block_size.get("width", 0)
                 height = block_size.get("height", 0)
-                # 估算：假设字体大小 14px，行高 20px
+                # 按画布排版规则估算容量：字宽表 + 逐字换行 + 行高 14px*1.5
                 if width > 0 and height > 0:
-                    estimated_lines = int(height / 20)
-                    constraint_msg = f"\n[排版约束] 当前显示区域高度约 {height}px (约 {estimated_lines} 行)。请在保持内容完整的前提下，尽量控制行数。如果内容较多，请精简文字，但**必须保留列表结构**以便阅读。"
-
-            processed = await self._process_history_with_strategy(history)
+                    fit_box = {"width": width, "height": height}
+                    capacity = text_layout.box_capacity(width, height)
+                    constraint_msg = f"\n[排版约束] 当前显示区域约 {width}x{height}px (约 {capacity['lines']} 行，每行约 {capacity['chars_per_line']} 个汉字)。"
+                    if original_content:
+                        current_size = measure_markdown(expand_style_placeholders(markdown_context, styles), width)
+                        # 原内容本身已超出区域时，以原内容高度为上限
+                        fit_box["height"] = max(height, current_size["height"])
+                        constraint_msg += f"当前内容排版后约 {current_size['line_count']} 行。"
+                    constraint_msg += "请在保持内容完整的前提下，尽量控制行数。如果内容较多，请精简文字，但**必须保留列表结构**以便阅读。"
+
+            if styles:
+                constraint_msg += "\n[样式标记] 内容中的 <t1>...</t1> 等标签表示原有的颜色/字号样式，请保留标签包裹对应文字，不要新增或改名。"
+
+            processed = await self._process_history_with_strategy(history, summary)
             
             # 2. 调用 LLM
-            res = await self.agent_chain.ainvoke({
+            agent_inputs = {
                 "user_prompt": prompt + constraint_msg,
                 "context_json": context_input, # 传入 Markdown
                 "reference_info": reference_info,  # 将搜索结果传入 Prompt
                 "chat_history": processed["chat_history"],
                 "summary": processed["summary"]
-            })
+            }
+            async def generate(tier):
+                if stream_writer:
+                    return await self._astream_agent(agent_inputs, stream_writer, delta_format, styles, stream_deltas=not incremental, tier=tier)
+                if temperature is not None:
+                    llm = self.llm_pro if tier == "pro" else self.llm_lite
+                    return await (self.agent_prompt | llm.bind(temperature=temperature) | self.parser).ainvoke(agent_inputs), None
+                return await self._chain("agent", tier).ainvoke(agent_inputs), None
+
+            # 升级 Pro 时通知前端丢弃 Lite 已推送的 token / delta
+            res, stream = await self.cascade.run(
+                "agent", generate,
+                check=lambda out: self._check_agent(out[0]),
+                on_escalate=(lambda: stream_writer({"type": "reset"})) if stream_writer else None,
+            )
             
-            # 3. 后处理：将 Markdown 转回 Delta
-            modified_content_md = res.get("modified_content", "")
+            # 3. 后处理：还原样式占位标签，将 Markdown 转回 Delta
+            modified_content_md = expand_style_placeholders(res.get("modified_content") or "", styles)
+
+            # 生成后校验是否放得下
+            if modified_content_md and fit_box:
+                modified_content_md = await self._fit_to_box(modified_content_md, fit_box["width"], fit_box["height"])
             modified_data = None
+            modified_patch = None
             
             if modified_content_md:
-                delta_json = markdown_to_delta(modified_content_md)
-                modified_data = json.loads(delta_json) # 转为对象返回
+                if incremental and original_content is not None and is_text_delta_set(original_content):
+                    # 增量模式：与原 DeltaSet 比对，仅返回新增/更新/删除的块
+                    modified_patch = await markdown_to_delta_patch_async(modified_content_md, original_content, delta_format)
+                elif stream is not None and expand_style_placeholders(stream.text, styles) == modified_content_md:
+                    # 流式转换已完成，复用其结果 (与已推送的 delta 事件 id 一致)
+                    modified_data = stream.delta_set
+                else:
+                    # 直接生成对象，避免 dumps/loads 往返；大文档在进程池中转换
+                    modified_data = await markdown_to_delta_set_async(modified_content_md, delta_format)
+                    if stream is not None:
+                        # 内容在流式之后被改写 (如放不下时压缩)：已推送的 delta 块 id 与最终结果不一致，
+                        # 通知前端丢弃已收到的内容，并重新推送 reply
+                        stream_writer({"type": "reset"})
+                        stream_writer({"type": "token", "content": res.get("reply", "")})
             
             # 统一返回 intention，如果是 create/research_create，返回 create
             final_intent = "create" if intent in ["create", "research_create"] else "modify"
@@ -361,7 +680,11 @@ class LLMService:
             return {
                 "intention": final_intent,
                 "reply": res.get("reply", ""),
-                "modified_data": modified_data
+                "modified_data": modified_data,
+                "modified_patch": modified_patch,
+                # 供评估节点的本地规则检查使用 (修改前后的 Markdown)
+                "modified_markdown": modified_content_md,
+                "original_markdown": expand_style_placeholders(markdown_context, styles) if original_content is not None else ""
             }
         except Exception as e:
             print(f"Agent Error: {e}")
@@ -374,13 +697,17 @@ class LLMService:
             }
     
     # [接口] 执行评估
-    async def process_evaluation_request(self, user_prompt: str, agent_reply: str, reference_info: str = "无", modified_data: dict = None):
+    async def process_evaluation_request(self, user_prompt: str, agent_reply: str, reference_info: str = "无", modified_data: dict = None, modified_markdown: str = None, gate_issues: list = None):
         """
         返回结构化的评估结果 (JSON Dict)
+        modified_markdown: 修改后的 Markdown；提供时代替 DeltaSet 作为评估输入 (更短，模型也更容易读)
+        gate_issues: 本地规则检查发现的疑点，附在数据后供评估参考
         """
         # 提取 modified_data 的摘要 (避免 Token 爆炸)
         modified_data_snippet = "无修改数据"
-        if modified_data:
+        if modified_markdown:
+            modified_data_snippet = modified_markdown[:2000] + ("... (truncated)" if len(modified_markdown) > 2000 else "")
+        elif modified_data:
             # 将 modified_data 转换为字符串，并截取前 2000 个字符
             # 现在的 modified_data 是 DeltaSet (dict)，直接转字符串即可
             ops_str = str(modified_data)
@@ -388,17 +715,63 @@ class LLMService:
                 modified_data_snippet = ops_str[:2000] + "... (truncated)"
             else:
                 modified_data_snippet = ops_str
-
+        if gate_issues:
+            modified_data_snippet += "\n\n[本地规则检查疑点]\n" + "\n".join(f"- {i['detail']}" for i in gate_issues)
+
+        inputs = {
+            "user_prompt": user_prompt,
+            "agent_reply": agent_reply,
+            "reference_info": reference_info,
+            "modified_data_snippet": modified_data_snippet
+        }
         try:
-            return await self.evaluation_chain.ainvoke({
-                "user_prompt": user_prompt,
-                "agent_reply": agent_reply,
-                "reference_info": reference_info,
-                "modified_data_snippet": modified_data_snippet
-            })
+            return await self.cascade.run(
+                "evaluation",
+                lambda tier: self._chain("evaluation", tier).ainvoke(inputs),
+                check=self._check_evaluation,
+            )
         except Exception as e:
             print(f"Evaluation Logic Error: {e}")
             # 降级处理：如果评估崩了，默认通过，避免卡死流程
             return {"is_pass": True, "score": 0, "reason": "评估服务异常", "missing_points": []}
 
+    # [接口] 批量评估 (best-of-N)
+    async def process_batch_evaluation_request(self, user_prompt: str, candidates: list, reference_info: str = "无"):
+        """
+        一次调用对比多份候选草稿
+        candidates: [{"reply", "modified_markdown", "gate_issues"}, ...]，编号即列表下标
+        返回 {"best": 下标, "results": [{"index", "is_pass", "score", ...}]}；评估异常时 best 为 None
+        """
+        blocks = []
+        for i, candidate in enumerate(candidates):
+            markdown = candidate.get("modified_markdown") or "无修改数据"
+            block = f"### 候选 {i}\n回复: {candidate.get('reply', '')}\n内容:\n{markdown[:2000]}"
+            if candidate.get("gate_issues"):
+                block += "\n本地规则检查疑点: " + "；".join(issue["detail"] for issue in candidate["gate_issues"])
+            blocks.append(block)
+
+        inputs = {
+            "user_prompt": user_prompt,
+            "reference_info": reference_info,
+            "candidates": "\n\n".join(blocks)
+        }
+
+        def valid_best(res) -> bool:
+            return isinstance(res, dict) and isinstance(res.get("best"), int) and 0 <= res["best"] < len(candidates)
+
+        try:
+            # 与单稿评估共用 evaluation 的分级策略
+            res = await self.cascade.run(
+                "evaluation",
+                lambda tier: self._chain("batch_evaluation", tier).ainvoke(inputs),
+                check=lambda res: None if valid_best(res) else "check",
+            )
+            best = res.get("best")
+            if not isinstance(best, int) or not 0 <= best < len(candidates):
+                raise ValueError(f"invalid best index: {best}")
+            return {"best": best, "results": res.get("results") or []}
+        except Exception as e:
+            print(f"Batch Evaluation Error: {e}")
+            return {"best": None, "results": []}
+
 llm_service = LLMService()
\ No newline at end of file
@@ -0,0 +1,144 @@
+"""
+Semantic answer cache for consult / chat replies.
+
+Entries are keyed by the query embedding: a lookup returns the freshest answer whose
+query has cosine similarity >= threshold with the new one, so rephrasings of the
+same question ("深圳 Java 薪资" / "深圳 Java 工程师工资多少") share an answer.
+Each entry records the intent its answer was produced for, and a lookup only matches
+entries of the requested intent, so a similar prompt routed elsewhere (e.g. a modify
+request) is never answered from the cache.
+Entries live in scopes; only requests with no personal context go to the shared
+scope, everything else is confined to a scope derived from the user and context.
+Entries expire after ttl seconds (market information goes stale); hits report
+their age so staleness can be tuned against the hit rate.
+"""
+import hashlib
+import json
+import math
+import operator
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence
+
+PUBLIC_SCOPE = "public"
+
+
+def scope_for(user_id: Any, personal_inputs: Sequence[Any]) -> str:
+    """Shared scope when the request carries no personal input, else one tied to the user and that input."""
+    if not any(personal_inputs):
+        return PUBLIC_SCOPE
+    payload = json.dumps(list(personal_inputs), ensure_ascii=False, sort_keys=True, default=str)
+    return f"user:{user_id}:{hashlib.sha1(payload.encode('utf-8')).hexdigest()}"
+
+
+def _normalize(vector: Sequence[float]) -> List[float]:
+    norm = math.sqrt(sum(x * x for x in vector))
+    return [x / norm for x in vector] if norm else []
+
+
+class _Entry:
+    def __init__(self, vector: List[float], query: str, intent: str, answer: Dict[str, Any]):
+        self.vector = vector
+        self.query = query
+        self.intent = intent
+        self.answer = answer
+        self.created = time.time()
+        self.hits = 0
+
+
+class SemanticAnswerCache:
+    """
+    Thread-safe; scopes hold at most max_entries entries in total (oldest evicted first).
+    lookup() returns {"answer", "query", "intent", "similarity", "age_s"} or None.
+    """
+
+    def __init__(self, threshold: float = 0.92, ttl_seconds: float = 6 * 3600, max_entries: int = 500):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._scopes: Dict[str, "OrderedDict[int, _Entry]"] = {}
+        self._order: "OrderedDict[int, str]" = OrderedDict()  # entry id -> scope, oldest first
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self._hit_age_total = 0.0
+        self._hit_age_max = 0.0
+
+    def _remove(self, entry_id: int) -> None:
+        scope = self._order.pop(entry_id)
+        entries = self._scopes[scope]
+        del entries[entry_id]
+        if not entries:
+            del self._scopes[scope]
+
+    def _expire(self, now: float) -> None:
+        # _order is oldest first, so expired entries are at the front
+        while self._order:
+            entry_id, scope = next(iter(self._order.items()))
+            if now - self._scopes[scope][entry_id].created <= self.ttl_seconds:
+                break
+            self._remove(entry_id)
+            self.expired += 1
+
+    def lookup(self, vector: Sequence[float], intent: str, scope: str = PUBLIC_SCOPE) -> Optional[Dict[str, Any]]:
+        query_vector = _normalize(vector)
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            best, best_similarity = None, self.threshold
+            for entry in self._scopes.get(scope, {}).values():
+                if entry.intent != intent:
+                    continue
+                similarity = sum(map(operator.mul, query_vector, entry.vector))
+                # >=: among equally similar entries the later (fresher) one wins
+                if similarity >= best_similarity:
+                    best, best_similarity = entry, similarity
+            if best is None:
+                self.misses += 1
+                return None
+            age = now - best.created
+            best.hits += 1
+            self.hits += 1
+            self._hit_age_total += age
+            self._hit_age_max = max(self._hit_age_max, age)
+            return {"answer": best.answer, "query": best.query, "intent": best.intent, "similarity": round(best_similarity, 4), "age_s": round(age, 1)}
+
+    def store(self, vector: Sequence[float], query: str, intent: str, answer: Dict[str, Any],
+              scope: str = PUBLIC_SCOPE) -> None:
+        normalized = _normalize(vector)
+        if not normalized:
+            return
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._scopes.setdefault(scope, OrderedDict())[entry_id] = _Entry(normalized, query, intent, answer)
+            self._order[entry_id] = scope
+            while len(self._order) > self.max_entries:
+                self._remove(next(iter(self._order)))
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            now = time.time()
+            first = next(iter(self._order.items()), None)
+            oldest = self._scopes[first[1]][first[0]].created if first else None
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._order),
+                "scopes": len(self._scopes),
+                "threshold": self.threshold,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "expired": self.expired,
+                "evictions": self.evictions,
+                # Staleness: how old served answers were, and the oldest answer still servable
+                "avg_hit_age_s": round(self._hit_age_total / self.hits, 1) if self.hits else 0.0,
+                "max_hit_age_s": round(self._hit_age_max, 1),
+                "oldest_entry_age_s": round(now - oldest, 1) if oldest is not None else 0.0,
+            }
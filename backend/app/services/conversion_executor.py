@@ -0,0 +1,189 @@
+import asyncio
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.services import format_converter
+from app.services.format_converter import delta_cache_key, delta_markdown_cache
+
+
+def _warm_worker() -> None:
+    # 子进程启动时预先导入转换模块 (正则编译、字宽表构建)，首个任务不再付出导入开销
+    import app.services.format_converter  # noqa: F401
+
+
+def _noop() -> None:
+    return None
+
+
+def estimate_size(value: Any) -> int:
+    """
+    转换输入的近似字符数 (不做序列化)：
+    str 取长度；BlockKit ops 累加 insert；DeltaSet 累加 DATA/ORIGIN_DATA 字符串长度
+    """
+    if isinstance(value, str):
+        return len(value)
+    if isinstance(value, dict):
+        ops = value.get("ops")
+        if isinstance(ops, list):
+            return sum(len(op.get("insert", "")) for op in ops
+                       if isinstance(op, dict) and isinstance(op.get("insert"), str))
+        size = 0
+        for delta in value.values():
+            if isinstance(delta, dict):
+                for attr in delta.get("attrs", {}).values():
+                    if isinstance(attr, str):
+                        size += len(attr)
+        return size
+    return 0
+
+
+class ConversionExecutor:
+    """
+    格式转换执行器：
+    - 小输入直接在事件循环里同步执行 (进程间传参的开销比转换本身还大)
+    - 超过 inline_max_chars 的输入交给常驻进程池，事件循环不被大简历阻塞
+    - 记录排队深度、在途任务、耗时等指标 (stats)
+    """
+
+    def __init__(self, max_workers: int = 2, inline_max_chars: int = 100_000):
+        self.max_workers = max_workers
+        self.inline_max_chars = inline_max_chars
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+        self.inline_count = 0
+        self.offloaded_count = 0
+        self.failed_count = 0
+        self.in_flight = 0        # 已提交到进程池、尚未完成的任务
+        self.max_in_flight = 0
+        self.offload_seconds = 0.0
+        self.max_offload_seconds = 0.0
+
+    def start(self) -> None:
+        """创建进程池并预热所有 worker (应用启动时调用)"""
+        if self.max_workers <= 0:
+            return
+        with self._lock:
+            if self._pool is not None:
+                return
+            # 在启动阶段 fork (此时还没有请求线程)，子进程直接继承已导入的模块；
+            # 不用 spawn：它会在每个 worker 里重新导入 main.py (建表、初始化 LLM 客户端)
+            method = "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn"
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context(method),
+                initializer=_warm_worker,
+            )
+            for _ in range(self.max_workers):
+                self._pool.submit(_noop)
+
+    def _restart(self, broken: ProcessPoolExecutor) -> Optional[ProcessPoolExecutor]:
+        """丢弃已损坏的进程池并重建 (并发请求只重建一次)"""
+        with self._lock:
+            if self._pool is broken:
+                self._pool = None
+        broken.shutdown(wait=False, cancel_futures=True)
+        self.start()
+        return self._pool
+
+    def shutdown(self) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    async def run(self, fn: Callable[..., Any], *args: Any, size: Optional[int] = None) -> Any:
+        """
+        执行 fn(*args)。size 为输入字符数 (缺省按第一个参数估算)，超过阈值时在进程池执行。
+        fn 与参数必须可 pickle (模块级函数)。转换函数自身的异常原样抛出；
+        worker 异常退出导致进程池损坏时，重建进程池并重试一次。
+        """
+        if size is None:
+            size = estimate_size(args[0]) if args else 0
+        if size <= self.inline_max_chars or self.max_workers <= 0:
+            self.inline_count += 1
+            return fn(*args)
+
+        if self._pool is None:
+            self.start()
+        pool = self._pool
+        if pool is None:
+            self.inline_count += 1
+            return fn(*args)
+
+        self.offloaded_count += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        try:
+            try:
+                return await loop.run_in_executor(pool, fn, *args)
+            except BrokenProcessPool as e:
+                # worker 被杀 (如 OOM)：不退回同步执行 (会阻塞事件循环)，重建进程池后重试
+                self.failed_count += 1
+                print(f"⚠️ [Conversion] Process pool broken ({e}), restarting it.")
+                pool = self._restart(pool)
+                if pool is None:
+                    raise
+                return await loop.run_in_executor(pool, fn, *args)
+        finally:
+            self.in_flight -= 1
+            elapsed = time.perf_counter() - start
+            self.offload_seconds += elapsed
+            self.max_offload_seconds = max(self.max_offload_seconds, elapsed)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.max_workers if self._pool is not None else 0,
+            "inline_max_chars": self.inline_max_chars,
+            "inline": self.inline_count,
+            "offloaded": self.offloaded_count,
+            "failed": self.failed_count,
+            # 在途任务超过 worker 数的部分即为排队深度
+            "in_flight": self.in_flight,
+            "queue_depth": max(self.in_flight - self.max_workers, 0),
+            "max_in_flight": self.max_in_flight,
+            "avg_offload_ms": round(self.offload_seconds / self.offloaded_count * 1000, 2) if self.offloaded_count else 0.0,
+            "max_offload_ms": round(self.max_offload_seconds * 1000, 2),
+        }
+
+
+conversion_executor = ConversionExecutor(
+    max_workers=settings.CONVERSION_POOL_WORKERS,
+    inline_max_chars=settings.CONVERSION_INLINE_MAX_CHARS,
+)
+
+
+# === 异步转换入口 (供请求路径使用) ===
+
+async def delta_to_compact_markdown_async(delta_set_input: Any) -> Tuple[str, Dict[str, Dict[str, Any]]]:
+    """
+    先查主进程缓存，未命中再按大小选择同步/进程池转换，并把结果写回主进程缓存
+    """
+    key = delta_cache_key(delta_set_input)
+    if key is not None:
+        cached = delta_markdown_cache.get(("compact", key))
+        if cached is not None:
+            return cached
+    result = await conversion_executor.run(format_converter.delta_to_compact_markdown, delta_set_input, False)
+    if key is not None:
+        delta_markdown_cache.set(("compact", key), result)
+    return result
+
+
+async def markdown_to_delta_set_async(markdown_text: str, delta_format: str = "both") -> Dict[str, Any]:
+    return await conversion_executor.run(format_converter.markdown_to_delta_set, markdown_text, delta_format)
+
+
+async def markdown_to_delta_patch_async(markdown_text: str, previous_delta_set: Any,
+                                        delta_format: str = "both") -> Dict[str, Any]:
+    size = len(markdown_text) + estimate_size(previous_delta_set)
+    return await conversion_executor.run(
+        format_converter.markdown_to_delta_patch, markdown_text, previous_delta_set, delta_format, size=size
+    )
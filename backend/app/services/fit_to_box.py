@@ -0,0 +1,85 @@
+"""
+Fit generated Markdown into a text block of known size.
+
+Measurement uses the canvas-matching layout (format_converter.measure_markdown).
+Overflowing Markdown is compacted by cheap deterministic rewrites, applied in order
+until it fits; callers fall back to an LLM shortening pass only if it still overflows.
+"""
+import re
+from typing import Any, Callable, Dict, List, Tuple
+
+from app.services.format_converter import measure_markdown
+
+_LIST_INDENT = "   "  # markdown_to_delta reads 3 spaces per list level
+_BULLET_RE = re.compile(r'^(\s*)-\s(.*)$')
+_CJK_RE = re.compile(r'[\u3000-\u9fff\uff00-\uffef]')
+
+
+def check_fit(markdown_text: str, width: float, height: float) -> Dict[str, Any]:
+    """
+    Measure Markdown in a width x height block: {"fits", "height", "line_count", "overflow"}.
+    """
+    size = measure_markdown(markdown_text, width)
+    return {
+        "fits": size["height"] <= height,
+        "height": size["height"],
+        "line_count": size["line_count"],
+        "overflow": max(size["height"] - height, 0),
+    }
+
+
+def shorten_list_indent(markdown_text: str) -> str:
+    """Move nested list items up one level (each level costs 20px of line width)."""
+    lines = []
+    for line in markdown_text.split('\n'):
+        if line.startswith(_LIST_INDENT) and re.match(r'^\s+(-|\d+\.)\s', line):
+            line = line[len(_LIST_INDENT):]
+        lines.append(line)
+    return '\n'.join(lines)
+
+
+def merge_short_bullets(markdown_text: str, width: float) -> str:
+    """
+    Merge consecutive bullets at the same level while the merged item still renders
+    on a single line, so two half-empty lines become one.
+    """
+    lines: List[str] = []
+    for line in markdown_text.split('\n'):
+        m = _BULLET_RE.match(line)
+        prev = _BULLET_RE.match(lines[-1]) if lines else None
+        if m and prev and m.group(1) == prev.group(1):
+            sep = "；" if _CJK_RE.search(prev.group(2) + m.group(2)) else "; "
+            merged = f"{prev.group(1)}- {prev.group(2).rstrip('；;。. ')}{sep}{m.group(2)}"
+            if measure_markdown(merged, width)["line_count"] == 1:
+                lines[-1] = merged
+                continue
+        lines.append(line)
+    return '\n'.join(lines)
+
+
+def compact_markdown(markdown_text: str, width: float, height: float) -> Tuple[str, Dict[str, Any]]:
+    """
+    Apply the local compaction steps in order until the Markdown fits. A step is kept
+    only if it lowers the measured height (blank lines and trailing spaces are already
+    ignored by the layout, so no step removes them).
+    Returns (markdown, report) where report is check_fit output plus the "steps" applied.
+    """
+    steps: List[Tuple[str, Callable[[str], str]]] = [
+        ("shorten_list_indent", shorten_list_indent),
+        ("merge_short_bullets", lambda md: merge_short_bullets(md, width)),
+    ]
+    report = check_fit(markdown_text, width, height)
+    applied: List[str] = []
+    for name, step in steps:
+        if report["fits"]:
+            break
+        compacted = step(markdown_text)
+        if compacted == markdown_text:
+            continue
+        compacted_report = check_fit(compacted, width, height)
+        if compacted_report["height"] >= report["height"]:
+            continue
+        markdown_text, report = compacted, compacted_report
+        applied.append(name)
+    report["steps"] = applied
+    return markdown_text, report
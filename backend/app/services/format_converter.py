@@ -1,8 +1,16 @@
 import json
+import sys
 import uuid
 import math
 import re
-from typing import Dict, Any, List, Optional
+import difflib
+import hashlib
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Tuple
+
+from app.core import json_codec
+from app.services.cache import BoundedLRUCache
+from app.services import text_layout
 
 # Constants from frontend
 TEXT_ATTRS = {
@@ -25,13 +33,410 @@ TEXT_ATTRS = {
     "STRIKE_THROUGH": "STRIKE_THROUGH",
 }
 
-def delta_to_markdown(delta_set_input: str | Dict[str, Any]) -> str:
+BLOCK_KEYS = (
+    TEXT_ATTRS["LINE_HEIGHT"], TEXT_ATTRS["ORDERED_LIST_LEVEL"], TEXT_ATTRS["ORDERED_LIST_START"],
+    TEXT_ATTRS["UNORDERED_LIST_LEVEL"], TEXT_ATTRS["DIVIDING_LINE"], TEXT_ATTRS["BREAK_LINE_START"]
+)
+
+# --- Span Model ---
+# Internally a line is {"spans": [...], "config": line_config}, where each span is
+# {"text": str, "config": dict} covering a run of characters that share one config.
+# The frontend wire format (RichTextLines, one {"char", "config"} per character) is
+# only produced at the edge by encode_rich_text_lines / decoded by decode_rich_text_lines.
+
+# --- Config Interning ---
+# Span configs are flyweights: every distinct style combination is stored once and
+# shared by all spans (and wire chars) that use it, so equal configs are the same
+# object and can be compared by identity. Shared configs are read-only: copy first.
+CONFIG_INTERN_MAX_ENTRIES = 4096
+
+_config_intern: Dict[Tuple[Tuple[str, Any], ...], Dict[str, Any]] = {}
+
+def intern_config(config: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Return the shared config object equal to config (key order does not matter).
+    """
+    try:
+        key = tuple(sorted(config.items()))
+        shared = _config_intern.get(key)
+    except TypeError:
+        # Unhashable values (never produced by the converter) are not interned
+        return config
+    if shared is None:
+        if len(_config_intern) >= CONFIG_INTERN_MAX_ENTRIES:
+            _config_intern.clear()
+        shared = _config_intern[key] = dict(config)
+    return shared
+
+def append_span(spans: List[Dict[str, Any]], text: str, config: Dict[str, Any]) -> None:
+    """
+    Append a run to spans, merging it into the previous span when it has the same
+    (interned) config object.
+    """
+    if not text:
+        return
+    if spans and spans[-1]["config"] is config:
+        spans[-1]["text"] += text
+    else:
+        spans.append({"text": text, "config": config})
+
+def chars_to_spans(chars: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Group per-character RichTextLines chars into spans with interned configs.
+    """
+    spans = []
+    run: List[str] = []
+    run_config = None
+    previous = None
+    for char_obj in chars:
+        config = char_obj.get('config', {})
+        # Decoded JSON gives every char its own dict: equality is checked only
+        # against the previous char, and interned once per run
+        if config is not previous and config != previous:
+            if run:
+                append_span(spans, "".join(run), run_config)
+                run = []
+            previous = config
+            run_config = intern_config(config)
+        run.append(char_obj.get('char', ''))
+    if run:
+        append_span(spans, "".join(run), run_config)
+    return spans
+
+def spans_to_chars(spans: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Expand spans into per-character RichTextLines chars.
+    All chars of a span reference the span's config (no per-char copies).
+    """
+    chars = []
+    for span in spans:
+        config = span["config"]
+        chars.extend({"char": c, "config": config} for c in span["text"])
+    return chars
+
+def decode_rich_text_lines(rich_text_lines: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    RichTextLines (DATA) -> internal span lines.
+    """
+    return [
+        {"spans": chars_to_spans(line.get('chars', [])), "config": line.get('config', {})}
+        for line in rich_text_lines
+    ]
+
+def encode_rich_text_lines(lines: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Internal span lines -> RichTextLines (DATA).
+    """
+    return [{"chars": spans_to_chars(line["spans"]), "config": line["config"]} for line in lines]
+
+# Slate marks per interned config, keyed by id; the entry holds the config so the id stays valid
+_slate_attrs_memo: Dict[int, Tuple[Dict[str, Any], Dict[str, Any]]] = {}
+
+def _slate_attrs(cfg: Dict[str, Any]) -> Dict[str, Any]:
+    entry = _slate_attrs_memo.get(id(cfg))
+    if entry is not None and entry[0] is cfg:
+        return entry[1]
+    attrs = _build_slate_attrs(cfg)
+    if len(_slate_attrs_memo) >= CONFIG_INTERN_MAX_ENTRIES:
+        _slate_attrs_memo.clear()
+    _slate_attrs_memo[id(cfg)] = (cfg, attrs)
+    return attrs
+
+def _build_slate_attrs(cfg: Dict[str, Any]) -> Dict[str, Any]:
+    attrs = {}
+    if cfg.get(TEXT_ATTRS["WEIGHT"]) == "bold": attrs["bold"] = True
+    if cfg.get(TEXT_ATTRS["STYLE"]) == "italic": attrs["italic"] = True
+    if cfg.get(TEXT_ATTRS["UNDERLINE"]): attrs["underline"] = True
+    if cfg.get(TEXT_ATTRS["STRIKE_THROUGH"]): attrs["strikethrough"] = True
+    if cfg.get(TEXT_ATTRS["COLOR"]): attrs["color"] = cfg[TEXT_ATTRS["COLOR"]]
+    if cfg.get(TEXT_ATTRS["BACKGROUND"]): attrs["backgroundColor"] = cfg[TEXT_ATTRS["BACKGROUND"]]
+    return attrs
+
+def encode_slate_lines(lines: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Internal span lines -> Slate (ORIGIN_DATA).
+    """
+    slate_lines = []
+    for line in lines:
+        children = [{"text": span["text"], **_slate_attrs(span["config"])} for span in line["spans"]]
+        slate_lines.append({"children": children or [{"text": ""}]})
+    return slate_lines
+
+def decode_slate_lines(slate_lines: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Slate (ORIGIN_DATA) -> internal span lines.
+    Slate only carries inline marks, so block config (lists, size, links) is not recovered.
+    """
+    lines = []
+    for slate_line in slate_lines:
+        spans = []
+        for child in slate_line.get('children', []):
+            config = {}
+            if child.get('bold'): config[TEXT_ATTRS["WEIGHT"]] = "bold"
+            if child.get('italic'): config[TEXT_ATTRS["STYLE"]] = "italic"
+            if child.get('underline'): config[TEXT_ATTRS["UNDERLINE"]] = "true"
+            if child.get('strikethrough'): config[TEXT_ATTRS["STRIKE_THROUGH"]] = "true"
+            if child.get('color'): config[TEXT_ATTRS["COLOR"]] = child['color']
+            if child.get('backgroundColor'): config[TEXT_ATTRS["BACKGROUND"]] = child['backgroundColor']
+            append_span(spans, child.get('text', ''), intern_config(config))
+        lines.append({"spans": spans, "config": {}})
+    return lines
+
+# Which text attrs a client renders: "data" (RichTextLines), "slate" (ORIGIN_DATA) or both
+DELTA_FORMATS = {
+    "both": (TEXT_ATTRS["DATA"], TEXT_ATTRS["ORIGIN_DATA"]),
+    "data": (TEXT_ATTRS["DATA"],),
+    "slate": (TEXT_ATTRS["ORIGIN_DATA"],),
+}
+
+_ATTR_ENCODERS = {
+    TEXT_ATTRS["DATA"]: encode_rich_text_lines,
+    TEXT_ATTRS["ORIGIN_DATA"]: encode_slate_lines,
+}
+
+def encode_delta_attrs(lines: List[Dict[str, Any]], delta_format: str = "both") -> Dict[str, str]:
+    """
+    Encode span lines into the text attrs of one block, only for the requested format(s).
+    """
+    if delta_format not in DELTA_FORMATS:
+        raise ValueError(f"Unknown delta format: {delta_format}")
+    return {attr: json_codec.dumps(_ATTR_ENCODERS[attr](lines)) for attr in DELTA_FORMATS[delta_format]}
+
+def decode_delta_lines(attrs: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+    """
+    Span lines of a text block from DATA, or from ORIGIN_DATA when DATA is absent.
+    Returns None when neither is present or parseable.
+    """
+    for attr, decode in ((TEXT_ATTRS["DATA"], decode_rich_text_lines), (TEXT_ATTRS["ORIGIN_DATA"], decode_slate_lines)):
+        data = attrs.get(attr)
+        if not data:
+            continue
+        try:
+            lines = json_codec.loads(data) if isinstance(data, str) else data
+            if isinstance(lines, list):
+                return decode(lines)
+        except (json.JSONDecodeError, AttributeError, TypeError):
+            pass
+    return None
+
+def derive_delta_attrs(delta: Dict[str, Any], delta_format: str = "both") -> Dict[str, Any]:
+    """
+    Fill in the text attrs a block is missing for delta_format (e.g. ORIGIN_DATA for a
+    block generated with delta_format="data"), decoding the one it has. Returns a new delta.
+    """
+    attrs = delta.get('attrs', {})
+    missing = [attr for attr in DELTA_FORMATS[delta_format] if not attrs.get(attr)]
+    if not missing:
+        return delta
+    lines = decode_delta_lines(attrs)
+    if lines is None:
+        return delta
+    derived = {attr: json_codec.dumps(_ATTR_ENCODERS[attr](lines)) for attr in missing}
+    return {**delta, "attrs": {**attrs, **derived}}
+
+# --- Compact Markdown ---
+# Presentational styles (color, background, font family/size) are verbose as HTML spans.
+# In compact mode each distinct combination becomes a short placeholder tag <tN>...</tN>
+# with a legend {"tN": {attr: value}}; expand_style_placeholders turns the tags back
+# into spans so markdown_to_delta restores the styling.
+
+_PRESENTATIONAL_ATTRS = (TEXT_ATTRS["COLOR"], TEXT_ATTRS["BACKGROUND"], TEXT_ATTRS["FAMILY"], TEXT_ATTRS["SIZE"])
+_PLACEHOLDER_RE = re.compile(r'<(/?)(t\d+)>')
+
+def _style_declarations(style: Dict[str, Any]) -> str:
+    declarations = []
+    if style.get(TEXT_ATTRS["COLOR"]):
+        declarations.append(f"color: {style[TEXT_ATTRS['COLOR']]}")
+    if style.get(TEXT_ATTRS["BACKGROUND"]):
+        declarations.append(f"background-color: {style[TEXT_ATTRS['BACKGROUND']]}")
+    if style.get(TEXT_ATTRS["FAMILY"]):
+        declarations.append(f"font-family: {style[TEXT_ATTRS['FAMILY']]}")
+    if style.get(TEXT_ATTRS["SIZE"]):
+        declarations.append(f"font-size: {style[TEXT_ATTRS['SIZE']]}px")
+    return "; ".join(declarations)
+
+def expand_style_placeholders(markdown_text: str, styles: Dict[str, Dict[str, Any]]) -> str:
+    """
+    Replace compact-mode placeholder tags with the <span style="..."> they stand for.
+    Tags missing from styles (e.g. invented by the LLM) are dropped, keeping their text.
+    """
+    if "<t" not in markdown_text and "</t" not in markdown_text:
+        return markdown_text
+
+    def expand(m):
+        style = styles.get(m.group(2))
+        if not style:
+            return ""
+        return "</span>" if m.group(1) else f'<span style="{_style_declarations(style)}">'
+
+    return _PLACEHOLDER_RE.sub(expand, markdown_text)
+
+def _spans_to_markdown(spans: List[Dict[str, Any]], style_ids: Optional[Dict[tuple, str]] = None) -> str:
+    """
+    style_ids: compact mode; maps a presentational style (tuple of attr/value pairs) to its
+    placeholder name and is filled in as new combinations appear.
+    """
+    parts = []
+    for span in spans:
+        config = span['config']
+
+        # Normalize NBSP to normal space for Markdown compatibility
+        # This ensures LLM sees normal spaces and can preserve them
+        text = span['text'].replace('\u00A0', ' ')
+
+        # Apply styles
+        # Link wrapper
+        if config.get(TEXT_ATTRS["LINK"]):
+            text = f"[{text}]({config[TEXT_ATTRS['LINK']]})"
+
+        # Inline styles
+        if config.get(TEXT_ATTRS["WEIGHT"]) == "bold":
+            text = f"**{text}**"
+        if config.get(TEXT_ATTRS["STYLE"]) == "italic":
+            text = f"*{text}*"
+        if config.get(TEXT_ATTRS["UNDERLINE"]):
+            text = f"<u>{text}</u>"
+        if config.get(TEXT_ATTRS["STRIKE_THROUGH"]):
+            text = f"~~{text}~~"
+        if style_ids is not None:
+            style = tuple((attr, config[attr]) for attr in _PRESENTATIONAL_ATTRS if config.get(attr))
+            if style:
+                name = style_ids.setdefault(style, f"t{len(style_ids) + 1}")
+                text = f"<{name}>{text}</{name}>"
+            parts.append(text)
+            continue
+
+        if config.get(TEXT_ATTRS["COLOR"]):
+            text = f'<span style="color: {config[TEXT_ATTRS["COLOR"]]}">{text}</span>'
+        if config.get(TEXT_ATTRS["BACKGROUND"]):
+            text = f'<span style="background-color: {config[TEXT_ATTRS["BACKGROUND"]]}">{text}</span>'
+        if config.get(TEXT_ATTRS["FAMILY"]):
+            text = f'<span style="font-family: {config[TEXT_ATTRS["FAMILY"]]}">{text}</span>'
+        if config.get(TEXT_ATTRS["SIZE"]):
+            # Only apply size if it's not a heading size implied by context (simplified)
+            text = f'<span style="font-size: {config[TEXT_ATTRS["SIZE"]]}px">{text}</span>'
+
+        parts.append(text)
+    return "".join(parts)
+
+def _line_to_markdown(line: Dict[str, Any], style_ids: Optional[Dict[tuple, str]] = None) -> str:
+    """
+    Internal span line -> one Markdown line.
+    """
+    line_config = line['config']
+
+    # Handle Block Attributes
+    if line_config.get(TEXT_ATTRS["DIVIDING_LINE"]):
+        return "---"
+
+    prefix = ""
+    if line_config.get(TEXT_ATTRS["ORDERED_LIST_LEVEL"]):
+        level = int(line_config.get(TEXT_ATTRS["ORDERED_LIST_LEVEL"], 1))
+        start = line_config.get(TEXT_ATTRS["ORDERED_LIST_START"], 1)
+        indent = "   " * (level - 1)
+        prefix = f"{indent}{start}. "
+    elif line_config.get(TEXT_ATTRS["UNORDERED_LIST_LEVEL"]):
+        level = int(line_config.get(TEXT_ATTRS["UNORDERED_LIST_LEVEL"], 1))
+        indent = "   " * (level - 1)
+        prefix = f"{indent}- "
+
+    return prefix + _spans_to_markdown(line['spans'], style_ids)
+
+def _slate_line_to_markdown(line: Dict[str, Any]) -> str:
+    # --- Slate Format Handling ---
+    # Example: {"children": [{"text": "Hello", "bold": true}]}
+    # Assuming flat list of blocks for now based on observed ORIGIN_DATA
+    # TODO: Handle block types if present in Slate data (e.g. type: 'list-item')
+    line_md = ""
+    for child in line.get("children", []):
+        text = child.get("text", "")
+        if not text: continue
+
+        # Apply styles
+        if child.get("bold") or child.get("WEIGHT") == "bold":
+            text = f"**{text}**"
+        if child.get("italic") or child.get("STYLE") == "italic":
+            text = f"*{text}*"
+        if child.get("underline") or child.get("UNDERLINE"):
+            text = f"<u>{text}</u>"
+        if child.get("strikethrough") or child.get("STRIKE_THROUGH"):
+            text = f"~~{text}~~"
+
+        line_md += text
+    return line_md
+
+# --- Conversion Cache ---
+# The same context is converted several times per request (agent, evaluation retry,
+# chat) and again on every chat turn, so delta_to_markdown results are cached by a
+# content hash of the input. String inputs are hashed as-is, skipping JSON parsing.
+DELTA_MARKDOWN_CACHE_MAX_ENTRIES = 256
+DELTA_MARKDOWN_CACHE_MAX_BYTES = 16 * 1024 * 1024
+
+def _cached_size(value: Any) -> int:
+    # Compact results are (markdown, legend); the legend is small next to the text
+    return sys.getsizeof(value[0]) if isinstance(value, tuple) else sys.getsizeof(value)
+
+delta_markdown_cache = BoundedLRUCache(
+    max_entries=DELTA_MARKDOWN_CACHE_MAX_ENTRIES,
+    max_bytes=DELTA_MARKDOWN_CACHE_MAX_BYTES,
+    sizeof=_cached_size,
+)
+
+def delta_cache_key(delta_set_input: Any) -> Optional[str]:
+    """
+    Fast content hash of a DeltaSet input (raw JSON string, or dict normalized with sorted keys).
+    """
+    if isinstance(delta_set_input, str):
+        payload = delta_set_input
+    elif isinstance(delta_set_input, (dict, list)):
+        try:
+            payload = json_codec.dumps(delta_set_input, sort_keys=True)
+        except (TypeError, ValueError):
+            return None
+    else:
+        return None
+    return hashlib.blake2b(payload.encode('utf-8', 'surrogatepass'), digest_size=16).hexdigest()
+
+def delta_to_markdown(delta_set_input: str | Dict[str, Any], use_cache: bool = True) -> str:
     """
     Convert DeltaSet JSON to Markdown, supporting all frontend rich text attributes.
+    Results are cached by content hash (see delta_markdown_cache).
     """
+    key = delta_cache_key(delta_set_input) if use_cache else None
+    if key is not None:
+        cached = delta_markdown_cache.get(key)
+        if cached is not None:
+            return cached
+
+    markdown = _delta_to_markdown(delta_set_input)
+    if key is not None:
+        delta_markdown_cache.set(key, markdown)
+    return markdown
+
+def delta_to_compact_markdown(delta_set_input: str | Dict[str, Any],
+                              use_cache: bool = True) -> Tuple[str, Dict[str, Dict[str, Any]]]:
+    """
+    Like delta_to_markdown, but presentational spans become placeholder tags (<t1>...</t1>).
+    Returns (markdown, styles); pass styles to markdown_to_delta to restore the styling.
+    """
+    key = delta_cache_key(delta_set_input) if use_cache else None
+    if key is not None:
+        key = ("compact", key)
+        cached = delta_markdown_cache.get(key)
+        if cached is not None:
+            return cached
+
+    style_ids: Dict[tuple, str] = {}
+    markdown = _delta_to_markdown(delta_set_input, style_ids)
+    styles = {name: dict(style) for style, name in style_ids.items()}
+    if key is not None:
+        delta_markdown_cache.set(key, (markdown, styles))
+    return markdown, styles
+
+def _delta_to_markdown(delta_set_input: str | Dict[str, Any], style_ids: Optional[Dict[tuple, str]] = None) -> str:
     if isinstance(delta_set_input, str):
         try:
-            delta_set = json.loads(delta_set_input)
+            delta_set = json_codec.loads(delta_set_input)
         except json.JSONDecodeError:
             return delta_set_input
     else:
@@ -67,7 +472,7 @@ def delta_to_markdown(delta_set_input: str | Dict[str, Any]) -> str:
             
         try:
             if isinstance(data_str, str):
-                rich_text_lines = json.loads(data_str)
+                rich_text_lines = json_codec.loads(data_str)
             else:
                 rich_text_lines = data_str
         except json.JSONDecodeError:
@@ -79,466 +484,646 @@ def delta_to_markdown(delta_set_input: str | Dict[str, Any]) -> str:
         for line in rich_text_lines:
             # Check if it's Slate format (ORIGIN_DATA) or RichTextLines (DATA)
             if "children" in line:
-                # --- Slate Format Handling ---
-                # Example: {"children": [{"text": "Hello", "bold": true}]}
-                # We need to convert this to Markdown manually or map to our structure
-                # For simplicity, let's extract text and basic styles
-                
-                # Block level (simplified, as Slate structure might be nested differently)
-                # Assuming flat list of blocks for now based on observed ORIGIN_DATA
-                prefix = ""
-                # TODO: Handle block types if present in Slate data (e.g. type: 'list-item')
-                
-                line_md = prefix
-                children = line.get("children", [])
-                for child in children:
-                    text = child.get("text", "")
-                    if not text: continue
-                    
-                    # Apply styles
-                    if child.get("bold") or child.get("WEIGHT") == "bold":
-                        text = f"**{text}**"
-                    if child.get("italic") or child.get("STYLE") == "italic":
-                        text = f"*{text}*"
-                    if child.get("underline") or child.get("UNDERLINE"):
-                        text = f"<u>{text}</u>"
-                    if child.get("strikethrough") or child.get("STRIKE_THROUGH"):
-                        text = f"~~{text}~~"
-                    
-                    line_md += text
-                
-                markdown_lines.append(line_md)
-                continue
-
-            # --- RichTextLines Format Handling (DATA) ---
-            line_config = line.get('config', {})
-            chars = line.get('chars', [])
-            
-            # Handle Block Attributes
-            prefix = ""
-            if line_config.get(TEXT_ATTRS["DIVIDING_LINE"]):
-                markdown_lines.append("---")
-                continue
-                
-            if line_config.get(TEXT_ATTRS["ORDERED_LIST_LEVEL"]):
-                level = int(line_config.get(TEXT_ATTRS["ORDERED_LIST_LEVEL"], 1))
-                start = line_config.get(TEXT_ATTRS["ORDERED_LIST_START"], 1)
-                indent = "   " * (level - 1)
-                prefix = f"{indent}{start}. "
-            elif line_config.get(TEXT_ATTRS["UNORDERED_LIST_LEVEL"]):
-                level = int(line_config.get(TEXT_ATTRS["UNORDERED_LIST_LEVEL"], 1))
-                indent = "   " * (level - 1)
-                prefix = f"{indent}- "
-            
-            line_md = prefix
-            current_config = {}
-            
-            # Group characters by config to handle links and styles efficiently
-            grouped_chars = []
-            if chars:
-                current_group = {"text": chars[0].get('char', ''), "config": chars[0].get('config', {})}
-                for i in range(1, len(chars)):
-                    char_obj = chars[i]
-                    config = char_obj.get('config', {})
-                    # Check if config is same
-                    if config == current_group['config']:
-                        current_group['text'] += char_obj.get('char', '')
-                    else:
-                        grouped_chars.append(current_group)
-                        current_group = {"text": char_obj.get('char', ''), "config": config}
-                grouped_chars.append(current_group)
-            
-            for group in grouped_chars:
-                text = group['text']
-                config = group['config']
-                
-                # Normalize NBSP to normal space for Markdown compatibility
-                # This ensures LLM sees normal spaces and can preserve them
-                text = text.replace('\u00A0', ' ')
-                
-                # Apply styles
-                # Link wrapper
-                if config.get(TEXT_ATTRS["LINK"]):
-                    text = f"[{text}]({config[TEXT_ATTRS['LINK']]})"
-                
-                # Inline styles
-                if config.get(TEXT_ATTRS["WEIGHT"]) == "bold":
-                    text = f"**{text}**"
-                if config.get(TEXT_ATTRS["STYLE"]) == "italic":
-                    text = f"*{text}*"
-                if config.get(TEXT_ATTRS["UNDERLINE"]):
-                    text = f"<u>{text}</u>"
-                if config.get(TEXT_ATTRS["STRIKE_THROUGH"]):
-                    text = f"~~{text}~~"
-                if config.get(TEXT_ATTRS["COLOR"]):
-                    text = f'<span style="color: {config[TEXT_ATTRS["COLOR"]]}">{text}</span>'
-                if config.get(TEXT_ATTRS["BACKGROUND"]):
-                    text = f'<span style="background-color: {config[TEXT_ATTRS["BACKGROUND"]]}">{text}</span>'
-                if config.get(TEXT_ATTRS["FAMILY"]):
-                    text = f'<span style="font-family: {config[TEXT_ATTRS["FAMILY"]]}">{text}</span>'
-                if config.get(TEXT_ATTRS["SIZE"]):
-                    # Only apply size if it's not a heading size implied by context (simplified)
-                    text = f'<span style="font-size: {config[TEXT_ATTRS["SIZE"]]}px">{text}</span>'
-                    
-                line_md += text
-            
-            markdown_lines.append(line_md)
+                markdown_lines.append(_slate_line_to_markdown(line))
+            else:
+                # --- RichTextLines Format Handling (DATA) ---
+                # Decoded line by line so spans are built in the same pass
+                markdown_lines.append(_line_to_markdown(decode_rich_text_lines([line])[0], style_ids))
         
     return "\n\n".join(markdown_lines)
 
+def _op_inline_markdown(text: str, attributes: Dict[str, Any]) -> str:
+    if attributes.get("bold"):
+        text = f"**{text}**"
+    if attributes.get("italic"):
+        text = f"*{text}*"
+    if attributes.get("underline"):
+        text = f"<u>{text}</u>"
+    if attributes.get("strike"):
+        text = f"~~{text}~~"
+    if attributes.get("link"):
+        text = f"[{text}]({attributes['link']})"
+    return text
+
 def _ops_to_markdown(ops: List[Dict[str, Any]]) -> str:
     """
     Convert BlockKit Delta ops to Markdown.
+    Streaming line builder: inline runs are collected for the current line and the
+    line is emitted when its newline op arrives, since BlockKit puts block attributes
+    (header, list) on the newline. One pass, no re-scanning of the output.
     """
-    markdown_text = ""
+    lines: List[str] = []
+    parts: List[str] = []
+    ordered_number = 0  # position in the current ordered list (0 = not in one)
+
     for op in ops:
         insert = op.get("insert")
         if not isinstance(insert, str):
             continue
-            
-        attributes = op.get("attributes", {})
-        text = insert
-        
-        # Apply inline styles
-        if attributes.get("bold"):
-            text = f"**{text}**"
-        if attributes.get("italic"):
-            text = f"*{text}*"
-        if attributes.get("underline"):
-            text = f"<u>{text}</u>"
-        if attributes.get("strike"):
-            text = f"~~{text}~~"
-        if attributes.get("link"):
-            text = f"[{text}]({attributes['link']})"
-            
-        # Handle block attributes (simplified)
-        # BlockKit usually puts block attributes on the newline character
-        if insert == "\n":
+        attributes = op.get("attributes") or {}
+
+        if "\n" not in insert:
+            parts.append(_op_inline_markdown(insert, attributes) if attributes else insert)
+            continue
+
+        *segments, tail = insert.split("\n")
+        for segment in segments:
+            if segment:
+                parts.append(_op_inline_markdown(segment, attributes))
+            content = "".join(parts)
+            parts = []
+
+            prefix = ""
             if attributes.get("header"):
-                level = attributes["header"]
-                markdown_text += "#" * level + " "
+                try:
+                    prefix = "#" * int(attributes["header"]) + " "
+                except (TypeError, ValueError):
+                    prefix = "# "
             elif attributes.get("list") == "ordered":
-                # This is tricky because we need to know the number. 
-                # Simplified: just use 1. for now, markdown renderers usually fix it
-                markdown_text = markdown_text.rstrip() + "\n1. " 
-                continue # Skip appending the newline char itself if we handled it
+                ordered_number += 1
+                prefix = f"{ordered_number}. "
             elif attributes.get("list") == "bullet":
-                markdown_text = markdown_text.rstrip() + "\n- "
-                continue
-                
-        markdown_text += text
-        
-    return markdown_text
+                prefix = "- "
+            if attributes.get("list") != "ordered":
+                ordered_number = 0
+            lines.append(prefix + content)
+        if tail:
+            parts.append(_op_inline_markdown(tail, attributes))
+
+    if parts:
+        lines.append("".join(parts))
+    return "\n".join(lines)
 
 def parse_inline_styles(text: str, base_config: Dict[str, Any]) -> List[Dict[str, Any]]:
     """
-    Parse Markdown/HTML mixed text into chars with config.
-    Supports: **Bold**, *Italic*, <u>Underline</u>, ~~Strike~~, [Link](url), <span> styles.
+    Parse Markdown/HTML mixed text into chars with config (RichTextLines wire format).
     """
-    # This is a simplified parser. For production, a proper AST parser is better.
-    # We will use a regex-based tokenizer.
-    
-    # Tokens:
-    # ** -> Bold
-    # * -> Italic
-    # <u>, </u> -> Underline
-    # ~~ -> Strike
-    # <span ...>, </span> -> Span attributes
-    # [text](url) -> Link (Special handling)
-    
-    chars_data = []
-    
-    # Regex for Link: \[([^\]]+)\]\(([^)]+)\)
-    # We process links first as they contain other text
-    
-    # To avoid complex recursion, we'll process sequentially.
-    # Current state
-    state = {
-        "bold": False,
-        "italic": False,
-        "underline": False,
-        "strike": False,
-        "color": None,
-        "background": None,
-        "fontSize": None,
-        "fontFamily": None,
-        "link": None
-    }
+    return spans_to_chars(parse_inline_spans(text, base_config))
+
+# --- Inline Lexer / AST ---
+# One compiled pattern scans the text once; tokens build a small AST whose nodes are
+# bold / italic / underline / strike / span / link (plus text leaves). Styled runs are
+# then emitted from the tree in a single walk.
+
+_INLINE_TOKEN_RE = re.compile(
+    r'(\*\*|\*|<u>|</u>|~~'
+    r'|<span[^>]*>|</span>|<font[^>]*>|</font>'
+    r'|\[[^\]]+\]\([^)]+\))'
+)
+_INLINE_MARKER_RE = re.compile(r'[*~<\[]')
+_TAG_ATTR_RE = re.compile(r'(\w+)="([^"]*)"')
+_FONT_SIZE_RE = re.compile(r'(\d+)px')
+
+# Fixed tokens -> (action, node kind, tag)
+_FIXED_TOKENS = {
+    "**": ("toggle", "bold", None),
+    "*": ("toggle", "italic", None),
+    "~~": ("toggle", "strike", None),
+    "<u>": ("open", "underline", None),
+    "</u>": ("close", "underline", None),
+    "</span>": ("close", "span", "span"),
+    "</font>": ("close", "span", "font"),
+}
+
+_KIND_STYLES = {
+    "bold": ((TEXT_ATTRS["WEIGHT"], "bold"),),
+    "italic": ((TEXT_ATTRS["STYLE"], "italic"),),
+    "underline": ((TEXT_ATTRS["UNDERLINE"], "true"),),
+    "strike": ((TEXT_ATTRS["STRIKE_THROUGH"], "true"),),
+}
+
+# Config key order of a styled run (base config keys always come first)
+_INLINE_STYLE_ORDER = (
+    TEXT_ATTRS["WEIGHT"], TEXT_ATTRS["STYLE"], TEXT_ATTRS["UNDERLINE"], TEXT_ATTRS["STRIKE_THROUGH"],
+    TEXT_ATTRS["COLOR"], TEXT_ATTRS["BACKGROUND"], TEXT_ATTRS["SIZE"], TEXT_ATTRS["FAMILY"], TEXT_ATTRS["LINK"],
+)
+
+class InlineNode:
+    """
+    AST node for inline Markdown/HTML.
+    kind: "root" | "bold" | "italic" | "underline" | "strike" | "span" | "link"
+    value: the url for "link", the tag name ("span"/"font") for "span".
+    style: (TEXT_ATTRS key, value) pairs the node applies to its subtree.
+    children: InlineNode or str (text leaves).
+    """
+    __slots__ = ("kind", "value", "style", "children")
+
+    def __init__(self, kind: str, value: Any = None, style: Tuple[Tuple[str, Any], ...] = ()):
+        self.kind = kind
+        self.value = value
+        self.style = style or _KIND_STYLES.get(kind, ())
+        self.children: List[Any] = []
+
+    def __repr__(self) -> str:
+        return f"InlineNode({self.kind!r}, {self.value!r}, {self.children!r})"
+
+@lru_cache(maxsize=512)
+def parse_span_style(tag: str) -> Tuple[Tuple[str, Any], ...]:
+    """
+    Parse a <span ...>/<font ...> opening tag into (TEXT_ATTRS key, value) pairs.
+    Cached: LLM output repeats the same few tags many times.
+    """
+    style = {}
+    for name, value in _TAG_ATTR_RE.findall(tag):
+        name = name.lower()
+        if name == "color":
+            # color="..." (Non-standard but supported)
+            style[TEXT_ATTRS["COLOR"]] = value
+        elif name == "style":
+            for declaration in value.split(';'):
+                prop, sep, prop_value = declaration.partition(':')
+                if not sep:
+                    continue
+                prop = prop.strip().lower()
+                prop_value = prop_value.strip()
+                if prop == "color":
+                    style[TEXT_ATTRS["COLOR"]] = prop_value
+                elif prop == "background-color":
+                    style[TEXT_ATTRS["BACKGROUND"]] = prop_value
+                elif prop == "font-size":
+                    fs_m = _FONT_SIZE_RE.match(prop_value)
+                    if fs_m: style[TEXT_ATTRS["SIZE"]] = int(fs_m.group(1))
+                elif prop == "font-family":
+                    style[TEXT_ATTRS["FAMILY"]] = prop_value
+    return tuple(style.items())
+
+def _close_node(stack: List[InlineNode], index: int) -> None:
+    """
+    Close stack[index]. Nodes opened after it are closed too and re-opened
+    underneath its parent, so mis-nested markers (**a *b** c*) keep their styles.
+    """
+    reopened = stack[index + 1:]
+    del stack[index:]
+    for node in reopened:
+        clone = InlineNode(node.kind, node.value, node.style)
+        stack[-1].children.append(clone)
+        stack.append(clone)
+
+def _find_open(stack: List[InlineNode], kind: str, tag: Optional[str] = None) -> int:
+    for i in range(len(stack) - 1, 0, -1):
+        node = stack[i]
+        if node.kind == kind and (tag is None or node.value == tag):
+            return i
+    return -1
+
+def parse_inline_ast(text: str) -> InlineNode:
+    """
+    Tokenize inline Markdown/HTML in one pass and build its AST.
+    Unclosed markers style the rest of the text; stray closing tags are ignored.
+    """
+    root = InlineNode("root")
+    stack = [root]
+    # split() alternates text and token parts: even indexes are text, odd are tokens
+    parts = _INLINE_TOKEN_RE.split(text)
+    for i, part in enumerate(parts):
+        if not part:
+            continue
+        if not i & 1:
+            stack[-1].children.append(part)
+            continue
+
+        fixed = _FIXED_TOKENS.get(part)
+        if fixed:
+            action, kind, tag = fixed
+            index = _find_open(stack, kind, tag) if action != "open" else -1
+            if index > 0:
+                _close_node(stack, index)
+            elif action != "close":
+                node = InlineNode(kind)
+                stack[-1].children.append(node)
+                stack.append(node)
+        elif part[0] == '<':
+            # <span ...> / <font ...>
+            node = InlineNode("span", part[1:5], parse_span_style(part))
+            stack[-1].children.append(node)
+            stack.append(node)
+        else:
+            # [text](url): link text has no ']', so the first '](' splits it.
+            # It is lexed on its own, so markers inside it stay inside the link.
+            split_at = part.index('](')
+            url = part[split_at + 2:-1]
+            node = InlineNode("link", url, ((TEXT_ATTRS["LINK"], url),))
+            node.children = parse_inline_ast(part[1:split_at]).children
+            stack[-1].children.append(node)
+
+    return root
+
+def _style_config(base_config: Dict[str, Any], active: Dict[str, Any]) -> Dict[str, Any]:
+    config = base_config.copy()
+    for key in _INLINE_STYLE_ORDER:
+        if key in active:
+            config[key] = active[key]
+    return intern_config(config)
+
+def inline_ast_to_spans(root: InlineNode, base_config: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Emit styled runs from an inline AST (iterative walk, linear in the number of nodes).
+    The config is built once per styled node and shared by all of its text children.
+    """
+    spans = []
+    # Each frame: (children iterator, active inline style, config of this subtree)
+    frames = [(iter(root.children), {}, intern_config(base_config))]
+    while frames:
+        children, active, config = frames[-1]
+        for node in children:
+            if node.__class__ is str:
+                append_span(spans, node, config)
+            elif node.children:
+                child_active = active.copy()
+                child_active.update(node.style)
+                frames.append((iter(node.children), child_active, _style_config(base_config, child_active)))
+                break
+        else:
+            frames.pop()
+    return spans
+
+def parse_inline_spans(text: str, base_config: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Parse Markdown/HTML mixed text into spans.
+    Supports: **Bold**, *Italic*, <u>Underline</u>, ~~Strike~~, [Link](url), <span>/<font> styles.
+    """
+    if not text:
+        return []
+    if not _INLINE_MARKER_RE.search(text):
+        # Fast path: plain text is a single run
+        return [{"text": text, "config": intern_config(base_config)}]
+    return inline_ast_to_spans(parse_inline_ast(text), base_config)
+
+# Layout defaults for generated blocks
+PAGE_WIDTH = 800
+MARGIN_X = 40
+START_Y = 40
+LINE_HEIGHT = 24
+FONT_SIZE = 14
+BLOCK_GAP = 10
+# A dividing line only advances the canvas by DIVIDING_LINE_OFFSET inside a block
+# (plugin/src/text/constant.ts); as a block of its own it keeps a fixed height.
+DIVIDING_LINE_OFFSET = 6
+DIVIDING_LINE_HEIGHT = 10
+
+def measure_line(line: Dict[str, Any], width: float) -> Dict[str, Any]:
+    """
+    Lay out a span line the way the canvas does (glyph widths, char wrapping, list indent).
+    Returns text_layout.layout_runs output: {"lines", "line_count", "height"}.
+    A dividing line is not a text line: it counts no lines and is DIVIDING_LINE_OFFSET high.
+    """
+    line_config = line.get("config") or {}
+    if line_config.get(TEXT_ATTRS["DIVIDING_LINE"]):
+        return {"lines": [], "line_count": 0, "height": DIVIDING_LINE_OFFSET}
+    runs = []
+    for span in line["spans"]:
+        config = span["config"]
+        try:
+            size = float(config.get(TEXT_ATTRS["SIZE"]) or FONT_SIZE)
+        except (TypeError, ValueError):
+            size = FONT_SIZE
+        runs.append((span["text"], size, config.get(TEXT_ATTRS["WEIGHT"]) == "bold"))
+    level = line_config.get(TEXT_ATTRS["ORDERED_LIST_LEVEL"]) or line_config.get(TEXT_ATTRS["UNORDERED_LIST_LEVEL"])
+    try:
+        line_height = float(line_config.get(TEXT_ATTRS["LINE_HEIGHT"]) or text_layout.DEFAULT_LINE_HEIGHT)
+    except (TypeError, ValueError):
+        line_height = text_layout.DEFAULT_LINE_HEIGHT
+    return text_layout.layout_runs(runs, width, text_layout.LIST_INDENT.get(str(level), 0), line_height)
+
+def measure_markdown(markdown_text: str, width: float) -> Dict[str, Any]:
+    """
+    Rendered size of Markdown inside one text block of the given width:
+    {"height": px, "line_count": visual lines}.
+    """
+    height, line_count = 0.0, 0
+    for line in markdown_to_lines(markdown_text):
+        layout = measure_line(line, width)
+        height += layout["height"]
+        line_count += layout["line_count"]
+    return {"height": height, "line_count": line_count}
+
+def parse_markdown_line(p: str) -> Optional[Dict[str, Any]]:
+    """
+    Parse one Markdown line into an internal span line with its block height:
+    {"spans": [...], "config": line_config, "height": int}.
+    Returns None for empty/whitespace lines.
+    """
+    # Skip empty lines: standard markdown ignores multiple newlines,
+    # and keeping them would add excessive vertical space.
+    if not p.strip(): 
+        return None
     
-    # Helper to apply state to config
-    def get_config():
-        cfg = base_config.copy()
-        if state["bold"]: cfg[TEXT_ATTRS["WEIGHT"]] = "bold"
-        if state["italic"]: cfg[TEXT_ATTRS["STYLE"]] = "italic"
-        if state["underline"]: cfg[TEXT_ATTRS["UNDERLINE"]] = "true"
-        if state["strike"]: cfg[TEXT_ATTRS["STRIKE_THROUGH"]] = "true"
-        if state["color"]: cfg[TEXT_ATTRS["COLOR"]] = state["color"]
-        if state["background"]: cfg[TEXT_ATTRS["BACKGROUND"]] = state["background"]
-        if state["fontSize"]: cfg[TEXT_ATTRS["SIZE"]] = state["fontSize"]
-        if state["fontFamily"]: cfg[TEXT_ATTRS["FAMILY"]] = state["fontFamily"]
-        if state["link"]: cfg[TEXT_ATTRS["LINK"]] = state["link"]
-        return cfg
-
-    # Regex to split text into tokens
-    # Note: This regex is greedy and might fail on nested same-tags, but works for standard LLM output.
-    # Added Link regex and Font tag
-    token_pattern = re.compile(
-        r'(\*\*|'  # Bold
-        r'\*|'     # Italic
-        r'<u>|</u>|' # Underline
-        r'~~|'     # Strike
-        r'<span[^>]*>|</span>|' # Span
-        r'<font[^>]*>|</font>|' # Font
-        r'\[[^\]]+\]\([^)]+\))' # Link
-    )
+    p_rstripped = p.rstrip()
+    p_stripped = p.strip()
     
-    parts = token_pattern.split(text)
+    # Line Config
+    line_config = {}
+    content = p_rstripped
     
-    for part in parts:
-        if not part: continue
+    # Dividing Line
+    if p_stripped == '---' or p_stripped == '***':
+        line_config[TEXT_ATTRS["DIVIDING_LINE"]] = "true"
+        content = ""
+    else:
+        # Headings
+        if p_stripped.startswith('# '):
+            line_config[TEXT_ATTRS["SIZE"]] = 24
+            line_config[TEXT_ATTRS["WEIGHT"]] = "bold"
+            content = p_stripped[2:]
+        elif p_stripped.startswith('## '):
+            line_config[TEXT_ATTRS["SIZE"]] = 20
+            line_config[TEXT_ATTRS["WEIGHT"]] = "bold"
+            content = p_stripped[3:]
+        elif p_stripped.startswith('### '):
+            line_config[TEXT_ATTRS["SIZE"]] = 18
+            line_config[TEXT_ATTRS["WEIGHT"]] = "bold"
+            content = p_stripped[4:]
         
-        if part == '**':
-            state["bold"] = not state["bold"]
-        elif part == '*':
-            state["italic"] = not state["italic"]
-        elif part == '<u>':
-            state["underline"] = True
-        elif part == '</u>':
-            state["underline"] = False
-        elif part == '~~':
-            state["strike"] = not state["strike"]
-        elif part.startswith('<span'):
-            # Parse attributes
-            # color="..." (Non-standard but supported)
-            c_m = re.search(r'color="([^"]+)"', part)
-            if c_m: state["color"] = c_m.group(1)
-            
-            # style="..."
-            s_m = re.search(r'style="([^"]+)"', part)
-            if s_m:
-                style_content = s_m.group(1)
-                # color
-                c_style_m = re.search(r'color:\s*([^;]+)', style_content)
-                if c_style_m: state["color"] = c_style_m.group(1).strip()
-                # background-color
-                bg_m = re.search(r'background-color:\s*([^;]+)', style_content)
-                if bg_m: state["background"] = bg_m.group(1).strip()
-                # font-size
-                fs_m = re.search(r'font-size:\s*(\d+)px', style_content)
-                if fs_m: state["fontSize"] = int(fs_m.group(1))
-                # font-family
-                ff_m = re.search(r'font-family:\s*([^;]+)', style_content)
-                if ff_m: state["fontFamily"] = ff_m.group(1).strip()
-                
-        elif part == '</span>':
-            # Reset span attributes (Simplified: resets all span-related)
-            state["color"] = None
-            state["background"] = None
-            state["fontSize"] = None
-            state["fontFamily"] = None
-            
-        elif part.startswith('<font'):
-            # Parse font attributes
-            # color="..."
-            c_m = re.search(r'color="([^"]+)"', part)
-            if c_m: state["color"] = c_m.group(1)
-            
-        elif part == '</font>':
-            state["color"] = None
-            
-        elif part.startswith('[') and '](' in part and part.endswith(')'):
-            # Link: [text](url)
-            m = re.match(r'\[([^\]]+)\]\(([^)]+)\)', part)
-            if m:
-                link_text = m.group(1)
-                link_url = m.group(2)
-                # Recursively parse the text inside the link, but with link state set
-                old_link = state["link"]
-                state["link"] = link_url
-                # Recurse for inner styles
-                # Note: parse_inline_styles returns chars with config. We need to merge current state.
-                # But parse_inline_styles starts with base_config.
-                # We should pass current state as base_config?
-                # Yes, but base_config is dict.
-                # Let's construct a temporary base config from current state
-                temp_base = get_config()
-                inner_chars = parse_inline_styles(link_text, temp_base)
-                chars_data.extend(inner_chars)
-                
-                state["link"] = old_link
+        # Lists
+        # Use p_rstripped to preserve indentation for regex matching
         else:
-            # Plain text
-            for char in part:
-                chars_data.append({
-                    "char": char,
-                    "config": get_config()
-                })
-                
-    return chars_data
+            m_ol = re.match(r'^(\s*)(\d+)\.\s(.*)', p_rstripped)
+            m_ul = re.match(r'^(\s*)-\s(.*)', p_rstripped)
+            
+            if m_ol:
+                indent = m_ol.group(1)
+                start = m_ol.group(2)
+                content = m_ol.group(3)
+                level = len(indent) // 3 + 1 # Assume 3 spaces per level
+                line_config[TEXT_ATTRS["ORDERED_LIST_LEVEL"]] = str(level)
+                line_config[TEXT_ATTRS["ORDERED_LIST_START"]] = start
+            elif m_ul:
+                indent = m_ul.group(1)
+                content = m_ul.group(2)
+                level = len(indent) // 3 + 1
+                line_config[TEXT_ATTRS["UNORDERED_LIST_LEVEL"]] = str(level)
 
-def markdown_to_delta(markdown_text: str) -> str:
+
+    # Preserve consecutive spaces for frontend rendering
+    # Replace double spaces with " \u00A0" (Space + No-Break Space)
+    # This ensures that multiple spaces are not collapsed by HTML renderers
+    if content:
+        while "  " in content:
+            content = content.replace("  ", " \u00A0")
+
+    # Parse Inline Styles
+    # line.config has block attributes, span configs have inline attributes only,
+    # so block keys are filtered out of the base config once per line.
+    inline_base = {k: v for k, v in line_config.items() if k not in BLOCK_KEYS}
+    spans = parse_inline_spans(content, inline_base)
+    line = {"spans": spans, "config": line_config}
+    if line_config.get(TEXT_ATTRS["DIVIDING_LINE"]):
+        line["height"] = DIVIDING_LINE_HEIGHT
+    else:
+        line["height"] = math.ceil(measure_line(line, PAGE_WIDTH - 2 * MARGIN_X)["height"])
+    return line
+
+def markdown_to_lines(markdown_text: str) -> List[Dict[str, Any]]:
     """
-    Convert Markdown to DeltaSet JSON.
+    Convert Markdown to internal span lines (one per non-empty Markdown line).
     """
-    PAGE_WIDTH = 800
-    MARGIN_X = 40
-    START_Y = 40
-    LINE_HEIGHT = 24
-    FONT_SIZE = 14
-    CHARS_PER_LINE = int((PAGE_WIDTH - 2 * MARGIN_X) / FONT_SIZE * 1.5)
-    
-    delta_set = {}
-    current_y = START_Y
-    
     # Split by newline to handle lists and headings correctly
     # We treat each line as a potential separate block
-    lines = markdown_text.split('\n')
+    lines = []
+    for p in markdown_text.split('\n'):
+        line = parse_markdown_line(p)
+        if line is not None:
+            lines.append(line)
+    return lines
+
+def line_to_delta(line: Dict[str, Any], y: int, delta_id: Optional[str] = None,
+                  delta_format: str = "both") -> Dict[str, Any]:
+    """
+    Build one text Delta block from an internal span line.
+    The per-character DATA and/or the Slate ORIGIN_DATA are encoded here, at the edge;
+    delta_format picks which (see DELTA_FORMATS).
+    """
+    block = [{"spans": line["spans"], "config": line["config"]}]
+    delta_id = delta_id or str(uuid.uuid4())
+    return {
+        "id": delta_id,
+        "key": "text",
+        "x": MARGIN_X,
+        "y": y,
+        "width": PAGE_WIDTH - 2 * MARGIN_X,
+        "height": line["height"],
+        "attrs": encode_delta_attrs(block, delta_format),
+        "children": []
+    }
+
+def markdown_to_delta_set(markdown_text: str, delta_format: str = "both",
+                          styles: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """
+    Convert Markdown to a DeltaSet object ({id: delta}).
+    Only DATA/ORIGIN_DATA are JSON strings (the frontend attr format); the set itself is
+    returned as-is so callers do not pay a dumps/loads round trip.
+    styles: legend from delta_to_compact_markdown, restores placeholder-tagged styling.
+    """
+    if styles is not None:
+        markdown_text = expand_style_placeholders(markdown_text, styles)
+    delta_set = {}
+    current_y = START_Y
     
-    for p in lines:
-        # Skip empty lines (but allow lines with just spaces if they are relevant? 
-        # Usually empty lines in markdown are just spacing. 
-        # If we want to preserve vertical spacing, we should keep them.
-        # But the original code did `if not p: continue` after strip.
-        # Let's stick to ignoring purely empty/whitespace lines for now to avoid excessive vertical space,
-        # or we can allow them. Standard markdown ignores multiple newlines.
-        if not p.strip(): 
-            continue
-        
-        p_rstripped = p.rstrip()
-        p_stripped = p.strip()
-        
-        # Line Config
-        line_config = {}
-        content = p_rstripped
+    for line in markdown_to_lines(markdown_text):
+        delta = line_to_delta(line, current_y, delta_format=delta_format)
+        delta_set[delta["id"]] = delta
+        current_y += line["height"] + BLOCK_GAP
         
-        # Dividing Line
-        if p_stripped == '---' or p_stripped == '***':
-            line_config[TEXT_ATTRS["DIVIDING_LINE"]] = "true"
-            content = ""
-            height = 10
+    return delta_set
+
+def markdown_to_delta(markdown_text: str, delta_format: str = "both",
+                      styles: Optional[Dict[str, Dict[str, Any]]] = None) -> str:
+    """
+    Convert Markdown to DeltaSet JSON.
+    """
+    return json_codec.dumps(markdown_to_delta_set(markdown_text, delta_format, styles))
+
+# --- Incremental Conversion ---
+
+def _lines_hash(lines: List[Dict[str, Any]]) -> str:
+    """
+    Content hash of span lines (block config + styled runs), independent of ids and geometry.
+    """
+    payload = json_codec.dumps(
+        [[line["config"], [[span["text"], span["config"]] for span in line["spans"]]] for line in lines],
+        sort_keys=True
+    )
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+def _inline_hash(lines: List[Dict[str, Any]]) -> str:
+    """
+    Content hash of only what Slate (ORIGIN_DATA) carries: text and inline marks.
+    """
+    return _lines_hash(decode_slate_lines(encode_slate_lines(lines)))
+
+def is_text_delta_set(value: str | Dict[str, Any]) -> bool:
+    """
+    Whether value is a DeltaSet ({id: delta}) with at least one text block (not BlockKit ops).
+    """
+    if isinstance(value, str):
+        try:
+            value = json_codec.loads(value)
+        except json.JSONDecodeError:
+            return False
+    if not isinstance(value, dict) or "ops" in value:
+        return False
+    return any(isinstance(d, dict) and d.get('key') == 'text' for d in value.values())
+
+def _previous_text_blocks(previous_delta_set: str | Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Text blocks of a previous DeltaSet ordered by y, each with its decoded span lines
+    (None when undecodable) and whether they came from DATA.
+    """
+    if isinstance(previous_delta_set, str):
+        try:
+            previous_delta_set = json_codec.loads(previous_delta_set)
+        except json.JSONDecodeError:
+            return []
+    if not isinstance(previous_delta_set, dict) or "ops" in previous_delta_set:
+        return []
+
+    blocks = []
+    for delta in previous_delta_set.values():
+        if not isinstance(delta, dict) or delta.get('key') != 'text' or not delta.get('id'):
+            continue
+        attrs = delta.get('attrs', {})
+        blocks.append({"delta": delta, "lines": decode_delta_lines(attrs), "has_data": bool(attrs.get(TEXT_ATTRS["DATA"]))})
+    blocks.sort(key=lambda b: b["delta"].get('y', 0))
+    return blocks
+
+def markdown_to_delta_patch(markdown_text: str, previous_delta_set: str | Dict[str, Any],
+                            delta_format: str = "both",
+                            styles: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """
+    Diff-aware Markdown -> Delta conversion against the previous DeltaSet.
+    Lines whose content hash matches a previous text block keep that block's id and
+    geometry and are not re-emitted. Returns a patch:
+    {"inserted": {id: delta}, "updated": {id: delta}, "moved": {id: y}, "deleted": [id]}
+    "updated" blocks keep their id, x and width; "moved" lists unchanged blocks whose y
+    shifted because blocks above them changed height. Apply it with apply_delta_patch.
+    When a previous block has no DATA (it came from a delta_format="slate" client), its
+    lines are decoded from ORIGIN_DATA, which loses block config (lists, size, links).
+    Blocks are then compared on text and inline marks only, so a change that only touches
+    block config (e.g. a heading level) is not detected.
+    """
+    if styles is not None:
+        markdown_text = expand_style_placeholders(markdown_text, styles)
+    old_blocks = _previous_text_blocks(previous_delta_set)
+    new_lines = markdown_to_lines(markdown_text)
+    content_hash = _lines_hash if all(b["has_data"] for b in old_blocks) else _inline_hash
+    old_hashes = [content_hash(b["lines"]) if b["lines"] is not None else None for b in old_blocks]
+    new_hashes = [content_hash([line]) for line in new_lines]
+
+    patch = {"inserted": {}, "updated": {}, "moved": {}, "deleted": []}
+
+    def old_y(i):
+        return old_blocks[i]["delta"].get('y', START_Y)
+
+    def old_end(i):
+        delta = old_blocks[i]["delta"]
+        return delta.get('y', START_Y) + delta.get('height', 0) + BLOCK_GAP
+
+    def emit(line, y, reuse=None):
+        if reuse is None:
+            delta = line_to_delta(line, y, delta_format=delta_format)
+            patch["inserted"][delta["id"]] = delta
         else:
-            # Headings
-            if p_stripped.startswith('# '):
-                line_config[TEXT_ATTRS["SIZE"]] = 24
-                line_config[TEXT_ATTRS["WEIGHT"]] = "bold"
-                content = p_stripped[2:]
-            elif p_stripped.startswith('## '):
-                line_config[TEXT_ATTRS["SIZE"]] = 20
-                line_config[TEXT_ATTRS["WEIGHT"]] = "bold"
-                content = p_stripped[3:]
-            elif p_stripped.startswith('### '):
-                line_config[TEXT_ATTRS["SIZE"]] = 18
-                line_config[TEXT_ATTRS["WEIGHT"]] = "bold"
-                content = p_stripped[4:]
-            
-            # Lists
-            # Use p_rstripped to preserve indentation for regex matching
-            else:
-                m_ol = re.match(r'^(\s*)(\d+)\.\s(.*)', p_rstripped)
-                m_ul = re.match(r'^(\s*)-\s(.*)', p_rstripped)
-                
-                if m_ol:
-                    indent = m_ol.group(1)
-                    start = m_ol.group(2)
-                    content = m_ol.group(3)
-                    level = len(indent) // 3 + 1 # Assume 3 spaces per level
-                    line_config[TEXT_ATTRS["ORDERED_LIST_LEVEL"]] = str(level)
-                    line_config[TEXT_ATTRS["ORDERED_LIST_START"]] = start
-                elif m_ul:
-                    indent = m_ul.group(1)
-                    content = m_ul.group(2)
-                    level = len(indent) // 3 + 1
-                    line_config[TEXT_ATTRS["UNORDERED_LIST_LEVEL"]] = str(level)
-
-            # Calculate height
-            lines_count = math.ceil(len(content) / CHARS_PER_LINE) if content else 1
-            if lines_count < 1: lines_count = 1
-            base_height = line_config.get(TEXT_ATTRS["SIZE"], FONT_SIZE) + 10
-            height = lines_count * base_height
-
-        # Preserve consecutive spaces for frontend rendering
-        # Replace double spaces with " \u00A0" (Space + No-Break Space)
-        # This ensures that multiple spaces are not collapsed by HTML renderers
-        if content:
-            while "  " in content:
-                content = content.replace("  ", " \u00A0")
-
-        # Parse Inline Styles
-        chars_data = parse_inline_styles(content, line_config)
-        
-        # Construct RichTextLine
-        # Note: line_config goes to the line object, chars have their own config
-        # But in our parser, we merged line_config into chars config for simplicity in rendering?
-        # No, frontend separates them.
-        # line.config has block attributes. chars.config has inline attributes.
-        # We need to separate them.
-        
-        # Filter block attributes from char config
-        block_keys = [
-            TEXT_ATTRS["LINE_HEIGHT"], TEXT_ATTRS["ORDERED_LIST_LEVEL"], TEXT_ATTRS["ORDERED_LIST_START"],
-            TEXT_ATTRS["UNORDERED_LIST_LEVEL"], TEXT_ATTRS["DIVIDING_LINE"], TEXT_ATTRS["BREAK_LINE_START"]
-        ]
-        
-        final_chars = []
-        for c in chars_data:
-            char_cfg = c['config'].copy()
-            # Remove block keys from char config if present (they shouldn't be if we did it right, but safety)
-            for k in block_keys:
-                if k in char_cfg: del char_cfg[k]
-            final_chars.append({"char": c['char'], "config": char_cfg})
-            
-        rich_text_lines = [{"chars": final_chars, "config": line_config}]
-        
-        # --- Generate ORIGIN_DATA (Slate Format) ---
-        slate_children = []
-        if final_chars:
-            current_leaf = {"text": final_chars[0]["char"]}
-            last_config = final_chars[0]["config"]
-            
-            def map_config(cfg):
-                attrs = {}
-                if cfg.get(TEXT_ATTRS["WEIGHT"]) == "bold": attrs["bold"] = True
-                if cfg.get(TEXT_ATTRS["STYLE"]) == "italic": attrs["italic"] = True
-                if cfg.get(TEXT_ATTRS["UNDERLINE"]): attrs["underline"] = True
-                if cfg.get(TEXT_ATTRS["STRIKE_THROUGH"]): attrs["strikethrough"] = True
-                if cfg.get(TEXT_ATTRS["COLOR"]): attrs["color"] = cfg[TEXT_ATTRS["COLOR"]]
-                if cfg.get(TEXT_ATTRS["BACKGROUND"]): attrs["backgroundColor"] = cfg[TEXT_ATTRS["BACKGROUND"]]
-                return attrs
-
-            current_leaf.update(map_config(last_config))
-            
-            for i in range(1, len(final_chars)):
-                c = final_chars[i]
-                cfg = c["config"]
-                if cfg == last_config:
-                    current_leaf["text"] += c["char"]
-                else:
-                    slate_children.append(current_leaf)
-                    current_leaf = {"text": c["char"]}
-                    current_leaf.update(map_config(cfg))
-                    last_config = cfg
-            slate_children.append(current_leaf)
+            delta = line_to_delta(line, y, delta_id=reuse["id"], delta_format=delta_format)
+            delta["x"] = reuse.get('x', delta["x"])
+            delta["width"] = reuse.get('width', delta["width"])
+            patch["updated"][delta["id"]] = delta
+        return y + line["height"] + BLOCK_GAP
+
+    # shift: how far content below the current position moved relative to the old layout
+    shift = 0
+    matcher = difflib.SequenceMatcher(None, old_hashes, new_hashes, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            if shift:
+                for i in range(i1, i2):
+                    delta = old_blocks[i]["delta"]
+                    patch["moved"][delta["id"]] = old_y(i) + shift
+            continue
+
+        # Start of the changed region in the new layout, and its old extent
+        if i1 < len(old_blocks):
+            y = old_y(i1) + shift
+        elif old_blocks:
+            y = old_end(len(old_blocks) - 1) + shift
         else:
-             slate_children.append({"text": ""})
-
-        slate_line = [{"children": slate_children}]
-
-        delta_id = str(uuid.uuid4())
-        delta = {
-            "id": delta_id,
-            "key": "text",
-            "x": MARGIN_X,
-            "y": current_y,
-            "width": PAGE_WIDTH - 2 * MARGIN_X,
-            "height": height,
-            "attrs": {
-                "DATA": json.dumps(rich_text_lines),
-                "ORIGIN_DATA": json.dumps(slate_line)
-            },
-            "children": []
-        }
-        
-        delta_set[delta_id] = delta
-        current_y += height + 10
-        
-    return json.dumps(delta_set)
+            y = START_Y
+        old_extent = old_end(i2 - 1) - old_y(i1) if i2 > i1 else 0
+
+        start_y = y
+        for k, j in enumerate(range(j1, j2)):
+            reuse = old_blocks[i1 + k]["delta"] if i1 + k < i2 else None
+            y = emit(new_lines[j], y, reuse)
+        for i in range(i1 + (j2 - j1), i2):
+            patch["deleted"].append(old_blocks[i]["delta"]["id"])
+        shift += (y - start_y) - old_extent
+
+    return patch
+
+def apply_delta_patch(previous_delta_set: str | Dict[str, Any], patch: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Apply a patch from markdown_to_delta_patch to the previous DeltaSet and return the full DeltaSet.
+    """
+    if isinstance(previous_delta_set, str):
+        previous_delta_set = json_codec.loads(previous_delta_set)
+    delta_set = {k: v for k, v in previous_delta_set.items() if k not in patch.get("deleted", [])}
+    for delta_id, y in patch.get("moved", {}).items():
+        if delta_id in delta_set:
+            delta_set[delta_id] = {**delta_set[delta_id], "y": y}
+    delta_set.update(patch.get("updated", {}))
+    delta_set.update(patch.get("inserted", {}))
+    return delta_set
+
+# --- Streaming Conversion ---
+
+class MarkdownDeltaStream:
+    """
+    Incremental Markdown -> Delta conversion for text that arrives in chunks (LLM tokens).
+    Each Markdown line is converted as soon as its newline is seen; the blocks, their
+    order and geometry are the same as markdown_to_delta on the full text.
+    """
+
+    def __init__(self, start_y: int = START_Y, delta_format: str = "both",
+                 styles: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.delta_set: Dict[str, Any] = {}
+        self.delta_format = delta_format
+        self.styles = styles
+        self._chunks: List[str] = []
+        self._pending = ""  # current unfinished line
+        self._y = start_y
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """
+        Add a chunk; returns the blocks finalized by it (possibly none).
+        """
+        self._chunks.append(chunk)
+        if "\n" not in chunk:
+            self._pending += chunk
+            return []
+        *completed, self._pending = (self._pending + chunk).split('\n')
+        return [delta for delta in map(self._emit, completed) if delta]
+
+    @property
+    def text(self) -> str:
+        """
+        All Markdown fed so far.
+        """
+        return "".join(self._chunks)
+
+    def close(self) -> List[Dict[str, Any]]:
+        """
+        Finalize the trailing line (text without a final newline).
+        """
+        pending, self._pending = self._pending, ""
+        delta = self._emit(pending)
+        return [delta] if delta else []
+
+    def _emit(self, p: str) -> Optional[Dict[str, Any]]:
+        if self.styles is not None:
+            p = expand_style_placeholders(p, self.styles)
+        line = parse_markdown_line(p)
+        if line is None:
+            return None
+        delta = line_to_delta(line, self._y, delta_format=self.delta_format)
+        self.delta_set[delta["id"]] = delta
+        self._y += line["height"] + BLOCK_GAP
+        return delta
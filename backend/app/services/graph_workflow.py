@@ -3,9 +3,15 @@ import asyncio
 from typing import TypedDict, List, Annotated, Dict, Any
 from langgraph.graph import StateGraph, END
 from langgraph.checkpoint.memory import MemorySaver
+from langgraph.config import get_stream_writer
 from langchain_core.messages import HumanMessage, SystemMessage
 
+from app.core.config import settings
 from app.services.agent_workflow import llm_service
+from app.services.speculation import KINDS as SPECULATION_KINDS, speculation
+from app.services import quality_gate
+from app.services.single_flight import normalize_text, request_key, single_flight
+from app.services.answer_cache import scope_for
 from app.services.tools.rag_retriever import search_and_rerank
 from app.services.tools.web_search import perform_web_search
 
@@ -15,47 +21,174 @@ class AgentState(TypedDict):
     context_json: str
     history: List[dict]
     block_size: Dict[str, float]
+    incremental: bool
+    delta_format: str
+    user_id: Any  # 仅用于确定语义答案缓存的作用域
     
     # Internal State
     next_step: str
     search_query: str
+    tool_choice: str  # research 信息源 web / rag / both，由 supervisor 一并给出
+    rag_query: str    # RAG 专用检索语句 (可为空，空则用 search_query)
     reference_info: str
+    history_summary: str  # 旧历史的滚动摘要，由 supervisor 计算一次，后续节点复用
+    route_fallback: bool  # supervisor 出错时兜底路由到 chat (此时的回答不进入语义答案缓存)
+    speculation_id: str   # 推测执行的运行 id (任务句柄保存在 speculation 注册表中，不进入 state)
     
     # Evaluation State
+    draft_verdict: Dict[str, Any]  # best-of-N 批量评估已给出的结论，评估节点直接采用 (不再重复调用 LLM)
     retry_count: int
     evaluation_feedback: str
     is_pass: bool
+    review_warning: str  # best-of-N 选中稿未通过评估 (不再重试) 时的评估反馈，随结果返回
     
     # Output
     final_response: Dict[str, Any]
 
+def _has_context(context_json) -> bool:
+    if not context_json:
+        return False
+    return not (isinstance(context_json, str) and context_json.strip() in ("", "{}", "[]", "null", '""'))
+
+def _speculative_kinds(state: AgentState) -> List[str]:
+    """
+    按配置 SPECULATIVE_MODE 决定与 supervisor 并行启动哪些推测任务。
+    仅对带简历上下文的请求生效 (此时几乎总是 modify / research)；本地分类器已有把握时不必推测
+    """
+    kinds = [k.strip() for k in settings.SPECULATIVE_MODE.split(",") if k.strip() in SPECULATION_KINDS]
+    if not kinds or not _has_context(state.get("context_json")):
+        return []
+    if settings.INTENT_FASTPATH_ENABLED and llm_service.intent_classifier.predict(state["user_input"])["confident"]:
+        return []
+    return kinds
+
+def _start_speculation(state: AgentState, history_summary: str) -> str:
+    kinds = _speculative_kinds(state)
+    if not kinds:
+        return ""
+    user_input = state["user_input"]
+    run_id = speculation.new_run()
+    if "research" in kinds:
+        # 调研预取：用用户原话同时查 web + RAG
+        speculation.start(run_id, "research", lambda: _run_research(user_input, "both"))
+    if "modify" in kinds:
+        # 修改草稿：不带参考信息、不流式，supervisor 确认为 modify 时直接采用
+        speculation.start(run_id, "modify", lambda: llm_service.process_agent_request(
+            user_input, state["context_json"], "无", state.get("history", []), state.get("block_size"),
+            intent="modify", incremental=state.get("incremental", False),
+            delta_format=state.get("delta_format") or "both", summary=history_summary,
+        ))
+    print(f"--- [Speculation] Started {kinds} alongside supervisor ---")
+    return run_id
+
+CACHEABLE_INTENTS = ("chat", "research_consult")
+
+def _answer_cacheable(state: AgentState) -> bool:
+    # 带简历内容的请求几乎都是修改/撰写，回答也因人而异：既不查也不存 (省掉 Embedding 调用)
+    return settings.ANSWER_CACHE_ENABLED and not _has_context(state.get("context_json"))
+
+def _answer_cache_scope(state: AgentState) -> str:
+    # 带历史对话的回答依赖上文，只在同一用户、同一段历史内复用
+    return scope_for(state.get("user_id"), [state.get("history") or []])
+
+async def _embed_user_input(state: AgentState):
+    try:
+        return await llm_service.embed_query(state["user_input"])
+    except Exception as e:
+        print(f"⚠️ [AnswerCache] Embedding failed: {e}")
+        return None
+
+def _lookup_answer(state: AgentState, vector, intent: str):
+    """按已确定的意图查语义答案缓存，命中时返回最终回复，否则 None"""
+    if vector is None:
+        return None
+    hit = llm_service.answer_cache.lookup(vector, intent, _answer_cache_scope(state))
+    if hit is None:
+        return None
+    print(f"--- [AnswerCache] Hit {intent} (similarity {hit['similarity']}, age {hit['age_s']}s): {hit['query'][:30]} ---")
+    return hit["answer"]
+
+async def _store_answer(state: AgentState, res: dict) -> None:
+    if not _answer_cacheable(state) or state.get("next_step") not in CACHEABLE_INTENTS:
+        return
+    # supervisor 出错兜底到 chat 的请求，意图并未真正确定，不缓存
+    if state.get("route_fallback"):
+        return
+    # 出错的回答、调研失败时的回答不缓存
+    reference_info = state.get("reference_info") or ""
+    if res.get("error") or not res.get("reply") or any(s in reference_info for s in ("检索失败", "搜索失败", "未找到相关信息")):
+        return
+    vector = await _embed_user_input(state)
+    if vector is None:
+        return
+    answer = {"intention": "chat", "reply": res["reply"], "modified_data": None}
+    llm_service.answer_cache.store(vector, state["user_input"], state["next_step"], answer, _answer_cache_scope(state))
+
+def _cached_result(state: AgentState, answer: dict, speculation_id: str = "") -> dict:
+    """命中缓存：推送回复并直接结束 (跳过调研与生成)"""
+    speculation.finish(speculation_id)
+    get_stream_writer()({"type": "token", "content": answer["reply"]})
+    return {"next_step": "cached", "final_response": answer, "speculation_id": ""}
+
 async def supervisor_node(state: AgentState):
     print("--- Supervisor Node ---")
     user_input = state["user_input"]
     history = state.get("history", [])
     
+    # 语义答案缓存：只对已确定为 chat / research_consult 的请求返回缓存的回答
+    # - 本地分类器有把握时先查 (此时 supervisor 也走快速通道)，命中则不经过调研与 LLM
+    # - 否则 Embedding 与 supervisor 并行，supervisor 确认路线后再查
+    embedding = None
+    if _answer_cacheable(state):
+        prediction = llm_service.intent_classifier.predict(user_input)
+        if prediction["confident"]:
+            if prediction["intent"] in CACHEABLE_INTENTS:
+                cached = _lookup_answer(state, await _embed_user_input(state), prediction["intent"])
+                if cached is not None:
+                    return _cached_result(state, cached)
+        else:
+            embedding = asyncio.create_task(_embed_user_input(state))
+    
+    history_summary = await llm_service.summarize_history(history)
+    speculation_id = _start_speculation(state, history_summary)
+    
     try:
-        decision = await llm_service.process_supervisor_request(user_input, history)
+        decision = await llm_service.process_supervisor_request(user_input, history, summary=history_summary)
     except Exception as e:
         print(f"Supervisor Error: {e}")
         # Fallback to chat if supervisor fails
-        decision = {"next_agent": "chat", "search_query": ""}
+        decision = {"next_agent": "chat", "search_query": "", "fallback": True}
+    
+    next_step = decision.get("next_agent", "chat")
+    route_fallback = bool(decision.get("fallback"))
+    if embedding is not None:
+        if next_step in CACHEABLE_INTENTS and not route_fallback:
+            cached = _lookup_answer(state, await embedding, next_step)
+            if cached is not None:
+                return _cached_result(state, cached, speculation_id)
+        else:
+            embedding.cancel()
     
+    if speculation_id:
+        # 只保留确认路线用得上的推测结果：research_* 用预取；modify 用草稿 (research_modify 需带参考信息重写，草稿作废)
+        keep = {"research"} if next_step.startswith("research_") else {"modify"} if next_step == "modify" else set()
+        speculation.discard(speculation_id, [k for k in SPECULATION_KINDS if k not in keep])
+    
+    tool_choice = (decision.get("tool") or "").strip().lower()
     return {
-        "next_step": decision.get("next_agent", "chat"),
-        "search_query": decision.get("search_query") or user_input
+        "next_step": next_step,
+        "search_query": decision.get("search_query") or user_input,
+        "tool_choice": tool_choice if tool_choice in RESEARCH_TOOLS else "",
+        "rag_query": (decision.get("rag_query") or "").strip(),
+        "history_summary": history_summary,
+        "route_fallback": route_fallback,
+        "speculation_id": speculation_id
     }
 
-async def research_node(state: AgentState):
-    print("--- Research Node ---")
-    query = state["search_query"]
-    
-    if not query:
-        print("⚠️ [Research] Search query is empty. Skipping research.")
-        return {"reference_info": "未提供搜索关键词，无法进行调研。"}
+RESEARCH_TOOLS = ("web", "rag", "both")
 
-    # --- Tool Router Logic ---
-    # Decide whether to use Web Search, RAG, or Both
+async def _route_tool(query: str) -> str:
+    """单独的 ToolRouter 调用 (supervisor 未给出 tool 时的兜底)"""
     print(f"--- [ToolRouter] Analyzing query: {query} ---")
     
     router_prompt = (
@@ -70,20 +203,23 @@ async def research_node(state: AgentState):
     try:
         # Use the LLM from llm_service directly
         router_response = await llm_service.llm.ainvoke([HumanMessage(content=router_prompt)])
-        tool_choice = router_response.content.strip().lower()
+        return router_response.content.strip().lower()
     except Exception as e:
         print(f"Tool Router Error: {e}. Defaulting to 'both'.")
-        tool_choice = "both"
-        
-    print(f"--- [ToolRouter] Choice: {tool_choice} ---")
-    
+        return "both"
+
+async def _run_research(query: str, tool_choice: str, rag_query: str = None) -> Dict[str, Any]:
+    """按信息源并发执行 web / RAG，返回 {"rag": docs | Exception, "web": text | Exception}"""
     # Execute tasks using a dictionary for better management
+    # 相同检索语句同时进行中 (重复提交、前端重试) 时合并为一次调用
     tasks = {}
     if "rag" in tool_choice or "both" in tool_choice:
-        tasks["rag"] = asyncio.to_thread(search_and_rerank, query)
+        rag_text = normalize_text(rag_query or query)
+        tasks["rag"] = single_flight.do(request_key("rag", rag_text), lambda: asyncio.to_thread(search_and_rerank, rag_text))
         
     if "web" in tool_choice or "both" in tool_choice:
-        tasks["web"] = perform_web_search(query)
+        web_text = normalize_text(query)
+        tasks["web"] = single_flight.do(request_key("web", web_text), lambda: perform_web_search(web_text))
     
     results = {}
     if tasks:
@@ -96,7 +232,9 @@ async def research_node(state: AgentState):
         
         for name, res in zip(task_names, task_results):
             results[name] = res
-            
+    return results
+
+def _combine_research(results: Dict[str, Any]) -> str:
     # Process Results
     rag_text = ""
     web_text = ""
@@ -126,8 +264,79 @@ async def research_node(state: AgentState):
     if not combined_info:
         combined_info = "未找到相关信息。"
     
+    return combined_info
+
+async def research_node(state: AgentState):
+    print("--- Research Node ---")
+    query = state["search_query"]
+    
+    if not query:
+        print("⚠️ [Research] Search query is empty. Skipping research.")
+        speculation.discard(state.get("speculation_id"), ["research"])
+        return {"reference_info": "未提供搜索关键词，无法进行调研。"}
+
+    # --- Tool Router Logic ---
+    # Supervisor 已给出信息源时直接使用，省掉一次 LLM 调用；
+    # 仅在未给出时 (本地快速通道分类、supervisor 输出缺字段) 才单独路由
+    tool_choice = state.get("tool_choice") or await _route_tool(query)
+    print(f"--- [ToolRouter] Choice: {tool_choice} ---")
+    
+    # 推测执行已预取 (web + RAG) 时直接使用，只取路由选中的部分
+    results = await speculation.take(state.get("speculation_id"), "research")
+    if results is not None:
+        print("--- [Speculation] Research prefetch hit ---")
+        results = {name: res for name, res in results.items() if name in tool_choice or "both" in tool_choice}
+    else:
+        results = await _run_research(query, tool_choice, state.get("rag_query"))
+    
+    combined_info = _combine_research(results)
+    
     return {"reference_info": combined_info}
 
+def _draft_temperatures(n: int) -> List[float]:
+    temperatures = [float(t) for t in settings.BEST_OF_N_TEMPERATURES.split(",") if t.strip()] or [0.1]
+    return [temperatures[i % len(temperatures)] for i in range(n)]
+
+async def _best_of_n(state: AgentState, reference_info: str, intent: str):
+    """
+    并发生成 N 份草稿 (不同温度)，挑出最佳稿，返回 (草稿, 评估结论)
+    - 本地规则检查排序：有通过的直接取；最佳稿明确不通过时也不再调用 LLM (评估节点据规则给出反馈)
+    - 最佳一档是多份疑似问题稿时，一次批量 LLM 评估选出最佳，结论随 state 交给评估节点
+    """
+    temperatures = _draft_temperatures(settings.BEST_OF_N_DRAFTS)
+    block_size = state.get("block_size")
+    drafts = await asyncio.gather(*[
+        llm_service.process_agent_request(
+            state["user_input"], state["context_json"], reference_info, state.get("history", []), block_size,
+            intent=intent, incremental=state.get("incremental", False),
+            delta_format=state.get("delta_format") or "both", summary=state.get("history_summary"),
+            temperature=t,
+        ) for t in temperatures
+    ])
+    gates = [quality_gate.evaluate(d.get("modified_markdown", ""), d.get("original_markdown", ""), block_size, record=False) for d in drafts]
+    ranked = quality_gate.rank(gates)
+    print(f"--- [BestOfN] {len(drafts)} drafts at {temperatures}: {[gates[i]['decision'] for i in range(len(gates))]} ---")
+    
+    best = ranked[0]
+    borderline = [i for i in ranked if gates[i]["decision"] == "borderline"]
+    if gates[best]["decision"] != "borderline" or len(borderline) < 2:
+        return drafts[best], None
+    
+    judged = await llm_service.process_batch_evaluation_request(
+        state["user_input"],
+        [{**drafts[i], "gate_issues": gates[i]["issues"]} for i in borderline],
+        reference_info=reference_info,
+    )
+    if judged["best"] is None:
+        return drafts[best], None
+    best = borderline[judged["best"]]
+    verdict = next((r for r in judged["results"] if r.get("index") == judged["best"]), None)
+    if verdict is None:
+        # 评估只给出了 best 而缺少该稿的明细：以选中视为通过，避免评估节点再调用一次 LLM
+        verdict = {"is_pass": True, "score": gates[best]["score"], "missing_points": [], "reason": "批量评估选出的最佳稿"}
+    print(f"--- [BestOfN] Judge picked draft {best} (T={temperatures[best]}) ---")
+    return drafts[best], verdict
+
 async def modify_node(state: AgentState):
     print("--- Modify Node (Drafter) ---")
     user_input = state["user_input"]
@@ -136,6 +345,8 @@ async def modify_node(state: AgentState):
     history = state.get("history", [])
     block_size = state.get("block_size")
     intent = state.get("next_step", "modify") # 获取意图
+    incremental = state.get("incremental", False)
+    delta_format = state.get("delta_format") or "both"
     
     # Handle Retry Logic
     feedback = state.get("evaluation_feedback")
@@ -150,15 +361,63 @@ async def modify_node(state: AgentState):
         请反思并重新生成 "reply" 和 "modified_data"。
         """
     
-    res = await llm_service.process_agent_request(user_input, context_json, reference_info, history, block_size, intent=intent)
+    # 流式推送 token / delta 事件 (custom stream)；增量模式返回 patch，只推送 token
+    # attempt 标记第几次生成，评估不通过重试时前端据此丢弃上一轮的内容
+    writer = get_stream_writer()
+    attempt = state.get("retry_count", 0)
+    stream_writer = lambda event: writer({**event, "attempt": attempt})
+    
+    # 推测执行的草稿 (仅首轮 modify 会保留)；命中时一次性推送 reply，修改内容随最终结果返回
+    res = None
+    if not feedback:
+        res = await speculation.take(state.get("speculation_id"), "modify")
+        if res is not None:
+            print("--- [Speculation] Modify draft hit ---")
+            stream_writer({"type": "token", "content": res.get("reply", "")})
+    verdict = None
+    if res is None and settings.BEST_OF_N_DRAFTS > 1 and not feedback:
+        # 多稿不流式生成，选定后一次性推送 reply
+        res, verdict = await _best_of_n(state, reference_info, intent)
+        stream_writer({"type": "token", "content": res.get("reply", "")})
+    if res is None:
+        res = await llm_service.process_agent_request(user_input, context_json, reference_info, history, block_size, intent=intent, incremental=incremental, stream_writer=stream_writer, delta_format=delta_format, summary=state.get("history_summary"))
     
     # Format for API response
     final_res = {
         "intention": res.get("intention", "modify"), # 使用返回的 intention
         "reply": res.get("reply", ""),
-        "modified_data": res.get("modified_data", {})
+        "modified_data": res.get("modified_data", {}),
+        "modified_patch": res.get("modified_patch"),
+        "modified_markdown": res.get("modified_markdown", ""),
+        "original_markdown": res.get("original_markdown", "")
     }
-    return {"final_response": final_res}
+    return {"final_response": final_res, "draft_verdict": verdict}
+
+async def _gated_evaluation(state: AgentState, user_input: str, agent_reply: str, reference_info: str, modified_data: dict) -> Dict[str, Any]:
+    """先跑本地规则检查：明确通过/明确不通过时不再调用 LLM 评估，只有疑似问题才交给 LLM 判断"""
+    final_res = state["final_response"]
+    markdown = final_res.get("modified_markdown", "")
+    gate = quality_gate.evaluate(markdown, final_res.get("original_markdown", ""), state.get("block_size"))
+    print(f"🚦 [Gate] {gate['decision']} (score {gate['score']}): {[i['detail'] for i in gate['issues']]}")
+    
+    if gate["decision"] == "pass":
+        return {"is_pass": True, "score": gate["score"], "missing_points": [], "reason": "本地规则检查通过"}
+    if gate["decision"] == "fail":
+        return {
+            "is_pass": False,
+            "score": gate["score"],
+            "missing_points": [i["detail"] for i in gate["issues"] if i["severity"] == "hard"],
+            "reason": "本地规则检查未通过",
+            "suggestion": "；".join(i["detail"] for i in gate["issues"]),
+        }
+    return await llm_service.process_evaluation_request(
+        user_prompt=user_input,
+        agent_reply=agent_reply,
+        reference_info=reference_info,
+        modified_data=modified_data,
+        modified_markdown=markdown,
+        gate_issues=gate["issues"]
+    )
 
 async def evaluation_node(state: AgentState):
     print("--- Evaluation Node (Reviewer) ---")
@@ -167,14 +426,16 @@ async def evaluation_node(state: AgentState):
     reference_info = state.get("reference_info", "无")
     
     agent_reply = final_res.get("reply", "")
-    modified_data = final_res.get("modified_data", {})
+    # 增量模式下只有 modified_patch
+    modified_data = final_res.get("modified_data") or final_res.get("modified_patch") or {}
     
-    eval_result = await llm_service.process_evaluation_request(
-        user_prompt=user_input,
-        agent_reply=agent_reply,
-        reference_info=reference_info,
-        modified_data=modified_data
-    )
+    # best-of-N 的批量评估已对选中稿给出结论时直接采用
+    verdict = state.get("draft_verdict")
+    if verdict:
+        print("🚦 [Gate] Using best-of-N judge verdict")
+        eval_result = verdict
+    else:
+        eval_result = await _gated_evaluation(state, user_input, agent_reply, reference_info, modified_data)
     
     is_pass = eval_result.get("is_pass", True)
     score = eval_result.get("score", 0)
@@ -185,10 +446,17 @@ async def evaluation_node(state: AgentState):
         suggestions = eval_result.get("suggestion", "请检查用户需求是否满足")
         missing_points = ", ".join(eval_result.get("missing_points", []))
         feedback = f"遗漏点：{missing_points}\n专家修改建议：{suggestions}"
+    
+    # 多稿模式不重写：选中稿未通过时照常返回，但记录并随结果告知前端
+    review_warning = ""
+    if not is_pass and settings.BEST_OF_N_DRAFTS > 1:
+        review_warning = feedback
+        print(f"⚠️ [BestOfN] Selected draft failed review, returning it without retry: {feedback}")
         
     return {
         "is_pass": is_pass,
         "evaluation_feedback": feedback,
+        "review_warning": review_warning,
         "retry_count": state.get("retry_count", 0) + 1
     }
 
@@ -208,11 +476,14 @@ async def formatter_node(state: AgentState):
     formatted_res = {
         "intention": intention,
         "reply": final_res.get("reply", ""),
-        "modified_data": final_res.get("modified_data")
+        "modified_data": final_res.get("modified_data"),
+        "modified_patch": final_res.get("modified_patch")
     }
+    if state.get("review_warning"):
+        formatted_res["review_warning"] = state["review_warning"]
     
     # If intention is modify/create but no modified_data, fallback to chat or log warning
-    if formatted_res["intention"] == "modify" and not formatted_res["modified_data"]:
+    if formatted_res["intention"] == "modify" and not (formatted_res["modified_data"] or formatted_res["modified_patch"]):
         print(f"⚠️ [Formatter] Intention is '{formatted_res['intention']}' but 'modified_data' is missing.")
         # Optionally change intention to chat if data is missing
         # formatted_res["intention"] = "chat"
@@ -231,7 +502,9 @@ async def chat_node(state: AgentState):
     if reference_info:
         prompt = f"用户问题: {user_input}\n\n参考资料 (基于你的调研):\n{reference_info}\n\n请根据参考资料回答。"
         
-    res = await llm_service.process_chat_request(prompt, context=context_json, history=history)
+    # reply 逐段推送 token 事件 (custom stream)
+    res = await llm_service.process_chat_request(prompt, context=context_json, history=history, stream_writer=get_stream_writer(), summary=state.get("history_summary"))
+    await _store_answer(state, res)
     
     final_res = {
         "intention": "chat",
@@ -243,6 +516,8 @@ async def chat_node(state: AgentState):
 # Edge Logic
 def route_after_supervisor(state: AgentState):
     intent = state["next_step"]
+    if intent == "cached":
+        return "cached"
     if intent in ["research_consult", "research_modify", "research_create"]:
         return "research"
     elif intent in ["modify", "create"]:
@@ -260,6 +535,9 @@ def route_after_research(state: AgentState):
 def route_after_evaluation(state: AgentState):
     if state.get("is_pass", True):
         return "formatter"
+    if settings.BEST_OF_N_DRAFTS > 1:
+        # 多稿已并行择优，不再串行重写
+        return "formatter"
     if state.get("retry_count", 0) > 0: # Max 0 retries (1 attempt total)
         print("--- Max Retries Reached ---")
         return "formatter" # Fallback to formatter even if failed
@@ -283,7 +561,8 @@ workflow.add_conditional_edges(
     {
         "research": "research",
         "modify": "modify",
-        "chat": "chat"
+        "chat": "chat",
+        "cached": END
     }
 )
 
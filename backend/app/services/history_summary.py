@@ -0,0 +1,82 @@
+"""
+Rolling summary of the aged-out part of a conversation.
+
+Each turn the window slides forward by a message or two, so the history that needs
+summarising is the previous prefix plus a few messages. Summaries are cached under a
+chained hash of the prefix they cover; a new request folds only the messages after the
+longest cached prefix into that summary instead of re-summarising everything.
+"""
+import hashlib
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.core import json_codec
+from app.services.cache import BoundedLRUCache
+
+# fold(previous_summary or None, new_messages) -> updated summary
+FoldFn = Callable[[Optional[str], List[Dict[str, Any]]], Awaitable[str]]
+
+
+def prefix_hashes(messages: List[Dict[str, Any]]) -> List[str]:
+    """hashes[i] identifies messages[:i + 1]; each hash chains the previous one, so the whole list is O(n)."""
+    hashes = []
+    digest = b""
+    for msg in messages:
+        payload = json_codec.dumps([msg.get("role"), msg.get("content")]).encode("utf-8")
+        digest = hashlib.sha1(digest + payload).digest()
+        hashes.append(digest.hex())
+    return hashes
+
+
+def format_messages(messages: List[Dict[str, Any]]) -> str:
+    return "\n".join(f"{m.get('role')}: {m.get('content')}" for m in messages)
+
+
+class RollingSummaryStore:
+    """
+    Summary cache keyed by history-prefix hash, with counters for monitoring:
+    exact hits, incremental folds (and how many messages they folded) and full rebuilds.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 8 * 1024 * 1024):
+        self._cache = BoundedLRUCache(max_entries=max_entries, max_bytes=max_bytes)
+        self.exact_hits = 0
+        self.incremental = 0
+        self.full = 0
+        self.folded_messages = 0
+
+    async def summarize(self, messages: List[Dict[str, Any]], fold: FoldFn) -> str:
+        hashes = prefix_hashes(messages)
+        if not hashes:
+            return ""
+
+        cached = self._cache.get(hashes[-1])
+        if cached is not None:
+            self.exact_hits += 1
+            return cached
+
+        # Longest earlier prefix we already have a summary for
+        previous, start = None, 0
+        for i in range(len(hashes) - 2, -1, -1):
+            previous = self._cache.get(hashes[i])
+            if previous is not None:
+                start = i + 1
+                break
+
+        new_messages = messages[start:]
+        summary = await fold(previous, new_messages)
+        if previous is None:
+            self.full += 1
+        else:
+            self.incremental += 1
+        self.folded_messages += len(new_messages)
+        self._cache.set(hashes[-1], summary)
+        return summary
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._cache),
+            "exact_hits": self.exact_hits,
+            "incremental": self.incremental,
+            "full": self.full,
+            "folded_messages": self.folded_messages,
+        }
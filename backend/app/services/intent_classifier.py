@@ -0,0 +1,120 @@
+"""
+Local intent classifier used as a fast path in front of the Supervisor LLM.
+
+Prompts are embedded as L2-normalised character n-gram TF-IDF vectors (character
+n-grams work for Chinese without a tokenizer and tolerate typos), then classified by
+similarity-weighted kNN over the labelled examples. Only confident predictions are
+routed directly; everything else falls back to the LLM supervisor.
+"""
+import math
+import re
+import time
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+_PUNCT_RE = re.compile(r'[^\w一-鿿]+')
+
+
+def normalize(text: str) -> str:
+    return _PUNCT_RE.sub(" ", text.lower()).strip()
+
+
+def char_ngrams(text: str, n_min: int = 1, n_max: int = 3) -> Dict[str, int]:
+    """Counts of character n-grams; n-grams never span a word boundary."""
+    counts: Dict[str, int] = defaultdict(int)
+    for word in normalize(text).split():
+        for n in range(n_min, n_max + 1):
+            for i in range(len(word) - n + 1):
+                counts[word[i:i + n]] += 1
+    return counts
+
+
+class IntentClassifier:
+    """
+    kNN over char n-gram TF-IDF vectors.
+
+    predict() returns {"intent", "confidence", "similarity", "confident"}:
+    - confidence: share of the top-k neighbours' similarity mass voting for the intent
+    - similarity: cosine similarity of the nearest neighbour (low means out of distribution)
+    - confident: both are above their thresholds, so the prediction can skip the LLM
+    """
+
+    def __init__(self, examples: Iterable[Tuple[str, str]], k: int = 5,
+                 threshold: float = 0.6, min_similarity: float = 0.25):
+        self.k = k
+        self.threshold = threshold
+        self.min_similarity = min_similarity
+
+        examples = list(examples)
+        self.labels = [label for label, _ in examples]
+        docs = [char_ngrams(text) for _, text in examples]
+
+        df: Dict[str, int] = defaultdict(int)
+        for doc in docs:
+            for gram in doc:
+                df[gram] += 1
+        total = len(docs)
+        self.idf = {gram: math.log((1 + total) / (1 + count)) + 1 for gram, count in df.items()}
+
+        # Inverted index: gram -> [(example index, weight)], so scoring only touches shared grams
+        self._index: Dict[str, List[Tuple[int, float]]] = defaultdict(list)
+        for i, doc in enumerate(docs):
+            for gram, weight in self._vectorize(doc).items():
+                self._index[gram].append((i, weight))
+
+        self.fast_path = 0
+        self.fallback = 0
+
+    def _vectorize(self, counts: Dict[str, int]) -> Dict[str, float]:
+        vec = {gram: (1 + math.log(count)) * self.idf[gram] for gram, count in counts.items() if gram in self.idf}
+        norm = math.sqrt(sum(w * w for w in vec.values()))
+        return {gram: w / norm for gram, w in vec.items()} if norm else {}
+
+    def neighbours(self, text: str) -> List[Tuple[float, str]]:
+        """Top-k (similarity, label) pairs, most similar first."""
+        scores: Dict[int, float] = defaultdict(float)
+        for gram, weight in self._vectorize(char_ngrams(text)).items():
+            for i, doc_weight in self._index.get(gram, ()):
+                scores[i] += weight * doc_weight
+        top = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:self.k]
+        return [(score, self.labels[i]) for i, score in top]
+
+    def predict(self, text: str) -> Dict[str, Any]:
+        neighbours = self.neighbours(text)
+        if not neighbours:
+            return {"intent": None, "confidence": 0.0, "similarity": 0.0, "confident": False}
+
+        votes: Dict[str, float] = defaultdict(float)
+        for score, label in neighbours:
+            votes[label] += score
+        intent, mass = max(votes.items(), key=lambda item: item[1])
+        confidence = mass / sum(votes.values())
+        similarity = neighbours[0][0]
+        return {
+            "intent": intent,
+            "confidence": round(confidence, 4),
+            "similarity": round(similarity, 4),
+            "confident": confidence >= self.threshold and similarity >= self.min_similarity,
+        }
+
+    def route(self, text: str) -> Optional[Dict[str, Any]]:
+        """Prediction if it is confident enough to skip the LLM supervisor, else None (counts both)."""
+        start = time.perf_counter()
+        prediction = self.predict(text)
+        prediction["latency_ms"] = round((time.perf_counter() - start) * 1000, 3)
+        if prediction["confident"]:
+            self.fast_path += 1
+            return prediction
+        self.fallback += 1
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        routed = self.fast_path + self.fallback
+        return {
+            "examples": len(self.labels),
+            "threshold": self.threshold,
+            "min_similarity": self.min_similarity,
+            "fast_path": self.fast_path,
+            "fallback": self.fallback,
+            "fallback_rate": round(self.fallback / routed, 4) if routed else 0.0,
+        }
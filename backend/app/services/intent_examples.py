@@ -0,0 +1,125 @@
+# 本地意图分类器的训练样例 (与 tests/run_intent_accuracy.py 的评测样例不重叠，保证评测是留出集)
+# 覆盖 Supervisor 的六个意图；新增样例时保持每类数量大致均衡
+from typing import Dict, List
+
+INTENT_EXAMPLES: Dict[str, List[str]] = {
+    # 闲聊、问候、功能询问、通用职业建议
+    "chat": [
+        "你好",
+        "在吗？",
+        "谢谢你的帮助！",
+        "你是什么模型？",
+        "这个工具怎么用？",
+        "你可以帮我做哪些事情？",
+        "简历一般写几页比较合适？",
+        "应届生找工作有什么建议吗？",
+        "跳槽之前需要做哪些准备？",
+        "面试紧张怎么办？",
+        "我该不该接受这个 offer？",
+        "怎么跟 HR 谈薪资比较好？",
+        "简历里要不要放照片？",
+        "做技术好还是转管理好？",
+        "你觉得我适合做产品经理吗？",
+        "早上好，今天心情不错",
+    ],
+    # 仅基于现有内容的润色、改写、翻译、纠错、改格式
+    "modify": [
+        "帮我润色一下这段话",
+        "把这段改得更简洁",
+        "把这一段翻译成英文",
+        "帮我检查一下有没有错别字",
+        "把这几句改成无序列表",
+        "语气太口语化了，改得正式一点",
+        "把这段工作经历压缩到三行以内",
+        "帮我把这里的动词换得更有力",
+        "请把这段内容改成第一人称省略的简历写法",
+        "把技术名词统一成标准写法，比如 mysql 改成 MySQL",
+        "这段太长了，帮我精简一下",
+        "把这段英文改得更地道",
+        "请优化这句话的表达：我参与了项目的开发工作",
+        "把这段自我评价改得更自信一些",
+        "调整一下这段话的顺序，让重点在前面",
+        "把项目描述里的口水话删掉",
+    ],
+    # 查询外部信息 (薪资、面试题、公司、行情)，不修改简历
+    "research_consult": [
+        "查一下腾讯后端开发的薪资水平",
+        "现在 Go 语言工程师好找工作吗？",
+        "深圳嵌入式工程师一般多少钱？",
+        "华为 OD 是什么性质的岗位？",
+        "帮我搜一下快手前端面试会问什么",
+        "算法岗今年秋招行情如何？",
+        "网易游戏服务端开发需要哪些技能？",
+        "帮我查查 Kubernetes 相关岗位的需求量",
+        "产品经理面试常见问题有哪些？",
+        "了解一下拼多多的工作强度和福利",
+        "杭州数据开发工程师的平均薪资是多少？",
+        "最近 AIGC 相关岗位招聘多吗？",
+        "帮我调研一下测试开发岗位的发展前景",
+        "小红书推荐算法岗的面试流程是怎样的？",
+        "查一下 2025 年 Rust 开发者的市场需求",
+        "外企和国企程序员的待遇差别大吗？",
+    ],
+    # 修改现有简历内容，需要借助 JD/市场信息或 STAR/范文等专业方法
+    "research_modify": [
+        "按照腾讯后端 JD 的要求优化我这段项目经历",
+        "参考 STAR 法则改写这段实习经历",
+        "对照阿里的招聘要求，帮我调整技能清单",
+        "先查一下字节前端岗位要求，再改我的项目描述",
+        "用优秀简历的写法重写这段工作经历",
+        "结合最新的大模型岗位要求修改我的自我评价",
+        "参考高分简历模板，把这段经历写得更量化",
+        "根据这个 JD 帮我把简历里的关键词补齐",
+        "按照外企简历的风格改写我的工作经历",
+        "参考范文，把这段项目改成背景-行动-结果的结构",
+        "对标美团算法岗要求，优化我的项目亮点",
+        "先调研一下云原生岗位的热门技能，再帮我改技能部分",
+        "用 STAR 方法把这段经历补充完整",
+        "根据市场上数据工程师的要求，调整我的项目描述重点",
+        "参考大厂简历的措辞改写这段实习经历",
+        "先搜一下这家公司看重什么，再优化我的个人总结",
+    ],
+    # 从头撰写空白区域的内容，仅凭用户指令
+    "create": [
+        "帮我写一段自我介绍",
+        "帮我写一个个人总结，突出我有五年 Java 经验",
+        "给我写一段求职意向",
+        "帮我生成一段项目经历，做的是电商后台管理系统",
+        "写一段技能特长，我会 Python、Docker 和 MySQL",
+        "帮我写一段教育背景，本科计算机专业",
+        "生成一段校园经历，我当过学生会主席",
+        "帮我写三条自我评价",
+        "从零写一段实习经历，我在一家创业公司做后端",
+        "写一段获奖情况，我拿过 ACM 省赛银奖",
+        "帮我编写一段个人简介，风格简洁专业",
+        "这里是空的，帮我写一段工作经历",
+        "帮我写一段英文的 summary",
+        "给这个空白区域写点内容，介绍我的前端技能",
+        "帮我起草一段项目介绍，是一个聊天机器人",
+        "写一段证书与资质，包括 PMP 和软考高级",
+    ],
+    # 从头撰写，且需要 JD/市场信息或 STAR/范文等专业方法
+    "research_create": [
+        "参考 STAR 法则帮我写一段项目经历",
+        "根据字节跳动的 JD 帮我写一段个人总结",
+        "先查一下 AI 工程师的岗位要求，再帮我写技能清单",
+        "参考优秀简历范文，帮我写一段自我评价",
+        "按照大厂简历模板帮我写一段工作经历",
+        "结合最新的市场需求帮我写一段求职意向",
+        "参考高分简历帮我写一段实习经历",
+        "对标阿里云岗位要求，帮我写一段个人优势",
+        "先调研数据分析师需要哪些技能，再帮我写技能特长",
+        "用 STAR 模板帮我从头写一段项目描述",
+        "根据这家公司的招聘要求帮我写一段自我介绍",
+        "参考外企简历风格帮我写一段英文 summary",
+        "先搜索一下产品经理的核心能力，再帮我写个人总结",
+        "按照优秀案例的结构帮我写一段校园经历",
+        "结合云原生岗位的热门技术帮我写技能部分",
+        "参考范文帮我写一段量化的工作成果",
+    ],
+}
+
+
+def labeled_examples() -> List[tuple]:
+    """展开为 [(intent, prompt), ...]"""
+    return [(intent, prompt) for intent, prompts in INTENT_EXAMPLES.items() for prompt in prompts]
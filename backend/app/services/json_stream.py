@@ -0,0 +1,123 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+
+_SIMPLE_ESCAPES = {
+    '"': '"',
+    '\\': '\\',
+    '/': '/',
+    'b': '\b',
+    'f': '\f',
+    'n': '\n',
+    'r': '\r',
+    't': '\t',
+}
+
+# Marks the closing quote of a string
+_END = object()
+
+
+class JsonFieldStream:
+    """
+    Incrementally extract string fields of a top-level JSON object while it is being generated.
+
+    Feed raw LLM output chunks; get back (field, decoded text) pieces for the wanted fields as
+    soon as their characters arrive. Each character is scanned once, so the cost is linear in
+    the output length (unlike re-parsing the partial JSON on every chunk).
+    Text outside the object (e.g. ```json fences) is ignored.
+    """
+
+    def __init__(self, fields: Iterable[str]):
+        self.fields = set(fields)
+        self.values: Dict[str, str] = {}
+
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._unicode: Optional[str] = None  # pending \uXXXX hex digits
+        self._high_surrogate: Optional[int] = None
+        self._string_buf: List[str] = []  # current key being read (depth 1 keys only)
+        self._is_key = False
+        self._last_key: Optional[str] = None
+        self._target: Optional[str] = None  # field whose value string is being read
+
+    def feed(self, chunk: str) -> List[Tuple[str, str]]:
+        pieces: List[Tuple[str, str]] = []
+        out: List[str] = []
+
+        def flush():
+            if out and self._target is not None:
+                text = "".join(out)
+                self.values[self._target] = self.values.get(self._target, "") + text
+                pieces.append((self._target, text))
+            out.clear()
+
+        for ch in chunk:
+            if self._in_string:
+                decoded = self._decode(ch)
+                if decoded is None:
+                    continue
+                if decoded is _END:
+                    self._in_string = False
+                    if self._target is not None:
+                        flush()
+                        self._target = None
+                    elif self._is_key:
+                        self._last_key = "".join(self._string_buf)
+                    self._string_buf = []
+                    continue
+                if self._target is not None:
+                    out.append(decoded)
+                elif self._is_key:
+                    self._string_buf.append(decoded)
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                # At depth 1 a string is a key unless it follows a key (then it is the value)
+                self._is_key = self._depth == 1 and self._last_key is None
+                if not self._is_key and self._depth == 1 and self._last_key in self.fields:
+                    self._target = self._last_key
+                    self.values.setdefault(self._target, "")
+            elif ch in '{[':
+                self._depth += 1
+            elif ch in '}]':
+                self._depth -= 1
+                if self._depth == 1:
+                    self._last_key = None
+            elif ch == ',' and self._depth == 1:
+                self._last_key = None
+            # Anything else (':', whitespace, numbers, literals, text outside the object) is skipped
+
+        flush()
+        return pieces
+
+    def _decode(self, ch: str):
+        """Decode one character inside a string. Returns None while an escape is incomplete."""
+        if self._unicode is not None:
+            self._unicode += ch
+            if len(self._unicode) < 4:
+                return None
+            try:
+                code = int(self._unicode, 16)
+            except ValueError:
+                code = 0xFFFD
+            self._unicode = None
+            if 0xD800 <= code < 0xDC00:
+                self._high_surrogate = code
+                return None
+            if 0xDC00 <= code < 0xE000 and self._high_surrogate is not None:
+                code = 0x10000 + ((self._high_surrogate - 0xD800) << 10) + (code - 0xDC00)
+            self._high_surrogate = None
+            return chr(code)
+        if self._escape:
+            self._escape = False
+            if ch == 'u':
+                self._unicode = ""
+                return None
+            return _SIMPLE_ESCAPES.get(ch, ch)
+        if ch == '\\':
+            self._escape = True
+            return None
+        if ch == '"':
+            return _END
+        return ch
+
@@ -0,0 +1,127 @@
+"""
+Lite-first model cascade.
+
+Each chain has a policy: "pro" (pro model only), "lite" (lite model only) or
+"cascade" (lite model first, escalating to pro when the lite output is unusable).
+A lite attempt escalates when:
+- "json": the output could not be parsed (parsers raise ValueError subclasses)
+- "check" / "confidence": the caller's check rejected the result
+- "error": the call itself failed
+Every call is timed per chain and tier, so pro-only chains provide the baseline the
+cascaded ones are compared against.
+"""
+import time
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+POLICIES = ("pro", "lite", "cascade")
+TIERS = ("lite", "pro")
+
+# Upper bounds (ms) of the latency histogram buckets; slower calls land in the overflow bucket
+LATENCY_BUCKETS_MS = (250, 500, 1000, 2000, 4000, 8000, 16000)
+
+
+def parse_policy(spec: str) -> Dict[str, str]:
+    """Parse "supervisor=cascade,agent=pro" into {chain: policy}; invalid entries are ignored."""
+    policy = {}
+    for item in spec.split(","):
+        chain, _, value = item.partition("=")
+        chain, value = chain.strip(), value.strip().lower()
+        if chain and value in POLICIES:
+            policy[chain] = value
+    return policy
+
+
+class _Histogram:
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+
+    def add(self, ms: float) -> None:
+        index = next((i for i, bound in enumerate(LATENCY_BUCKETS_MS) if ms <= bound), len(LATENCY_BUCKETS_MS))
+        self.buckets[index] += 1
+        self.count += 1
+        self.total_ms += ms
+
+    def report(self) -> Dict[str, Any]:
+        labels = [f"<={bound}" for bound in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]}"]
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total_ms / self.count, 1) if self.count else 0.0,
+            "histogram": dict(zip(labels, self.buckets)),
+        }
+
+
+class _ChainStats:
+    def __init__(self):
+        self.calls = 0
+        self.lite_accepted = 0
+        self.escalations: Counter = Counter()
+        self.latency = {tier: _Histogram() for tier in TIERS}
+
+
+class ModelCascade:
+    """
+    run(chain, call, check) executes call(tier) according to the chain's policy.
+    check(result) returns an escalation reason ("check" / "confidence") or None to accept.
+    on_escalate() runs before the pro attempt (e.g. to tell a stream consumer to drop
+    the lite tokens it already received).
+    """
+
+    def __init__(self, policy: Dict[str, str], default: str = "pro"):
+        self.policy = policy
+        self.default = default
+        self._stats: Dict[str, _ChainStats] = {}
+
+    def policy_for(self, chain: str) -> str:
+        return self.policy.get(chain, self.default)
+
+    async def _timed(self, stats: _ChainStats, tier: str, call: Callable[[str], Awaitable[Any]]) -> Any:
+        start = time.perf_counter()
+        try:
+            return await call(tier)
+        finally:
+            stats.latency[tier].add((time.perf_counter() - start) * 1000)
+
+    async def run(self, chain: str, call: Callable[[str], Awaitable[Any]],
+                  check: Optional[Callable[[Any], Optional[str]]] = None,
+                  on_escalate: Optional[Callable[[], None]] = None) -> Any:
+        stats = self._stats.setdefault(chain, _ChainStats())
+        stats.calls += 1
+        policy = self.policy_for(chain)
+        if policy != "cascade":
+            return await self._timed(stats, policy, call)
+
+        try:
+            result = await self._timed(stats, "lite", call)
+            reason = check(result) if check else None
+        except ValueError as e:
+            reason, result = "json", None
+            print(f"⚠️ [Cascade] {chain} lite output unparseable: {e}")
+        except Exception as e:
+            reason, result = "error", None
+            print(f"⚠️ [Cascade] {chain} lite call failed: {e}")
+        if reason is None:
+            stats.lite_accepted += 1
+            return result
+
+        stats.escalations[reason] += 1
+        print(f"🪜 [Cascade] {chain}: lite -> pro ({reason})")
+        if on_escalate is not None:
+            on_escalate()
+        return await self._timed(stats, "pro", call)
+
+    def stats(self) -> Dict[str, Any]:
+        report = {}
+        for chain, s in self._stats.items():
+            cascaded = s.lite_accepted + sum(s.escalations.values())
+            report[chain] = {
+                "policy": self.policy_for(chain),
+                "calls": s.calls,
+                "lite_accepted": s.lite_accepted,
+                "escalations": dict(s.escalations),
+                "escalation_rate": round(sum(s.escalations.values()) / cascaded, 4) if cascaded else 0.0,
+                "latency": {tier: h.report() for tier, h in s.latency.items() if h.count},
+            }
+        return report
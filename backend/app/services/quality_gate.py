@@ -0,0 +1,179 @@
+"""
+Deterministic checks on generated resume Markdown, run before the LLM evaluation.
+
+Each check is either hard (the output is broken and must be regenerated) or soft (it
+may be intentional, e.g. numbers dropped because the user asked for a shorter text).
+The gate decision is:
+- "pass": no issues, the LLM judge is skipped
+- "fail": a hard issue, regenerate with the gate's feedback, the LLM judge is skipped
+- "borderline": only soft issues, the LLM judge decides (given Markdown, not Delta JSON)
+"""
+import re
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from app.services.format_converter import measure_markdown
+
+# Emoji outside the BMP (same rule as tests/test_no_emoji.py) are a hard failure
+_EMOJI_RE = re.compile('[\U00010000-\U0010ffff]')
+# BMP symbols and dingbats (★☆, ✓, ❶, ➤) are common in resumes for ratings and bullets
+_SYMBOL_RE = re.compile('[\u2600-\u27BF\u2B00-\u2BFF]')
+_BOLD_RE = re.compile(r'\*\*(.+?)\*\*')
+_TAG_RE = re.compile(r'<[^>]+>')
+_LIST_RE = re.compile(r'^\s*(-|\d+\.)\s')
+_NUMBER_RE = re.compile(r'\d+(?:\.\d+)?%?')
+_ENTITY_RE = re.compile(r'[A-Za-z][A-Za-z0-9+#.\-]*[A-Za-z0-9+#]')
+_ITEM_SEPARATORS_RE = re.compile(r'[；;]')
+
+# A bold span longer than this is a phrase or sentence, not a keyword
+MAX_BOLD_CHARS = 16
+# Share of visible text that may be bold (only judged on texts of at least MIN_RATIO_CHARS)
+MAX_BOLD_RATIO = 0.3
+MIN_RATIO_CHARS = 60
+# A paragraph line with this many ';'-separated items should be a list
+MIN_LIST_ITEMS = 3
+
+decisions: Counter = Counter()
+
+
+def _plain(line: str) -> str:
+    """Visible text of a Markdown line (tags and emphasis markers removed)."""
+    return _TAG_RE.sub('', line).replace('**', '').replace('~~', '')
+
+
+def _issue(name: str, severity: str, detail: str) -> Dict[str, str]:
+    return {"check": name, "severity": severity, "detail": detail}
+
+
+def check_structure(markdown: str) -> List[Dict[str, str]]:
+    issues = []
+    if '```' in markdown:
+        issues.append(_issue("structure", "hard", "内容中包含代码块标记 ```"))
+    stripped = markdown.strip()
+    if stripped.startswith('{') and stripped.endswith('}'):
+        issues.append(_issue("structure", "hard", "内容是 JSON 而不是 Markdown"))
+    for i, line in enumerate(markdown.split('\n'), 1):
+        if line.count('**') % 2:
+            issues.append(_issue("structure", "hard", f"第 {i} 行加粗标记 ** 未闭合"))
+        if line.count('~~') % 2:
+            issues.append(_issue("structure", "hard", f"第 {i} 行删除线标记 ~~ 未闭合"))
+        for tag in ('u', 'span'):
+            if len(re.findall(rf'<{tag}[\s>]', line)) != line.count(f'</{tag}>'):
+                issues.append(_issue("structure", "hard", f"第 {i} 行 <{tag}> 标签未闭合"))
+    return issues
+
+
+def check_emoji(markdown: str, original: str = "") -> List[Dict[str, str]]:
+    """Emoji and symbols the original did not already contain."""
+    issues = []
+    emoji = sorted(set(_EMOJI_RE.findall(markdown)) - set(original))
+    if emoji:
+        issues.append(_issue("no_emoji", "hard", f"包含表情符号: {''.join(emoji)}"))
+    symbols = sorted(set(_SYMBOL_RE.findall(markdown)) - set(original))
+    if symbols:
+        issues.append(_issue("no_emoji", "soft", f"包含原文没有的符号: {''.join(symbols)}"))
+    return issues
+
+
+def check_bold(markdown: str) -> List[Dict[str, str]]:
+    issues = []
+    bold_chars = total_chars = 0
+    for line in markdown.split('\n'):
+        if line.lstrip().startswith('#'):
+            continue
+        spans = [_plain(s) for s in _BOLD_RE.findall(line)]
+        bold_chars += sum(len(s) for s in spans)
+        total_chars += len(_plain(line).strip())
+        for span in spans:
+            if len(span) > MAX_BOLD_CHARS:
+                issues.append(_issue("bold", "soft", f"加粗过长 (应只加粗关键词): {span[:20]}"))
+    if total_chars >= MIN_RATIO_CHARS and bold_chars / total_chars > MAX_BOLD_RATIO:
+        issues.append(_issue("bold", "soft", f"加粗文字占比 {bold_chars / total_chars:.0%}，过多"))
+    return issues
+
+
+def check_lists(markdown: str) -> List[Dict[str, str]]:
+    issues = []
+    for line in markdown.split('\n'):
+        if _LIST_RE.match(line) or line.lstrip().startswith('#'):
+            continue
+        items = [s for s in _ITEM_SEPARATORS_RE.split(_plain(line)) if s.strip()]
+        if len(items) >= MIN_LIST_ITEMS:
+            issues.append(_issue("list", "soft", f"多项内容未使用列表: {_plain(line)[:20]}"))
+    return issues
+
+
+def check_fit(markdown: str, original: str, block_size: Optional[Dict[str, float]]) -> List[Dict[str, str]]:
+    if not block_size:
+        return []
+    width, height = block_size.get("width", 0), block_size.get("height", 0)
+    if width <= 0 or height <= 0:
+        return []
+    # Same bound as generation: an original that already overflowed sets the limit
+    if original:
+        height = max(height, measure_markdown(original, width)["height"])
+    size = measure_markdown(markdown, width)
+    if size["height"] > height:
+        return [_issue("fit", "soft", f"排版后约 {size['line_count']} 行，超出区域 {size['height'] - height:.0f}px")]
+    return []
+
+
+def check_preserved(markdown: str, original: str) -> List[Dict[str, str]]:
+    if not original:
+        return []
+    new_plain, old_plain = _plain(markdown), _plain(original)
+    new_numbers = set(_NUMBER_RE.findall(new_plain))
+    missing_numbers = sorted(set(_NUMBER_RE.findall(old_plain)) - new_numbers)
+    new_entities = {e.lower() for e in _ENTITY_RE.findall(new_plain)}
+    missing_entities = sorted({e for e in _ENTITY_RE.findall(old_plain) if e.lower() not in new_entities})
+    issues = []
+    if missing_numbers:
+        issues.append(_issue("preserved", "soft", f"原文数字缺失: {', '.join(missing_numbers[:10])}"))
+    if missing_entities:
+        issues.append(_issue("preserved", "soft", f"原文专有名词缺失: {', '.join(missing_entities[:10])}"))
+    return issues
+
+
+def evaluate(markdown: str, original: str = "", block_size: Optional[Dict[str, float]] = None,
+             record: bool = True) -> Dict[str, Any]:
+    """
+    Run all checks: {"decision", "score", "issues"}.
+    original is the Markdown before modification ("" for create).
+    record=False leaves the decision counters alone (e.g. when ranking candidate drafts).
+    """
+    markdown = markdown or ""
+    if not markdown.strip():
+        issues = [_issue("structure", "hard", "未生成修改内容")]
+    else:
+        issues = (check_structure(markdown) + check_emoji(markdown, original) + check_bold(markdown)
+                  + check_lists(markdown) + check_fit(markdown, original, block_size)
+                  + check_preserved(markdown, original))
+
+    hard = sum(1 for i in issues if i["severity"] == "hard")
+    soft = len(issues) - hard
+    decision = "fail" if hard else "borderline" if soft else "pass"
+    if record:
+        decisions[decision] += 1
+    return {
+        "decision": decision,
+        "score": max(100 - 30 * hard - 10 * soft, 0),
+        "issues": issues,
+    }
+
+
+_DECISION_ORDER = {"pass": 0, "borderline": 1, "fail": 2}
+
+
+def rank(results: List[Dict[str, Any]]) -> List[int]:
+    """Indices of gate results, best first: by decision, then score; ties keep the original order."""
+    return sorted(range(len(results)),
+                  key=lambda i: (_DECISION_ORDER[results[i]["decision"]], -results[i]["score"], i))
+
+
+def stats() -> Dict[str, Any]:
+    total = sum(decisions.values())
+    return {
+        **{d: decisions[d] for d in ("pass", "borderline", "fail")},
+        # Share of evaluations that did not need the LLM judge
+        "llm_skipped_rate": round((decisions["pass"] + decisions["fail"]) / total, 4) if total else 0.0,
+    }
@@ -0,0 +1,145 @@
+"""
+Single-flight coalescing of identical in-flight work.
+
+When the same request arrives again while the first one is still running (double
+clicks, frontend retries), the duplicate joins the running call instead of starting
+another one:
+- do(key, work): duplicates await the same task and get the same result (or exception)
+- stream(key, factory): one async generator is driven in the background; every
+  subscriber receives all of its items, late joiners replay the ones already produced
+Work is cancelled once every caller has gone away. Nothing is kept after completion,
+so this is not a cache: a request that arrives after the first finished runs again.
+"""
+import asyncio
+import hashlib
+import json
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+
+def normalize_text(text: Optional[str]) -> str:
+    """Collapse whitespace so trivially different retries share a key."""
+    return " ".join((text or "").split())
+
+
+def request_key(kind: str, *parts: Any) -> str:
+    payload = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+    return f"{kind}:{hashlib.sha1(payload.encode('utf-8')).hexdigest()}"
+
+
+class _Call:
+    def __init__(self, task: "asyncio.Task"):
+        self.task = task
+        self.waiters = 0
+
+
+class _Broadcast:
+    def __init__(self):
+        self.items: List[Any] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.task: Optional["asyncio.Task"] = None
+        self._wake = asyncio.Event()
+
+    def publish(self, item: Any) -> None:
+        self.items.append(item)
+        self._notify()
+
+    def close(self, error: Optional[BaseException] = None) -> None:
+        self.done = True
+        self.error = error
+        self._notify()
+
+    def _notify(self) -> None:
+        self._wake.set()
+        self._wake = asyncio.Event()
+
+    async def subscribe(self) -> AsyncIterator[Any]:
+        i = 0
+        while True:
+            # Capture the event before draining, so an item published meanwhile is not missed
+            wake = self._wake
+            while i < len(self.items):
+                yield self.items[i]
+                i += 1
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            await wake.wait()
+
+
+class SingleFlight:
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self._streams: Dict[str, _Broadcast] = {}
+        self._stats = {"calls": 0, "shared_calls": 0, "streams": 0, "shared_streams": 0}
+
+    async def do(self, key: str, work: Callable[[], Awaitable[Any]]) -> Any:
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.create_task(work()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _: self._forget(self._calls, key, call))
+            self._stats["calls"] += 1
+        else:
+            self._stats["shared_calls"] += 1
+
+        call.waiters += 1
+        try:
+            # shield: a caller going away must not cancel the work for the others
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                call.task.cancel()
+
+    async def stream(self, key: str, factory: Callable[[], AsyncIterator[Any]]) -> AsyncIterator[Any]:
+        broadcast = self._streams.get(key)
+        if broadcast is None:
+            broadcast = _Broadcast()
+            self._streams[key] = broadcast
+            broadcast.task = asyncio.create_task(self._drive(key, broadcast, factory))
+            self._stats["streams"] += 1
+        else:
+            self._stats["shared_streams"] += 1
+
+        broadcast.subscribers += 1
+        try:
+            async for item in broadcast.subscribe():
+                yield item
+        finally:
+            broadcast.subscribers -= 1
+            if broadcast.subscribers == 0 and not broadcast.done:
+                broadcast.task.cancel()
+
+    async def _drive(self, key: str, broadcast: _Broadcast, factory: Callable[[], AsyncIterator[Any]]) -> None:
+        try:
+            async for item in factory():
+                broadcast.publish(item)
+            broadcast.close()
+        except asyncio.CancelledError:
+            broadcast.close(asyncio.CancelledError())
+            raise
+        except Exception as e:
+            broadcast.close(e)
+        finally:
+            self._forget(self._streams, key, broadcast)
+
+    @staticmethod
+    def _forget(registry: Dict[str, Any], key: str, entry: Any) -> None:
+        if registry.get(key) is entry:
+            del registry[key]
+
+    def stats(self) -> Dict[str, Any]:
+        started = self._stats["calls"] + self._stats["streams"]
+        shared = self._stats["shared_calls"] + self._stats["shared_streams"]
+        return {
+            **self._stats,
+            "in_flight": len(self._calls) + len(self._streams),
+            # Share of requests that joined a running one instead of starting their own
+            "coalesced_rate": round(shared / (started + shared), 4) if started + shared else 0.0,
+        }
+
+
+single_flight = SingleFlight()
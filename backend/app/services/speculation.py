@@ -0,0 +1,137 @@
+"""
+Speculative work started in parallel with the supervisor.
+
+The supervisor node starts likely downstream work (research prefetch, a modify draft)
+before the route is known. Downstream nodes take() the result when the supervisor
+confirms the route; everything else is discarded (cancelled if still running).
+Task handles live here rather than in AgentState, since graph state is checkpointed.
+"""
+import asyncio
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional
+
+from langchain_community.callbacks import get_openai_callback
+
+KINDS = ("research", "modify")
+
+# Entries that are never taken (e.g. the run failed) are cancelled after this many seconds
+_MAX_AGE_SECONDS = 300
+
+
+def _add_waste_when_done(stats: Dict[str, Any], spec: "_Speculation"):
+    def done(_):
+        stats["wasted_tokens"] += spec.usage["tokens"]
+    return done
+
+
+class _Speculation:
+    def __init__(self, kind: str, task: "asyncio.Task", usage: Dict[str, int]):
+        self.kind = kind
+        self.task = task
+        self.usage = usage
+        self.started = time.perf_counter()
+
+
+class SpeculationRegistry:
+    """
+    Speculative tasks keyed by run id, with counters for tuning:
+    hits / misses per kind, tokens spent on used vs discarded work, and time saved
+    (how long a hit had already been running when it was taken).
+    Tokens are counted from LLM responses, so requests cancelled mid-flight count as
+    cancellations but not as tokens.
+    """
+
+    def __init__(self):
+        self._runs: Dict[str, Dict[str, _Speculation]] = {}
+        self._stats = {kind: {"started": 0, "hits": 0, "misses": 0, "cancelled": 0, "failed": 0,
+                              "used_tokens": 0, "wasted_tokens": 0, "saved_ms": 0.0} for kind in KINDS}
+
+    def new_run(self) -> str:
+        self._prune()
+        run_id = uuid.uuid4().hex
+        self._runs[run_id] = {}
+        return run_id
+
+    def start(self, run_id: str, kind: str, work: Callable[[], Awaitable[Any]]) -> None:
+        usage = {"tokens": 0, "ms": 0.0}
+
+        async def counted():
+            start = time.perf_counter()
+            # The callback is context-local, so it only sees LLM calls made by this task
+            with get_openai_callback() as cb:
+                try:
+                    return await work()
+                finally:
+                    usage["tokens"] = cb.total_tokens
+                    usage["ms"] = (time.perf_counter() - start) * 1000
+
+        self._runs.setdefault(run_id, {})[kind] = _Speculation(kind, asyncio.create_task(counted()), usage)
+        self._stats[kind]["started"] += 1
+
+    async def take(self, run_id: Optional[str], kind: str) -> Optional[Any]:
+        """Result of the speculative task (awaiting it if still running), or None if absent or failed."""
+        specs = self._runs.get(run_id, {}) if run_id else {}
+        spec = specs.pop(kind, None)
+        if run_id in self._runs and not specs:
+            del self._runs[run_id]
+        if spec is None:
+            return None
+        stats = self._stats[kind]
+        # Head start the work had over running it now: its full duration if already done
+        saved_ms = spec.usage["ms"] if spec.task.done() else (time.perf_counter() - spec.started) * 1000
+        try:
+            result = await spec.task
+        except Exception as e:
+            print(f"⚠️ [Speculation] {kind} failed: {e}")
+            stats["failed"] += 1
+            stats["wasted_tokens"] += spec.usage["tokens"]
+            return None
+        stats["hits"] += 1
+        stats["used_tokens"] += spec.usage["tokens"]
+        stats["saved_ms"] += saved_ms
+        return result
+
+    def discard(self, run_id: Optional[str], kinds: Iterable[str] = KINDS) -> None:
+        """Drop speculative work the confirmed route does not need."""
+        specs = self._runs.get(run_id, {}) if run_id else {}
+        for kind in list(kinds):
+            spec = specs.pop(kind, None)
+            if spec is None:
+                continue
+            stats = self._stats[kind]
+            stats["misses"] += 1
+            if spec.task.done():
+                stats["wasted_tokens"] += spec.usage["tokens"]
+            else:
+                stats["cancelled"] += 1
+                spec.task.add_done_callback(_add_waste_when_done(stats, spec))
+                spec.task.cancel()
+        if run_id in self._runs and not self._runs[run_id]:
+            del self._runs[run_id]
+
+    def finish(self, run_id: Optional[str]) -> None:
+        """Discard whatever is left for a run (called once its route is settled)."""
+        if run_id in self._runs:
+            self.discard(run_id, list(self._runs[run_id]))
+            self._runs.pop(run_id, None)
+
+    def _prune(self) -> None:
+        now = time.perf_counter()
+        for run_id, specs in list(self._runs.items()):
+            if all(now - s.started > _MAX_AGE_SECONDS for s in specs.values()):
+                self.finish(run_id)
+
+    def stats(self) -> Dict[str, Any]:
+        report = {}
+        for kind, s in self._stats.items():
+            decided = s["hits"] + s["misses"]
+            report[kind] = {
+                **s,
+                "saved_ms": round(s["saved_ms"], 1),
+                "hit_rate": round(s["hits"] / decided, 4) if decided else 0.0,
+            }
+        return report
+
+
+speculation = SpeculationRegistry()
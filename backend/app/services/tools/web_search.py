@@ -7,6 +7,7 @@ from langchain_core.output_parsers import StrOutputParser
 from ddgs import DDGS
 
 from app.core.config import settings
+from app.core.http_client import model_http_clients
 
 # ==========================================
 # 1. 初始化模型 (用于最后的总结清洗)
@@ -16,7 +17,8 @@ llm = ChatOpenAI(
     model=settings.LLM_MODEL_LITE,
     openai_api_key=settings.OPENAI_API_KEY,
     openai_api_base=settings.OPENAI_API_BASE,
-    temperature=0.1
+    temperature=0.1,
+    **model_http_clients.chat_model_clients(),
 )
 
 # ==========================================
@@ -0,0 +1,219 @@
+import os
+import sys
+import gc
+import json
+import time
+import random
+import argparse
+import platform
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+# Ensure backend is in path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core import json_codec
+from app.services.format_converter import delta_to_markdown, markdown_to_delta, _ops_to_markdown, parse_inline_styles
+
+# 合成简历语料：固定随机种子，保证每次生成的输入完全一致，结果可横向对比
+LINES_PER_PAGE = 40
+DEFAULT_PAGES = [1, 5, 10, 25, 50]
+
+# 吞吐下限 (ops/s)：_ops_to_markdown 需线性处理 1 万以上 ops 的长文档 (单元测试只校验输出，不计时)
+OPS_THROUGHPUT_TARGET = 200_000
+
+_CJK_PHRASES = [
+    "负责核心交易系统的架构设计与性能优化", "主导微服务拆分，接口平均延迟降低", "带领团队完成数据平台迁移",
+    "参与推荐算法迭代，点击率提升", "搭建自动化测试与持续集成流程", "优化数据库索引与慢查询",
+]
+_EN_PHRASES = [
+    "Python", "Go", "Kubernetes", "Redis cluster", "PostgreSQL", "React + TypeScript",
+    "designed a streaming ETL pipeline", "reduced p99 latency",
+]
+_SECTIONS = ["工作经历", "项目经历", "专业技能", "教育背景", "Open Source"]
+
+
+def _styled(rng: random.Random, text: str) -> str:
+    """随机包裹一层行内样式 (加粗/斜体/下划线/删除线/颜色/字号/链接)"""
+    style = rng.randrange(9)
+    if style == 0:
+        return f"**{text}**"
+    if style == 1:
+        return f"*{text}*"
+    if style == 2:
+        return f"<u>{text}</u>"
+    if style == 3:
+        return f"~~{text}~~"
+    if style == 4:
+        return f'<span style="color: #d{rng.randrange(10)}3; font-size: {rng.choice([12, 16])}px">{text}</span>'
+    if style == 5:
+        return f"[{text}](https://github.com/cecraft/{rng.randrange(100)})"
+    if style == 6:
+        return f"**{text} <u>{rng.choice(_EN_PHRASES)}</u>**"
+    return text
+
+
+def _sentence(rng: random.Random) -> str:
+    parts = []
+    for _ in range(rng.randint(2, 5)):
+        phrase = rng.choice(_CJK_PHRASES) if rng.random() < 0.6 else rng.choice(_EN_PHRASES)
+        parts.append(_styled(rng, phrase))
+    return "，".join(parts) + f" {rng.randint(5, 95)}%"
+
+
+def generate_resume_markdown(pages: int, seed: int = 7) -> str:
+    """生成约 pages 页 (每页 LINES_PER_PAGE 行) 的 Markdown 简历"""
+    rng = random.Random(seed)
+    lines = ["# 张三 · 高级后端工程师", "**电话** 138-0000-0000 | [GitHub](https://github.com/zhangsan)"]
+    while len(lines) < pages * LINES_PER_PAGE:
+        lines.append(f"## {rng.choice(_SECTIONS)}")
+        lines.append(f"### {rng.choice(_EN_PHRASES)} · 2019 - 2024")
+        for i in range(rng.randint(3, 8)):
+            kind = rng.randrange(4)
+            if kind == 0:
+                lines.append(f"{i + 1}. {_sentence(rng)}")
+            elif kind == 1:
+                lines.append(f"   - {_sentence(rng)}")
+            elif kind == 2:
+                lines.append(f"- {_sentence(rng)}")
+            else:
+                lines.append(_sentence(rng))
+        if rng.random() < 0.2:
+            lines.append("---")
+    return "\n".join(lines[:pages * LINES_PER_PAGE])
+
+
+def markdown_to_ops(markdown_text: str) -> List[Dict[str, Any]]:
+    """把语料转成前端 BlockKit ops (sketchToTextDelta 的形态)：每行的块属性挂在换行符上"""
+    ops = []
+    for line in markdown_text.split("\n"):
+        attributes = {}
+        stripped = line.strip()
+        if stripped.startswith("#"):
+            level = len(stripped) - len(stripped.lstrip("#"))
+            attributes["header"] = level
+            stripped = stripped[level:].strip()
+        elif stripped.startswith("- "):
+            attributes["list"] = "bullet"
+            stripped = stripped[2:]
+        elif stripped[:1].isdigit() and ". " in stripped[:4]:
+            attributes["list"] = "ordered"
+            stripped = stripped.split(". ", 1)[1]
+        for i, chunk in enumerate(stripped.split("**")):
+            # 每个短语一个 run，贴近前端按样式切分的 ops 密度
+            for phrase in filter(None, chunk.split("，")):
+                ops.append({"insert": phrase, "attributes": {"bold": True}} if i % 2 else {"insert": phrase})
+        ops.append({"insert": "\n", "attributes": attributes} if attributes else {"insert": "\n"})
+    return ops
+
+
+def measure(fn: Callable[[], Any], repeat: int) -> Dict[str, Any]:
+    """
+    计时 + 内存：
+    - seconds: repeat 次中的最小耗时 (排除调度抖动)
+    - peak_kb: tracemalloc 统计的峰值内存
+    - blocks: 调用结束时仍存活的新分配块数 (含返回值)
+    - gc_collections: 调用期间第 0 代 GC 次数 (每次约对应 700 个容器对象的净分配)
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+
+    gc.collect()
+    gen0_before = gc.get_stats()[0]["collections"]
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    result = fn()
+    after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    gen0_after = gc.get_stats()[0]["collections"]
+
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename") if stat.count_diff > 0)
+    del result
+    return {
+        "seconds": round(min(timings), 6),
+        "peak_kb": round(peak / 1024, 1),
+        "blocks": blocks,
+        "gc_collections": gen0_after - gen0_before,
+    }
+
+
+def run_suite(pages_list: List[int], repeat: int = 3) -> Dict[str, Any]:
+    results = []
+    for pages in pages_list:
+        markdown_text = generate_resume_markdown(pages)
+        delta_json = markdown_to_delta(markdown_text)
+        ops = markdown_to_ops(markdown_text)
+        md_lines = markdown_text.split("\n")
+
+        cases = {
+            # delta_to_markdown 关闭缓存，测的是转换本身
+            "delta_to_markdown": (lambda: delta_to_markdown(delta_json, use_cache=False), len(delta_json)),
+            "markdown_to_delta": (lambda: markdown_to_delta(markdown_text), len(markdown_text)),
+            "_ops_to_markdown": (lambda: _ops_to_markdown(ops), len(json_codec.dumps(ops))),
+            "parse_inline_styles": (lambda: [parse_inline_styles(line, {}) for line in md_lines], len(markdown_text)),
+        }
+        for name, (fn, input_chars) in cases.items():
+            stats = measure(fn, repeat)
+            seconds = stats["seconds"] or 1e-9
+            row = {
+                "function": name,
+                "pages": pages,
+                "input_chars": input_chars,
+                "lines": len(md_lines),
+                **stats,
+                "chars_per_s": int(input_chars / seconds),
+                "lines_per_s": int(len(md_lines) / seconds),
+            }
+            if name == "_ops_to_markdown":
+                row["ops"] = len(ops)
+                row["ops_per_s"] = int(len(ops) / seconds)
+                row["meets_target"] = row["ops_per_s"] >= OPS_THROUGHPUT_TARGET
+            results.append(row)
+            print(f"  {name:<20} {pages:>3} pages  {stats['seconds'] * 1000:>9.2f} ms  "
+                  f"peak {stats['peak_kb']:>9.1f} KB  blocks {stats['blocks']:>7}")
+
+    return {
+        "python": platform.python_version(),
+        "orjson": json_codec.orjson is not None,
+        "repeat": repeat,
+        "lines_per_page": LINES_PER_PAGE,
+        "ops_throughput_target": OPS_THROUGHPUT_TARGET,
+        "results": results,
+    }
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any]) -> None:
+    """与基线报告逐项对比耗时与峰值内存 (比值 > 1 表示变慢/变大)"""
+    old = {(r["function"], r["pages"]): r for r in baseline.get("results", [])}
+    print("\n📊 Compared to baseline (time x, peak x):")
+    for r in report["results"]:
+        base = old.get((r["function"], r["pages"]))
+        if not base:
+            continue
+        time_ratio = r["seconds"] / base["seconds"] if base["seconds"] else 0
+        mem_ratio = r["peak_kb"] / base["peak_kb"] if base["peak_kb"] else 0
+        flag = " ⚠️" if time_ratio > 1.2 or mem_ratio > 1.2 else ""
+        print(f"  {r['function']:<20} {r['pages']:>3} pages  {time_ratio:.2f}x  {mem_ratio:.2f}x{flag}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Format converter benchmark on synthetic resumes")
+    parser.add_argument("--pages", default=",".join(map(str, DEFAULT_PAGES)), help="逗号分隔的页数，如 1,5,50")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default="converter_bench_report.json")
+    parser.add_argument("--baseline", help="上一次的报告 JSON，用于对比回归")
+    args = parser.parse_args()
+
+    print("🚀 Format converter benchmark")
+    report = run_suite([int(p) for p in args.pages.split(",")], args.repeat)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"✅ Report saved to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            compare(report, json.load(f))
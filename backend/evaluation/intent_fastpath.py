@@ -0,0 +1,145 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+# Ensure backend (app.*) and tests (labelled cases) are in path
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+sys.path.append(os.path.join(BACKEND_DIR, "tests"))
+
+from app.services.intent_classifier import IntentClassifier
+from app.services.intent_examples import labeled_examples
+from intent_cases import build_cases
+
+# 本地分类器评测：训练集为 app/services/intent_examples.py，评测集为 tests/intent_cases.py (留出集)
+# 离线模式按 --llm-ms 估算节省的延迟；--live 模式真实调用 Supervisor LLM 计时，并对比混合路由与纯 LLM 的准确率
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)]
+
+
+async def _llm_supervisor(prompt: str) -> Dict[str, Any]:
+    # 延迟导入：离线模式不需要 .env / LLM 配置
+    from app.services.agent_workflow import llm_service
+    classifier = llm_service.intent_classifier
+    start = time.perf_counter()
+    # 临时关闭快速通道，测的是纯 LLM 的决策与耗时
+    threshold, classifier.threshold = classifier.threshold, float("inf")
+    try:
+        decision = await llm_service.process_supervisor_request(prompt, history=[])
+    finally:
+        classifier.threshold = threshold
+    return {"intent": (decision.get("next_agent") or "").strip(), "ms": (time.perf_counter() - start) * 1000}
+
+
+async def evaluate(threshold: float, min_similarity: float, llm_ms: float, live: bool) -> Dict[str, Any]:
+    classifier = IntentClassifier(labeled_examples(), threshold=threshold, min_similarity=min_similarity)
+    cases = build_cases()
+
+    rows = []
+    for case in cases:
+        start = time.perf_counter()
+        prediction = classifier.predict(case.prompt)
+        local_ms = (time.perf_counter() - start) * 1000
+
+        row = {
+            "prompt": case.prompt,
+            "expected": case.expected,
+            "predicted": prediction["intent"],
+            "confidence": prediction["confidence"],
+            "similarity": prediction["similarity"],
+            "fast_path": prediction["confident"],
+            "local_ms": round(local_ms, 3),
+        }
+        if live:
+            llm = await _llm_supervisor(case.prompt)
+            row["llm_intent"] = llm["intent"]
+            row["llm_ms"] = round(llm["ms"], 1)
+        rows.append(row)
+
+        status = "⚡" if row["fast_path"] else "↪"
+        print(f"{status} 期望={case.expected:<17} 本地={str(prediction['intent']):<17} "
+              f"conf={prediction['confidence']:.2f} sim={prediction['similarity']:.2f} | {case.prompt}")
+
+    total = len(rows)
+    fast = [r for r in rows if r["fast_path"]]
+    llm_latencies = [r["llm_ms"] for r in rows if "llm_ms" in r]
+    avg_llm_ms = sum(llm_latencies) / len(llm_latencies) if llm_latencies else llm_ms
+
+    per_intent: Dict[str, Dict[str, int]] = defaultdict(lambda: {"total": 0, "fast_path": 0, "fast_path_correct": 0})
+    for r in rows:
+        stats = per_intent[r["expected"]]
+        stats["total"] += 1
+        if r["fast_path"]:
+            stats["fast_path"] += 1
+            stats["fast_path_correct"] += r["predicted"] == r["expected"]
+
+    local_latencies = [r["local_ms"] for r in rows]
+    report: Dict[str, Any] = {
+        "train_examples": len(classifier.labels),
+        "eval_cases": total,
+        "threshold": threshold,
+        "min_similarity": min_similarity,
+        # 不设阈值时本地分类器单独的准确率
+        "local_accuracy": round(sum(r["predicted"] == r["expected"] for r in rows) / total, 4),
+        # 走快速通道的请求中分对的比例 (决定路由质量)
+        "fast_path_accuracy": round(sum(r["predicted"] == r["expected"] for r in fast) / len(fast), 4) if fast else 0.0,
+        "fast_path_rate": round(len(fast) / total, 4),
+        "fallback_rate": round(1 - len(fast) / total, 4),
+        "local_p50_ms": round(_percentile(local_latencies, 0.5), 3),
+        "local_max_ms": round(max(local_latencies), 3),
+        "llm_ms": round(avg_llm_ms, 1),
+        "llm_ms_source": "measured" if llm_latencies else "--llm-ms",
+        # 每个走快速通道的请求省掉一次 Supervisor 调用 (减去本地分类耗时)
+        "latency_saved_ms_total": round(sum(avg_llm_ms - r["local_ms"] for r in fast), 1),
+        "latency_saved_ms_per_request": round(sum(avg_llm_ms - r["local_ms"] for r in fast) / total, 1),
+        "per_intent": dict(per_intent),
+    }
+    if live:
+        hybrid = [r["predicted"] if r["fast_path"] else r["llm_intent"] for r in rows]
+        report["llm_accuracy"] = round(sum(r["llm_intent"] == r["expected"] for r in rows) / total, 4)
+        report["hybrid_accuracy"] = round(sum(p == r["expected"] for p, r in zip(hybrid, rows)) / total, 4)
+    report["cases"] = rows
+    return report
+
+
+def print_summary(report: Dict[str, Any]) -> None:
+    print("\n----------------------------------------")
+    print(f"训练样例 {report['train_examples']} 条，评测 {report['eval_cases']} 条 "
+          f"(threshold={report['threshold']}, min_similarity={report['min_similarity']})")
+    print(f"本地分类准确率 (不设阈值): {report['local_accuracy']:.2%}")
+    print(f"快速通道占比: {report['fast_path_rate']:.2%}，其中准确率 {report['fast_path_accuracy']:.2%}")
+    print(f"回退 LLM 比例: {report['fallback_rate']:.2%}")
+    print(f"本地分类耗时: p50 {report['local_p50_ms']} ms, max {report['local_max_ms']} ms")
+    print(f"节省延迟: 平均每请求 {report['latency_saved_ms_per_request']} ms "
+          f"(Supervisor LLM {report['llm_ms']} ms, {report['llm_ms_source']})")
+    if "hybrid_accuracy" in report:
+        print(f"准确率对比: 纯 LLM {report['llm_accuracy']:.2%} / 快速通道+LLM {report['hybrid_accuracy']:.2%}")
+    for intent, stats in report["per_intent"].items():
+        print(f"- {intent:<17} 快速通道 {stats['fast_path']:02d}/{stats['total']:02d}，分对 {stats['fast_path_correct']:02d}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local intent fast-path evaluation")
+    parser.add_argument("--threshold", type=float, default=0.7)
+    parser.add_argument("--min-similarity", type=float, default=0.15)
+    parser.add_argument("--llm-ms", type=float, default=1500.0, help="离线模式下假设的 Supervisor LLM 单次耗时 (ms)")
+    parser.add_argument("--live", action="store_true", help="真实调用 Supervisor LLM (需要 .env 配置)")
+    parser.add_argument("--output", default="intent_fastpath_report.json")
+    args = parser.parse_args()
+
+    print("🚀 Intent fast-path evaluation")
+    report = asyncio.run(evaluate(args.threshold, args.min_similarity, args.llm_ms, args.live))
+    print_summary(report)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"✅ Report saved to {args.output}")
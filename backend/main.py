@@ -1,4 +1,5 @@
 import uvicorn
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.v1 import agent as agent_router
@@ -6,11 +7,21 @@ from app.api.v1 import auth as auth_router
 from app.api.v1 import resumes as resumes_router
 from app.db.base import Base
 from app.db.session import engine
+from app.core.http_client import model_http_clients
+from app.services.conversion_executor import conversion_executor
 
 # Create tables
 Base.metadata.create_all(bind=engine)
 
-app = FastAPI(title="CECraft Agent API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 启动时预热格式转换进程池；关闭时回收进程池与模型调用连接池
+    conversion_executor.start()
+    yield
+    conversion_executor.shutdown()
+    await model_http_clients.aclose()
+
+app = FastAPI(title="CECraft Agent API", lifespan=lifespan)
 
 # 配置 CORS
 app.add_middleware(
@@ -0,0 +1,158 @@
+# 意图分类评测样例 (不依赖 app 配置，可被评测脚本直接导入)
+# tests/run_intent_accuracy.py 用它评测 LLM Supervisor；evaluation/intent_fastpath.py 用它评测本地分类器
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+
+INTENTS: Tuple[str, ...] = (
+    "chat",
+    "modify",
+    "research_consult",
+    "research_modify",
+)
+
+RESEARCH_MODIFY_TOOLS: Tuple[str, ...] = (
+    "web",
+    "rag",
+    "both",
+)
+
+
+@dataclass(frozen=True)
+class Case:
+    expected: str
+    prompt: str
+    expected_tool: Optional[str] = None
+
+
+def build_cases() -> List[Case]:
+    """每个意图 10 条样例；research_modify 细分 web/rag/both 各 10 条。
+
+    注意：
+    - 大类用 Supervisor 输出的 next_agent。
+    - 当 next_agent == research_modify 时，再用 ToolRouter 选择 web/rag/both。
+    """
+
+    # chat：闲聊/功能询问/通用建议（不要求搜索、不要求改简历）
+    chat_prompts = [
+        "你好，你是谁？能做什么？",
+        "你能简单介绍一下怎么写一份好简历吗？",
+        "我最近有点焦虑，找工作该怎么规划？",
+        "面试时如何自我介绍更自然？给我一个通用模板。",
+        "我想从后端转前端，你觉得可行吗？",
+        "你觉得简历最重要的三点是什么？",
+        "请给我一些职业发展建议：3年后端如何进阶？",
+        "你能解释一下 STAR 法则是什么吗？",
+        "你支持哪些格式的简历内容？",
+        "我应该如何选择城市：北京还是上海？",
+    ]
+
+    # modify：明确的文本润色/改写/翻译/纠错（不强调对标市场/JD/调研）
+    modify_prompts = [
+        "把这句话润色得更专业：我负责写代码，修bug，维护服务器。",
+        "把这段经历改短一些（两句话以内）：主导接口开发，优化数据库查询，提升响应速度。",
+        "请纠正错别字并优化表达：我熟悉pyhton和flask，能独立完成接口开发。",
+        "把下面内容翻译成英文：熟悉 Python、FastAPI，负责过支付系统的开发与维护。",
+        "帮我把语气改得更自信：我可能做过一些性能优化。",
+        "把这段话改成要点列表：搭建CI/CD；监控报警；容器化部署。",
+        "帮我把这段描述改成更有冲击力但不夸张：优化查询性能，减少线上超时。",
+        "把下面这句话改成更正式：我会用Redis。",
+        "请把这段话按技术栈拆分并润色：做过微服务，消息队列，缓存和日志系统。",
+        "将以下内容改写成简历风格：我在学校做过很多项目，学到了很多东西。",
+    ]
+
+    # research_consult：只想查信息（薪资/面试题/公司/行业趋势），不要求改简历
+    research_consult_prompts = [
+        "帮我查一下 2025 年上海 Python 后端工程师的薪资范围。",
+        "请调研一下现在大厂对 DevOps 工程师的核心要求有哪些？",
+        "字节跳动后端面试一般会考哪些题型？",
+        "2025 年数据分析师的主流技能栈是什么？",
+        "帮我搜集一下 AI Agent 岗位的典型职责和常见技能要求。",
+        "现在 Java 高级工程师的行情怎么样？大概多少薪资？",
+        "请查一下 Spring Boot 面试高频题有哪些，并简单归类。",
+        "最近两年前端岗位更看重哪些能力？",
+        "帮我了解一下‘大模型算法工程师’常用的技术栈和方向。",
+        "请调研一下外企和互联网公司简历风格差异有哪些？",
+    ]
+
+    # research_modify：要利用调研/JD/范例来改简历（对标、根据要求优化、参考等）
+    # ToolRouter 语义（见 graph_workflow.py）：
+    # - web: 公司/JD/市场/实时信息
+    # - rag: 简历写作技巧、STAR范例、内部知识
+    # - both: 二者都需要
+
+    research_modify_web_prompts = [
+        "根据字节跳动后端 JD 的要求（可以先查一下核心能力点），帮我重写这段项目经历：负责订单系统开发。",
+        "请先搜索一下 2025 年‘AI Agent 工程师’岗位 JD 的常见关键词，再据此优化我的技能描述：熟悉 Python、LangChain。",
+        "对标阿里云 DevOps 岗位要求（先查 JD），优化我的简历要点：负责发布流程。",
+        "先查一下美团后端工程师常见面试/能力要求，然后把我这段经历改得更贴合：做过接口开发。",
+        "请调研一下外企（例如微软/谷歌）SWE 简历写法偏好，再按那个风格改写：做过微服务项目。",
+        "先查一下 2025 年上海 Python 后端的主流技术要求，然后据此优化我的技能栈：会 FastAPI、Redis。",
+        "根据最新行业对数据分析师的要求（请先调研），改写我的技能清单：SQL、Excel、Python。",
+        "先查一下大模型算法工程师 JD 常见要求，再对标改写我的项目亮点：训练过分类模型。",
+        "请先搜索一下前端高级工程师岗位常见要求，再据此改写我的项目经历：做过中后台性能优化。",
+        "对标某头部互联网公司后端 JD（先查要求），优化我的自我评价：熟悉分布式与高并发。",
+    ]
+
+    research_modify_rag_prompts = [
+        "参考 STAR 法则，把这段经历重写得更专业：负责订单系统开发。",
+        "请参考优秀简历常用表达，润色这段经历并输出更强动词：负责接口开发与维护。",
+        "用 STAR 法则把这段项目经历改写成 3 条要点：做过性能优化。",
+        "参考简历写作模板，把这段描述写得更量化：优化了系统响应速度。",
+        "请参考常见的‘项目背景-职责-结果’写法，改写：参与微服务改造。",
+        "参考面向招聘官的写法，把这段经历改成更有说服力：修复线上 bug，保障稳定性。",
+        "用简历范文的风格，把这段经历改成更专业：负责服务器维护。",
+        "参考常见技术简历的措辞，改写这段技能描述：会 Python、Redis、MySQL。",
+        "请参考 STAR 范例，把这段经历补全背景/行动/结果：做过日志系统。",
+        "参考优秀案例，把这段经历改成更清晰的 2-3 条 bullet：做过 CI/CD。",
+    ]
+
+    research_modify_both_prompts = [
+        "先查一下 AI Agent 岗位 JD 的核心技能点，再结合 STAR 法则重写这段经历：做过聊天机器人。",
+        "请先调研 2025 年资深前端常见要求，再参考大厂简历写法改写我的项目亮点：做过中后台。",
+        "先搜集 Python 后端高并发常见关键词，再参考优秀范例把这段经历写得更量化：优化了接口性能。",
+        "请先查一下数据分析师岗位主流技能栈，再按简历范文的风格改写我的技能描述：会 SQL、Excel。",
+        "先搜索外企简历风格差异，再参考 STAR 模板重写：主导微服务改造。",
+        "先查一下 DevOps 关键词（IaC、可观测性、CI/CD），再参考优秀简历措辞改写：维护发布流程。",
+        "请先调研大模型算法工程师常用技术栈，再参考大厂简历写法优化：熟悉 PyTorch。",
+        "先查一下某大厂后端 JD 的要求，再用 STAR 法则重写：负责订单系统开发。",
+        "请先搜索高级 Python 后端要求，再参考简历范文重写：做过支付系统开发与维护。",
+        "先调研前端岗位趋势，再参考优秀范例把我的项目经历写得更专业：做过性能优化。",
+    ]
+
+    buckets: Dict[str, List[str]] = {
+        "chat": chat_prompts,
+        "modify": modify_prompts,
+        "research_consult": research_consult_prompts,
+    }
+
+    for intent in INTENTS:
+        if intent == "research_modify":
+            continue
+        if intent not in buckets:
+            raise ValueError(f"Missing intent bucket: {intent}")
+        if len(buckets[intent]) != 10:
+            raise ValueError(f"Intent '{intent}' needs 10 examples, got {len(buckets[intent])}")
+
+    if len(research_modify_web_prompts) != 10:
+        raise ValueError(f"research_modify:web needs 10 examples, got {len(research_modify_web_prompts)}")
+    if len(research_modify_rag_prompts) != 10:
+        raise ValueError(f"research_modify:rag needs 10 examples, got {len(research_modify_rag_prompts)}")
+    if len(research_modify_both_prompts) != 10:
+        raise ValueError(f"research_modify:both needs 10 examples, got {len(research_modify_both_prompts)}")
+
+    cases: List[Case] = []
+    for intent in INTENTS:
+        if intent == "research_modify":
+            continue
+        for prompt in buckets[intent]:
+            cases.append(Case(expected=intent, prompt=prompt))
+
+    for prompt in research_modify_web_prompts:
+        cases.append(Case(expected="research_modify", expected_tool="web", prompt=prompt))
+    for prompt in research_modify_rag_prompts:
+        cases.append(Case(expected="research_modify", expected_tool="rag", prompt=prompt))
+    for prompt in research_modify_both_prompts:
+        cases.append(Case(expected="research_modify", expected_tool="both", prompt=prompt))
+
+    return cases
@@ -0,0 +1,78 @@
+import sys
+import os
+
+# Add backend directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.answer_cache import PUBLIC_SCOPE, SemanticAnswerCache, scope_for
+
+SALARY = [1.0, 0.2, 0.0]
+SALARY_REPHRASED = [0.98, 0.25, 0.01]
+INTERVIEW = [0.0, 0.3, 1.0]
+
+def _answer(reply):
+    return {"intention": "chat", "reply": reply, "modified_data": None}
+
+def test_similar_query_hits_and_dissimilar_misses():
+    cache = SemanticAnswerCache(threshold=0.95)
+    cache.store(SALARY, "深圳 Java 薪资", "research_consult", _answer("约 25k"))
+    hit = cache.lookup(SALARY_REPHRASED, "research_consult")
+    assert hit["answer"]["reply"] == "约 25k"
+    assert hit["query"] == "深圳 Java 薪资" and hit["similarity"] >= 0.95
+    assert cache.lookup(INTERVIEW, "research_consult") is None
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1 and stats["hit_rate"] == 0.5
+
+def test_hits_require_the_same_intent():
+    cache = SemanticAnswerCache(threshold=0.95)
+    cache.store(SALARY, "深圳 Java 薪资", "research_consult", _answer("约 25k"))
+    assert cache.lookup(SALARY, "chat") is None
+    assert cache.lookup(SALARY, "research_consult")["intent"] == "research_consult"
+
+def test_personal_scope_is_never_shared():
+    cache = SemanticAnswerCache(threshold=0.95)
+    assert scope_for(1, ["", []]) == scope_for(2, ["", []]) == PUBLIC_SCOPE
+    alice = scope_for(1, ["- 五年 Java 经验", []])
+    bob = scope_for(2, ["- 五年 Java 经验", []])
+    assert alice != bob and alice != PUBLIC_SCOPE
+    # History alone makes the answer personal
+    assert scope_for(1, ["", [{"role": "user", "content": "我在深圳"}]]) != PUBLIC_SCOPE
+
+    cache.store(SALARY, "以我的经验能拿多少", "research_consult", _answer("按你的简历约 30k"), alice)
+    assert cache.lookup(SALARY, "research_consult", bob) is None
+    assert cache.lookup(SALARY, "research_consult", PUBLIC_SCOPE) is None
+    assert cache.lookup(SALARY, "research_consult", alice)["answer"]["reply"] == "按你的简历约 30k"
+
+def test_ttl_expiry_and_staleness():
+    cache = SemanticAnswerCache(threshold=0.95, ttl_seconds=60)
+    cache.store(SALARY, "q", "research_consult", _answer("旧答案"))
+    cache._scopes[PUBLIC_SCOPE][0].created -= 30
+    hit = cache.lookup(SALARY, "research_consult")
+    assert hit is not None and hit["age_s"] >= 30
+    assert cache.stats()["avg_hit_age_s"] >= 30
+
+    cache._scopes[PUBLIC_SCOPE][0].created -= 60
+    assert cache.lookup(SALARY, "research_consult") is None
+    stats = cache.stats()
+    assert stats["expired"] == 1 and stats["entries"] == 0 and stats["scopes"] == 0
+
+def test_newest_answer_wins_and_size_is_bounded():
+    cache = SemanticAnswerCache(threshold=0.95, max_entries=2)
+    cache.store(SALARY, "q", "research_consult", _answer("第一次"))
+    cache.store(SALARY, "q", "research_consult", _answer("第二次"))
+    assert cache.lookup(SALARY, "research_consult")["answer"]["reply"] == "第二次"
+    cache.store(INTERVIEW, "面试题", "research_consult", _answer("常见问题"))
+    stats = cache.stats()
+    assert stats["entries"] == 2 and stats["evictions"] == 1
+    assert cache.lookup(INTERVIEW, "research_consult")["answer"]["reply"] == "常见问题"
+    # A zero vector is never stored
+    cache.store([0.0, 0.0, 0.0], "空", "research_consult", _answer("x"))
+    assert cache.stats()["entries"] == 2
+
+if __name__ == "__main__":
+    test_similar_query_hits_and_dissimilar_misses()
+    test_hits_require_the_same_intent()
+    test_personal_scope_is_never_shared()
+    test_ttl_expiry_and_staleness()
+    test_newest_answer_wins_and_size_is_bounded()
+    print("Test Passed!")
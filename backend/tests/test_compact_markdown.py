@@ -0,0 +1,48 @@
+import json
+import sys
+import os
+
+# Add backend directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.format_converter import (
+    MarkdownDeltaStream, delta_to_compact_markdown, delta_to_markdown, expand_style_placeholders,
+    markdown_to_delta, markdown_to_delta_set,
+)
+
+MARKDOWN = (
+    '- <span style="color: #f00; font-size: 16px">**Python**</span> 与 '
+    '<span style="background-color: #ff0">Go</span>\n'
+    '<span style="color: #f00; font-size: 16px">再次</span> 普通'
+)
+
+def _without_ids(delta_set):
+    return [{k: v for k, v in d.items() if k != "id"} for d in delta_set.values()]
+
+def test_placeholders_are_short_and_shared():
+    delta_json = markdown_to_delta(MARKDOWN)
+    compact, styles = delta_to_compact_markdown(delta_json)
+    assert compact == "- <t1>**Python**</t1> 与 <t2>Go</t2>\n\n<t1>再次</t1> 普通"
+    assert styles == {"t1": {"COLOR": "#f00", "SIZE": 16}, "t2": {"BACKGROUND": "#ff0"}}
+    assert len(compact) < len(delta_to_markdown(delta_json)) / 2
+
+def test_round_trip_restores_styling():
+    delta_json = markdown_to_delta(MARKDOWN)
+    compact, styles = delta_to_compact_markdown(delta_json)
+    restored = markdown_to_delta_set(compact, styles=styles)
+    assert _without_ids(restored) == _without_ids(json.loads(delta_json))
+
+    stream = MarkdownDeltaStream(styles=styles)
+    stream.feed(compact)
+    stream.close()
+    assert _without_ids(stream.delta_set) == _without_ids(restored)
+
+def test_unknown_placeholders_are_dropped():
+    assert expand_style_placeholders("<t9>文字</t9> <u>下划线</u>", {}) == "文字 <u>下划线</u>"
+    assert expand_style_placeholders("无标签", {"t1": {"COLOR": "#f00"}}) == "无标签"
+
+if __name__ == "__main__":
+    test_placeholders_are_short_and_shared()
+    test_round_trip_restores_styling()
+    test_unknown_placeholders_are_dropped()
+    print("Test Passed!")
@@ -0,0 +1,45 @@
+import json
+import sys
+import os
+
+# Add backend directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.cache import BoundedLRUCache
+from app.services.format_converter import delta_to_markdown, markdown_to_delta, delta_markdown_cache, delta_cache_key
+
+def test_repeated_context_hits_cache():
+    delta_json = markdown_to_delta("## 技能\n- **Python** 熟练")
+    delta_markdown_cache.clear()
+    before = delta_markdown_cache.stats()
+
+    first = delta_to_markdown(delta_json)
+    second = delta_to_markdown(delta_json)
+    assert first == second
+    stats = delta_markdown_cache.stats()
+    assert stats["misses"] == before["misses"] + 1
+    assert stats["hits"] == before["hits"] + 1
+
+def test_dict_key_is_normalized():
+    delta_set = json.loads(markdown_to_delta("- a\n- b"))
+    reordered = dict(reversed(list(delta_set.items())))
+    assert delta_cache_key(delta_set) == delta_cache_key(reordered)
+    assert delta_to_markdown(delta_set) == delta_to_markdown(reordered) == delta_to_markdown(delta_set, use_cache=False)
+
+def test_cache_is_bounded_by_entries_and_bytes():
+    cache = BoundedLRUCache(max_entries=2, max_bytes=1000, sizeof=len)
+    cache.set("a", "x" * 10)
+    cache.set("b", "x" * 10)
+    cache.get("a")
+    cache.set("c", "x" * 10)  # evicts least recently used "b"
+    assert cache.get("b") is None and cache.get("a") is not None
+    cache.set("d", "x" * 995)  # over the byte cap: evicts until it fits
+    assert len(cache) == 1 and cache.stats()["bytes"] == 995
+    cache.set("e", "x" * 2000)  # larger than the whole cache: not stored
+    assert cache.get("e") is None and cache.stats()["evictions"] == 3
+
+if __name__ == "__main__":
+    test_repeated_context_hits_cache()
+    test_dict_key_is_normalized()
+    test_cache_is_bounded_by_entries_and_bytes()
+    print("Test Passed!")
@@ -0,0 +1,80 @@
+import asyncio
+import sys
+import os
+
+# Add backend directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.conversion_executor import ConversionExecutor, estimate_size
+from app.services.format_converter import markdown_to_delta_set
+
+MARKDOWN = "\n".join(["- **Python** 负责核心模块开发与性能优化"] * 200)
+
+def test_small_inputs_run_inline():
+    executor = ConversionExecutor(max_workers=1, inline_max_chars=100_000)
+    result = asyncio.run(executor.run(markdown_to_delta_set, "- a"))
+    assert len(result) == 1
+    stats = executor.stats()
+    assert stats["inline"] == 1 and stats["offloaded"] == 0 and stats["workers"] == 0
+
+def test_large_inputs_go_to_the_pool():
+    executor = ConversionExecutor(max_workers=2, inline_max_chars=1000)
+    executor.start()
+    try:
+        async def convert_many():
+            return await asyncio.gather(*[executor.run(markdown_to_delta_set, MARKDOWN) for _ in range(4)])
+        results = asyncio.run(convert_many())
+    finally:
+        executor.shutdown()
+    assert all(len(r) == 200 for r in results)
+    stats = executor.stats()
+    assert stats["offloaded"] == 4 and stats["failed"] == 0
+    assert stats["max_in_flight"] == 4 and stats["in_flight"] == 0
+
+def _fail(_):
+    raise ValueError("bad input")
+
+def test_converter_errors_propagate():
+    executor = ConversionExecutor(max_workers=1, inline_max_chars=0)
+    executor.start()
+    try:
+        try:
+            asyncio.run(executor.run(_fail, "x"))
+            assert False, "converter error was swallowed"
+        except ValueError:
+            pass
+        assert executor.stats()["failed"] == 0
+    finally:
+        executor.shutdown()
+
+def test_broken_pool_is_recreated():
+    executor = ConversionExecutor(max_workers=1, inline_max_chars=1000)
+    executor.start()
+    try:
+        broken = executor._pool
+        asyncio.run(executor.run(markdown_to_delta_set, MARKDOWN))
+        for process in list(broken._processes.values()):
+            process.kill()
+            process.join()
+        result = asyncio.run(executor.run(markdown_to_delta_set, MARKDOWN))
+        assert len(result) == 200
+        assert executor._pool is not broken
+        stats = executor.stats()
+        assert stats["failed"] == 1 and stats["inline"] == 0 and stats["offloaded"] == 2
+        # The recreated pool keeps serving later calls
+        assert len(asyncio.run(executor.run(markdown_to_delta_set, MARKDOWN))) == 200
+    finally:
+        executor.shutdown()
+
+def test_estimate_size():
+    assert estimate_size("abc") == 3
+    assert estimate_size({"ops": [{"insert": "ab"}, {"insert": {"image": "x"}}]}) == 2
+    assert estimate_size(markdown_to_delta_set("- a")) > 0
+
+if __name__ == "__main__":
+    test_small_inputs_run_inline()
+    test_large_inputs_go_to_the_pool()
+    test_converter_errors_propagate()
+    test_broken_pool_is_recreated()
+    test_estimate_size()
+    print("Test Passed!")
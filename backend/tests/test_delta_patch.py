@@ -0,0 +1,72 @@
+import json
+import sys
+import os
+
+# Add backend directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.format_converter import (
+    markdown_to_delta, markdown_to_delta_patch, apply_delta_patch, delta_to_markdown, is_text_delta_set,
+)
+
+ORIGINAL = "## 技能\n- **Python** 熟练\n- Java 了解\n- Go 入门\n---\n1. 经历一"
+
+def _ids_by_text(delta_set):
+    ids = {}
+    for delta_id, delta in delta_set.items():
+        text = "".join(c["char"] for c in json.loads(delta["attrs"]["DATA"])[0]["chars"])
+        ids[text] = delta_id
+    return ids
+
+def test_unchanged_document_is_an_empty_patch():
+    previous = json.loads(markdown_to_delta(ORIGINAL))
+    patch = markdown_to_delta_patch(ORIGINAL, previous)
+    assert patch == {"inserted": {}, "updated": {}, "moved": {}, "deleted": []}
+
+def test_only_changed_blocks_are_emitted():
+    previous = json.loads(markdown_to_delta(ORIGINAL))
+    old_ids = _ids_by_text(previous)
+    modified = ORIGINAL.replace("- Java 了解\n", "").replace("- Go 入门", "- Go 熟练")
+    patch = markdown_to_delta_patch(modified, previous)
+
+    # The changed region (Java, Go -> Go) reuses the first old id and deletes the rest
+    assert list(patch["updated"]) == [old_ids["Java 了解"]]
+    assert patch["deleted"] == [old_ids["Go 入门"]]
+    assert patch["inserted"] == {}
+    # Blocks below the removed line move up, unchanged blocks above keep their place
+    assert old_ids["技能"] not in patch["moved"]
+    assert old_ids["经历一"] in patch["moved"]
+
+    full = apply_delta_patch(previous, patch)
+    assert delta_to_markdown(full) == delta_to_markdown(markdown_to_delta(modified))
+    assert _ids_by_text(full)["技能"] == old_ids["技能"]
+
+def test_inserted_lines_get_new_ids_and_push_blocks_down():
+    previous = json.loads(markdown_to_delta(ORIGINAL))
+    old_ids = _ids_by_text(previous)
+    modified = ORIGINAL.replace("- Go 入门", "- Go 入门\n- Rust 学习中")
+    patch = markdown_to_delta_patch(modified, previous)
+    assert len(patch["inserted"]) == 1 and not patch["updated"] and not patch["deleted"]
+    assert patch["moved"][old_ids["经历一"]] > previous[old_ids["经历一"]]["y"]
+
+def test_slate_only_previous_blocks_match_on_inline_content():
+    # Without DATA the previous blocks lose list/size config, headings and list items must still match
+    previous = json.loads(markdown_to_delta(ORIGINAL, delta_format="slate"))
+    assert markdown_to_delta_patch(ORIGINAL, previous, delta_format="slate") == {
+        "inserted": {}, "updated": {}, "moved": {}, "deleted": []
+    }
+    patch = markdown_to_delta_patch(ORIGINAL.replace("- Go 入门", "- Go 熟练"), previous, delta_format="slate")
+    assert len(patch["updated"]) == 1 and not patch["inserted"] and not patch["deleted"]
+
+def test_ops_context_is_not_a_delta_set():
+    assert is_text_delta_set(markdown_to_delta(ORIGINAL))
+    assert not is_text_delta_set({"ops": [{"insert": "a\n"}]})
+    assert not is_text_delta_set("plain text")
+
+if __name__ == "__main__":
+    test_unchanged_document_is_an_empty_patch()
+    test_only_changed_blocks_are_emitted()
+    test_inserted_lines_get_new_ids_and_push_blocks_down()
+    test_slate_only_previous_blocks_match_on_inline_content()
+    test_ops_context_is_not_a_delta_set()
+    print("Test Passed!")
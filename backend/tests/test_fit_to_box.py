@@ -0,0 +1,50 @@
+import sys
+import os
+
+# Add backend directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.fit_to_box import check_fit, compact_markdown, merge_short_bullets, shorten_list_indent
+
+def test_check_fit():
+    report = check_fit("- a\n- b", 300, 42)
+    assert report["fits"] and report["line_count"] == 2 and report["overflow"] == 0
+    report = check_fit("- a\n- b\n- c", 300, 42)
+    assert not report["fits"] and report["overflow"] == 21
+
+def test_local_steps():
+    assert shorten_list_indent("- a\n   - b\n      1. c") == "- a\n- b\n   1. c"
+    assert merge_short_bullets("- Python\n- Go\n- 负责核心模块", 300) == "- Python; Go；负责核心模块"
+    # Bullets that would wrap after merging stay separate
+    long_item = "- " + "字" * 15
+    assert merge_short_bullets(long_item + "\n" + long_item, 300) == long_item + "\n" + long_item
+
+def test_compact_stops_once_it_fits():
+    md = "- Python  \n- Go\n- Rust"
+    compacted, report = compact_markdown(md, 300, 21)
+    assert compacted == "- Python; Go; Rust"
+    assert report["fits"]
+    assert report["steps"] == ["merge_short_bullets"]
+
+    untouched, report = compact_markdown(md, 300, 200)
+    assert untouched == md and report["steps"] == []
+
+def test_compact_reports_remaining_overflow():
+    md = "\n".join(["1. " + "字" * 30] * 5)
+    compacted, report = compact_markdown(md, 300, 42)
+    assert compacted == md
+    assert not report["fits"]
+
+def test_steps_that_do_not_lower_the_height_are_dropped():
+    # Flattening a short nested item changes nothing in the layout
+    md = "- a\n   - b\n" + "\n".join(["1. " + "字" * 30] * 5)
+    compacted, report = compact_markdown(md, 300, 42)
+    assert compacted == md and report["steps"] == []
+
+if __name__ == "__main__":
+    test_check_fit()
+    test_local_steps()
+    test_compact_stops_once_it_fits()
+    test_compact_reports_remaining_overflow()
+    test_steps_that_do_not_lower_the_height_are_dropped()
+    print("Test Passed!")
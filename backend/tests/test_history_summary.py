@@ -0,0 +1,63 @@
+import asyncio
+import sys
+import os
+
+# Add backend directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.history_summary import RollingSummaryStore, prefix_hashes
+
+def _history(n):
+    return [{"role": "user" if i % 2 == 0 else "assistant", "content": f"消息{i}"} for i in range(n)]
+
+def _recording_fold(calls):
+    async def fold(previous, new_messages):
+        calls.append((previous, [m["content"] for m in new_messages]))
+        base = previous + "|" if previous else ""
+        return base + ",".join(m["content"] for m in new_messages)
+    return fold
+
+def test_prefix_hashes_chain():
+    history = _history(4)
+    hashes = prefix_hashes(history)
+    assert len(hashes) == 4 and len(set(hashes)) == 4
+    assert prefix_hashes(history[:2]) == hashes[:2]
+    edited = [dict(history[0], content="改过")] + history[1:]
+    assert not set(prefix_hashes(edited)) & set(hashes)
+
+def test_only_new_messages_are_folded():
+    store = RollingSummaryStore()
+    calls = []
+    fold = _recording_fold(calls)
+
+    first = asyncio.run(store.summarize(_history(5), fold))
+    assert first == "消息0,消息1,消息2,消息3,消息4"
+
+    # Two more messages aged out: only they are folded into the previous summary
+    second = asyncio.run(store.summarize(_history(7), fold))
+    assert calls[-1] == (first, ["消息5", "消息6"])
+    assert second == first + "|消息5,消息6"
+
+    # Same prefix again: served from the cache without calling fold
+    assert asyncio.run(store.summarize(_history(7), fold)) == second
+    assert len(calls) == 2
+    assert store.stats() == {"entries": 2, "exact_hits": 1, "incremental": 1, "full": 1, "folded_messages": 7}
+
+def test_failed_fold_is_not_cached():
+    store = RollingSummaryStore()
+
+    async def broken(previous, new_messages):
+        raise RuntimeError("llm down")
+
+    try:
+        asyncio.run(store.summarize(_history(3), broken))
+        assert False, "expected the fold error to propagate"
+    except RuntimeError:
+        pass
+    assert store.stats()["entries"] == 0
+
+if __name__ == "__main__":
+    test_prefix_hashes_chain()
+    test_only_new_messages_are_folded()
+    test_failed_fold_is_not_cached()
+    print("Test Passed!")
@@ -0,0 +1,62 @@
+import sys
+import os
+
+# Add backend directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.format_converter import TEXT_ATTRS, parse_inline_ast, parse_inline_spans, parse_span_style
+
+def _runs(text, base_config=None):
+    return [(s["text"], s["config"]) for s in parse_inline_spans(text, base_config or {})]
+
+def test_ast_nodes():
+    root = parse_inline_ast("a **b *c* d** [e](https://e.com)")
+    kinds = [c if isinstance(c, str) else c.kind for c in root.children]
+    assert kinds == ["a ", "bold", " ", "link"]
+    bold = root.children[1]
+    assert bold.children[0] == "b "
+    assert bold.children[1].kind == "italic"
+    assert root.children[3].value == "https://e.com"
+
+def test_mis_nested_markers_keep_styles():
+    runs = _runs("*a **b* c**")
+    assert runs == [
+        ("a ", {TEXT_ATTRS["STYLE"]: "italic"}),
+        ("b", {TEXT_ATTRS["WEIGHT"]: "bold", TEXT_ATTRS["STYLE"]: "italic"}),
+        (" c", {TEXT_ATTRS["WEIGHT"]: "bold"}),
+    ]
+
+def test_unclosed_marker_styles_rest_and_stray_close_is_ignored():
+    assert _runs("x **y z") == [("x ", {}), ("y z", {TEXT_ATTRS["WEIGHT"]: "bold"})]
+    assert _runs("a</u>b</span>c") == [("abc", {})]
+
+def test_span_style_declarations():
+    style = dict(parse_span_style('<span style="background-color: #ffff00; font-size: 20px">'))
+    # background-color must not leak into color
+    assert style == {TEXT_ATTRS["BACKGROUND"]: "#ffff00", TEXT_ATTRS["SIZE"]: 20}
+    assert dict(parse_span_style('<font color="red">')) == {TEXT_ATTRS["COLOR"]: "red"}
+
+def test_nested_spans_restore_outer_style():
+    runs = _runs('<span color="#f00"><span style="font-size: 20px">A</span>B</span>C')
+    assert runs == [
+        ("A", {TEXT_ATTRS["COLOR"]: "#f00", TEXT_ATTRS["SIZE"]: 20}),
+        ("B", {TEXT_ATTRS["COLOR"]: "#f00"}),
+        ("C", {}),
+    ]
+
+def test_link_inner_styles_and_base_config():
+    runs = _runs("[链接 **粗**](https://a.com) 后", {TEXT_ATTRS["SIZE"]: 14})
+    assert runs == [
+        ("链接 ", {TEXT_ATTRS["SIZE"]: 14, TEXT_ATTRS["LINK"]: "https://a.com"}),
+        ("粗", {TEXT_ATTRS["SIZE"]: 14, TEXT_ATTRS["WEIGHT"]: "bold", TEXT_ATTRS["LINK"]: "https://a.com"}),
+        (" 后", {TEXT_ATTRS["SIZE"]: 14}),
+    ]
+
+if __name__ == "__main__":
+    test_ast_nodes()
+    test_mis_nested_markers_keep_styles()
+    test_unclosed_marker_styles_rest_and_stray_close_is_ignored()
+    test_span_style_declarations()
+    test_nested_spans_restore_outer_style()
+    test_link_inner_styles_and_base_config()
+    print("Test Passed!")
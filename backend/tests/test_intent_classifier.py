@@ -0,0 +1,35 @@
+import sys
+import os
+
+# Add backend directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.intent_classifier import IntentClassifier, char_ngrams
+from app.services.intent_examples import INTENT_EXAMPLES, labeled_examples
+
+def test_char_ngrams_stay_inside_words():
+    grams = char_ngrams("改写, STAR")
+    assert grams["改写"] == 1 and grams["sta"] == 1
+    assert "写 " not in grams and "写s" not in grams
+
+def test_examples_cover_every_supervisor_intent():
+    assert set(INTENT_EXAMPLES) == {"chat", "modify", "research_consult", "research_modify", "create", "research_create"}
+
+def test_confident_prediction_routes_locally():
+    clf = IntentClassifier(labeled_examples())
+    prediction = clf.route("帮我把这段话润色一下，改得更简洁")
+    assert prediction is not None and prediction["intent"] == "modify"
+    assert prediction["confidence"] >= clf.threshold
+
+def test_unfamiliar_prompt_falls_back():
+    clf = IntentClassifier(labeled_examples())
+    assert clf.route("量子纠缠与黑洞信息悖论") is None
+    assert clf.route("") is None
+    assert clf.stats()["fast_path"] == 0 and clf.stats()["fallback"] == 2
+
+if __name__ == "__main__":
+    test_char_ngrams_stay_inside_words()
+    test_examples_cover_every_supervisor_intent()
+    test_confident_prediction_routes_locally()
+    test_unfamiliar_prompt_falls_back()
+    print("Test Passed!")
@@ -0,0 +1,63 @@
+import json
+import sys
+import os
+
+# Add backend directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.format_converter import MarkdownDeltaStream, markdown_to_delta
+from app.services.json_stream import JsonFieldStream
+
+MARKDOWN = "## 技能\n\n- **Python** (熟练)\n- <u>C++</u>  入门\n---\n1. 负责[核心](https://a.com)模块"
+
+def _without_ids(delta_set):
+    return [{k: v for k, v in d.items() if k != "id"} for d in delta_set.values()]
+
+def _chunks(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+def test_stream_matches_full_conversion():
+    for size in (1, 3, 7, 64):
+        stream = MarkdownDeltaStream()
+        emitted = []
+        for chunk in _chunks(MARKDOWN, size):
+            emitted += stream.feed(chunk)
+        emitted += stream.close()
+        assert stream.text == MARKDOWN
+        assert [d["id"] for d in emitted] == list(stream.delta_set)
+        assert _without_ids(stream.delta_set) == _without_ids(json.loads(markdown_to_delta(MARKDOWN)))
+
+def test_lines_are_emitted_as_soon_as_their_newline_arrives():
+    stream = MarkdownDeltaStream()
+    assert stream.feed("## 技") == []
+    assert len(stream.feed("能\n- a")) == 1
+    assert stream.feed("") == []
+    assert len(stream.close()) == 1
+
+def test_json_field_stream_extracts_fields_from_partial_json():
+    res = {
+        "intention": "modify",
+        "reply": "已为您\"润色\"\\完成 😀",
+        "modified_content": MARKDOWN,
+    }
+    raw = "```json\n" + json.dumps(res, ensure_ascii=True, indent=2) + "\n```"
+    for size in (1, 2, 5, 13):
+        fields = JsonFieldStream(["reply", "modified_content"])
+        got = {}
+        for chunk in _chunks(raw, size):
+            for field, text in fields.feed(chunk):
+                got[field] = got.get(field, "") + text
+        assert got == {"reply": res["reply"], "modified_content": MARKDOWN}
+        assert fields.values == got
+
+def test_json_field_stream_ignores_nested_keys():
+    fields = JsonFieldStream(["reply"])
+    fields.feed('{"meta": {"reply": "inner"}, "reply": "outer"}')
+    assert fields.values == {"reply": "outer"}
+
+if __name__ == "__main__":
+    test_stream_matches_full_conversion()
+    test_lines_are_emitted_as_soon_as_their_newline_arrives()
+    test_json_field_stream_extracts_fields_from_partial_json()
+    test_json_field_stream_ignores_nested_keys()
+    print("Test Passed!")
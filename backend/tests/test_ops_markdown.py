@@ -0,0 +1,36 @@
+import sys
+import os
+
+# Add backend directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.format_converter import _ops_to_markdown, delta_to_markdown
+
+OPS = [
+    {"insert": "Hi "}, {"insert": "bold", "attributes": {"bold": True}}, {"insert": "\n", "attributes": {"header": 2}},
+    {"insert": "a"}, {"insert": "\n", "attributes": {"list": "bullet"}},
+    {"insert": "b"}, {"insert": "\n", "attributes": {"list": "ordered"}},
+    {"insert": "c", "attributes": {"strike": True}}, {"insert": "\n", "attributes": {"list": "ordered"}},
+    {"insert": "x", "attributes": {"link": "https://a.com", "italic": True}}, {"insert": "\n"},
+    {"insert": "d"}, {"insert": "\n", "attributes": {"list": "ordered"}},
+]
+
+def test_block_attributes_prefix_their_line():
+    assert _ops_to_markdown(OPS) == "## Hi **bold**\n- a\n1. b\n2. ~~c~~\n[*x*](https://a.com)\n1. d"
+    assert delta_to_markdown({"ops": OPS}, use_cache=False) == _ops_to_markdown(OPS)
+
+def test_multiline_inserts_and_embeds():
+    ops = [{"insert": "one\ntwo", "attributes": {"bold": True}}, {"insert": {"image": "x.png"}}, {"insert": "\n"}]
+    assert _ops_to_markdown(ops) == "**one**\n**two**"
+
+def test_long_documents():
+    # 2 万 ops 的长文档逐行完整输出；吞吐目标由 evaluation/converter_bench.py 衡量
+    ops = OPS * 1600
+    markdown = _ops_to_markdown(ops)
+    assert markdown.count("\n") == 6 * 1600 - 1
+
+if __name__ == "__main__":
+    test_block_attributes_prefix_their_line()
+    test_multiline_inserts_and_embeds()
+    test_long_documents()
+    print("Test Passed!")
@@ -0,0 +1,121 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services import quality_gate
+
+
+ORIGINAL = "- 负责 **Redis** 缓存设计，QPS 提升 30%\n- 使用 Kafka 解耦订单服务"
+
+
+def test_clean_rewrite_passes():
+    modified = "- 主导 **Redis** 缓存架构设计，QPS 提升 30%\n- 引入 Kafka 解耦订单服务，降低耦合"
+    result = quality_gate.evaluate(modified, ORIGINAL)
+    assert result["decision"] == "pass", result
+    assert result["issues"] == []
+    assert result["score"] == 100
+
+
+def test_broken_markup_fails():
+    result = quality_gate.evaluate("- 主导 **Redis 缓存架构设计，QPS 提升 30%\n- Kafka", ORIGINAL)
+    assert result["decision"] == "fail"
+    assert any(i["check"] == "structure" and i["severity"] == "hard" for i in result["issues"])
+
+    result = quality_gate.evaluate("```markdown\n- Kafka 30%\n```", ORIGINAL)
+    assert result["decision"] == "fail"
+
+
+def test_emoji_fails():
+    result = quality_gate.evaluate("- 🚀 **Redis** 缓存 QPS 提升 30%，使用 Kafka", ORIGINAL)
+    assert result["decision"] == "fail"
+    assert result["issues"][0]["check"] == "no_emoji"
+
+
+def test_resume_symbols_are_soft_and_kept_from_original():
+    # 技能评级、项目符号等 BMP 符号只作疑似问题交给 LLM 判断
+    result = quality_gate.evaluate("- Redis ★★★★☆\n- ➤ Kafka QPS 30%", ORIGINAL)
+    assert result["decision"] == "borderline"
+    assert [i["severity"] for i in result["issues"] if i["check"] == "no_emoji"] == ["soft"]
+    # 原文已有的符号不计
+    original = "- Redis ★★★★☆ QPS 30%\n- Kafka ✓"
+    assert quality_gate.evaluate("- **Redis** ★★★★☆ QPS 30%\n- Kafka ✓", original)["decision"] == "pass"
+    assert quality_gate.evaluate("- 🚀 Redis QPS 30% Kafka", "- 🚀 Redis QPS 30% Kafka")["decision"] == "pass"
+
+
+def test_empty_output_fails():
+    assert quality_gate.evaluate("", ORIGINAL)["decision"] == "fail"
+    assert quality_gate.evaluate("  \n", ORIGINAL)["decision"] == "fail"
+
+
+def test_dropped_facts_are_borderline():
+    result = quality_gate.evaluate("- 主导缓存架构设计\n- 解耦订单服务", ORIGINAL)
+    assert result["decision"] == "borderline"
+    details = " ".join(i["detail"] for i in result["issues"])
+    assert "30%" in details
+    assert "Kafka" in details and "Redis" in details
+
+
+def test_over_bold_is_borderline():
+    text = "**负责公司核心交易系统的整体架构设计与性能优化工作**，保障了业务的稳定运行，支撑日均千万级订单量的处理"
+    result = quality_gate.evaluate(text)
+    assert result["decision"] == "borderline"
+    assert all(i["check"] == "bold" for i in result["issues"])
+
+    # 短文本中的关键词加粗 (如技能清单) 不按占比判定
+    assert quality_gate.evaluate("- 熟悉 **Python**、**Go**")["decision"] == "pass"
+
+
+def test_inline_items_should_be_list():
+    result = quality_gate.evaluate("熟悉 Python；熟悉 Go；熟悉 Docker；熟悉 MySQL")
+    assert result["decision"] == "borderline"
+    assert result["issues"][0]["check"] == "list"
+
+
+def test_fit_uses_block_size():
+    long_text = "\n".join(f"- 第 {i} 条工作内容描述，包含一些细节" for i in range(40))
+    result = quality_gate.evaluate(long_text, block_size={"width": 300, "height": 100})
+    assert result["decision"] == "borderline"
+    assert result["issues"][0]["check"] == "fit"
+    assert quality_gate.evaluate("- 一行", block_size={"width": 300, "height": 100})["decision"] == "pass"
+
+
+def test_stats_count_skipped_llm_calls():
+    quality_gate.decisions.clear()
+    quality_gate.evaluate("- Redis QPS 30% Kafka", ORIGINAL)
+    quality_gate.evaluate("", ORIGINAL)
+    quality_gate.evaluate("- 缓存设计", ORIGINAL)
+    stats = quality_gate.stats()
+    assert (stats["pass"], stats["fail"], stats["borderline"]) == (1, 1, 1)
+    assert stats["llm_skipped_rate"] == round(2 / 3, 4)
+
+
+def test_rank_prefers_pass_then_score():
+    results = [
+        {"decision": "fail", "score": 70},
+        {"decision": "borderline", "score": 80},
+        {"decision": "pass", "score": 100},
+        {"decision": "borderline", "score": 90},
+        {"decision": "pass", "score": 100},
+    ]
+    assert quality_gate.rank(results) == [2, 4, 3, 1, 0]
+
+    # 排序用的检查不计入统计
+    quality_gate.decisions.clear()
+    quality_gate.evaluate("", ORIGINAL, record=False)
+    assert sum(quality_gate.decisions.values()) == 0
+
+
+if __name__ == "__main__":
+    test_clean_rewrite_passes()
+    test_broken_markup_fails()
+    test_emoji_fails()
+    test_resume_symbols_are_soft_and_kept_from_original()
+    test_empty_output_fails()
+    test_dropped_facts_are_borderline()
+    test_over_bold_is_borderline()
+    test_inline_items_should_be_list()
+    test_fit_uses_block_size()
+    test_stats_count_skipped_llm_calls()
+    test_rank_prefers_pass_then_score()
+    print("Test Passed!")
@@ -0,0 +1,99 @@
+import asyncio
+import sys
+import os
+
+# Add backend directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.single_flight import SingleFlight, normalize_text, request_key
+
+def test_request_key_normalizes_whitespace():
+    assert request_key("agent", 1, normalize_text(" 帮我  润色\n这段 ")) == request_key("agent", 1, normalize_text("帮我 润色 这段"))
+    assert request_key("agent", 1, "a") != request_key("agent", 2, "a")
+    assert request_key("web", "a") != request_key("rag", "a")
+
+def test_concurrent_duplicates_share_one_call():
+    async def run():
+        flight = SingleFlight()
+        calls = []
+
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return {"score": 80}
+
+        results = await asyncio.gather(*[flight.do("k", work) for _ in range(3)])
+        # Once finished, the same key runs again (not a cache)
+        again = await flight.do("k", work)
+        return results, again, len(calls), flight.stats()
+
+    results, again, calls, stats = asyncio.run(run())
+    assert results == [{"score": 80}] * 3 and again == {"score": 80}
+    assert calls == 2
+    assert stats["calls"] == 2 and stats["shared_calls"] == 2 and stats["in_flight"] == 0
+
+def test_errors_reach_every_caller():
+    async def run():
+        flight = SingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("search failed")
+
+        return await asyncio.gather(flight.do("k", work), flight.do("k", work), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+def test_stream_is_fanned_out_with_replay():
+    async def run():
+        flight = SingleFlight()
+        started = []
+
+        async def events():
+            started.append(1)
+            for i in range(3):
+                await asyncio.sleep(0.01)
+                yield f"event-{i}"
+
+        async def collect(delay=0.0):
+            await asyncio.sleep(delay)
+            return [e async for e in flight.stream("k", events)]
+
+        # The second subscriber joins after the first event and still receives it
+        results = await asyncio.gather(collect(), collect(delay=0.015))
+        return results, len(started), flight.stats()
+
+    (first, second), started, stats = asyncio.run(run())
+    assert first == second == ["event-0", "event-1", "event-2"]
+    assert started == 1
+    assert stats["streams"] == 1 and stats["shared_streams"] == 1 and stats["coalesced_rate"] == 0.5
+
+def test_work_is_cancelled_when_every_caller_leaves():
+    async def run():
+        flight = SingleFlight()
+        cancelled = []
+
+        async def work():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(1)
+                raise
+
+        caller = asyncio.create_task(flight.do("k", work))
+        await asyncio.sleep(0.01)
+        caller.cancel()
+        await asyncio.sleep(0.01)
+        return cancelled, flight.stats()
+
+    cancelled, stats = asyncio.run(run())
+    assert cancelled == [1] and stats["in_flight"] == 0
+
+if __name__ == "__main__":
+    test_request_key_normalizes_whitespace()
+    test_concurrent_duplicates_share_one_call()
+    test_errors_reach_every_caller()
+    test_stream_is_fanned_out_with_replay()
+    test_work_is_cancelled_when_every_caller_leaves()
+    print("Test Passed!")
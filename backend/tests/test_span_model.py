@@ -0,0 +1,92 @@
+import json
+import sys
+import os
+
+# Add backend directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.format_converter import (
+    TEXT_ATTRS, parse_inline_spans, parse_inline_styles, chars_to_spans, spans_to_chars,
+    markdown_to_lines, markdown_to_delta, markdown_to_delta_set, delta_to_markdown, derive_delta_attrs,
+    decode_rich_text_lines, intern_config,
+)
+
+def test_spans_share_config_per_run():
+    spans = parse_inline_spans("普通 **加粗文字** 结尾", {})
+    assert [s["text"] for s in spans] == ["普通 ", "加粗文字", " 结尾"]
+    assert spans[1]["config"][TEXT_ATTRS["WEIGHT"]] == "bold"
+
+    # The wire codec expands each run without copying its config
+    chars = spans_to_chars(spans)
+    assert len(chars) == len("普通 加粗文字 结尾")
+    assert chars[3]["config"] is chars[4]["config"]
+    assert chars_to_spans(chars) == spans
+
+def test_parse_inline_styles_matches_spans():
+    text = "[链接 **粗**](https://a.com) 与 <u>下划线</u>"
+    chars = parse_inline_styles(text, {})
+    assert "".join(c["char"] for c in chars) == "链接 粗 与 下划线"
+    assert chars_to_spans(chars) == parse_inline_spans(text, {})
+
+def test_markdown_lines_keep_block_keys_out_of_spans():
+    lines = markdown_to_lines("1. **Python** 开发\n\n- 条目")
+    assert len(lines) == 2
+    assert lines[0]["config"][TEXT_ATTRS["ORDERED_LIST_LEVEL"]] == "1"
+    for line in lines:
+        for span in line["spans"]:
+            assert TEXT_ATTRS["ORDERED_LIST_LEVEL"] not in span["config"]
+            assert TEXT_ATTRS["UNORDERED_LIST_LEVEL"] not in span["config"]
+
+def test_round_trip_through_wire_format():
+    markdown_text = "## 技能\n- **Python**  熟练\n1. 负责<u>核心模块</u>开发"
+    delta_set = json.loads(markdown_to_delta(markdown_text))
+    for delta in delta_set.values():
+        rich_text_lines = json.loads(delta["attrs"]["DATA"])
+        slate_lines = json.loads(delta["attrs"]["ORIGIN_DATA"])
+        text = "".join(c["char"] for c in rich_text_lines[0]["chars"])
+        assert text == "".join(leaf["text"] for leaf in slate_lines[0]["children"])
+
+    converted = delta_to_markdown(json.dumps(delta_set))
+    assert "- **Python**  熟练" in converted
+    assert "1. 负责<u>核心模块</u>开发" in converted
+
+def test_single_format_and_derive_on_demand():
+    markdown_text = "- **Python** <u>熟练</u>"
+    full = next(iter(markdown_to_delta_set(markdown_text).values()))
+    data_only = next(iter(markdown_to_delta_set(markdown_text, delta_format="data").values()))
+    slate_only = next(iter(markdown_to_delta_set(markdown_text, delta_format="slate").values()))
+    assert set(data_only["attrs"]) == {"DATA"}
+    assert set(slate_only["attrs"]) == {"ORIGIN_DATA"}
+
+    # DATA -> Slate is lossless; Slate -> DATA keeps the inline marks
+    assert derive_delta_attrs(data_only)["attrs"] == full["attrs"]
+    derived = json.loads(derive_delta_attrs(slate_only, "data")["attrs"]["DATA"])
+    assert "".join(c["char"] for c in derived[0]["chars"]) == "Python 熟练"
+    assert derived[0]["chars"][0]["config"] == {TEXT_ATTRS["WEIGHT"]: "bold"}
+    assert delta_to_markdown({slate_only["id"]: slate_only}) == "**Python** <u>熟练</u>"
+
+def test_configs_are_interned():
+    a = intern_config({"WEIGHT": "bold", "SIZE": 14})
+    assert a is intern_config({"SIZE": 14, "WEIGHT": "bold"})
+    assert a is not intern_config({"WEIGHT": "bold"})
+
+    # The same style in different lines (and in decoded wire data) is one shared object
+    lines = markdown_to_lines("**甲** 乙\n丙 **丁**")
+    assert lines[0]["spans"][0]["config"] is lines[1]["spans"][1]["config"]
+    delta_set = json.loads(markdown_to_delta("**甲** 乙\n丙 **丁**"))
+    decoded = [decode_rich_text_lines(json.loads(d["attrs"]["DATA"]))[0] for d in delta_set.values()]
+    assert decoded[0]["spans"][0]["config"] is decoded[1]["spans"][1]["config"]
+
+    # Equal configs with a different key order still merge into one run
+    chars = [{"char": "a", "config": {"WEIGHT": "bold", "STYLE": "italic"}},
+             {"char": "b", "config": {"STYLE": "italic", "WEIGHT": "bold"}}]
+    assert [s["text"] for s in chars_to_spans(chars)] == ["ab"]
+
+if __name__ == "__main__":
+    test_spans_share_config_per_run()
+    test_parse_inline_styles_matches_spans()
+    test_markdown_lines_keep_block_keys_out_of_spans()
+    test_round_trip_through_wire_format()
+    test_single_format_and_derive_on_demand()
+    test_configs_are_interned()
+    print("Test Passed!")
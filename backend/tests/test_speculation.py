@@ -0,0 +1,57 @@
+import asyncio
+import sys
+import os
+
+# Add backend directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.speculation import SpeculationRegistry
+
+async def _work(result, delay=0.0):
+    await asyncio.sleep(delay)
+    return result
+
+def test_confirmed_route_uses_the_speculative_result():
+    async def run():
+        registry = SpeculationRegistry()
+        run_id = registry.new_run()
+        registry.start(run_id, "research", lambda: _work({"web": "资料"}))
+        registry.start(run_id, "modify", lambda: _work({"reply": "草稿"}, delay=10))
+        # Supervisor picked research: the modify draft is cancelled
+        registry.discard(run_id, ["modify"])
+        assert await registry.take(run_id, "research") == {"web": "资料"}
+        assert await registry.take(run_id, "research") is None
+        await asyncio.sleep(0)
+        return registry.stats()
+
+    stats = asyncio.run(run())
+    assert stats["research"]["hits"] == 1 and stats["research"]["hit_rate"] == 1.0
+    assert stats["modify"]["misses"] == 1 and stats["modify"]["cancelled"] == 1
+    assert stats["modify"]["hit_rate"] == 0.0
+
+def test_failed_speculation_falls_back():
+    async def boom():
+        raise RuntimeError("search down")
+
+    async def run():
+        registry = SpeculationRegistry()
+        run_id = registry.new_run()
+        registry.start(run_id, "research", boom)
+        assert await registry.take(run_id, "research") is None
+        return registry.stats()
+
+    assert asyncio.run(run())["research"]["failed"] == 1
+
+def test_unknown_run_is_a_miss_without_error():
+    async def run():
+        registry = SpeculationRegistry()
+        registry.discard("", ["research"])
+        return await registry.take(None, "modify")
+
+    assert asyncio.run(run()) is None
+
+if __name__ == "__main__":
+    test_confirmed_route_uses_the_speculative_result()
+    test_failed_speculation_falls_back()
+    test_unknown_run_is_a_miss_without_error()
+    print("Test Passed!")
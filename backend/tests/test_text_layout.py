@@ -0,0 +1,58 @@
+import sys
+import os
+
+# Add backend directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services import text_layout
+from app.services.format_converter import markdown_to_delta_set, measure_markdown
+
+def test_glyph_widths():
+    # Full-width CJK is 1em, ASCII is narrower, bold only widens half-width glyphs
+    assert text_layout.measure_text("中文") == 28
+    assert text_layout.measure_text("abc") < text_layout.measure_text("中文")
+    assert text_layout.measure_text("abc", bold=True) > text_layout.measure_text("abc")
+    assert text_layout.measure_text("中", bold=True) == text_layout.measure_text("中")
+    assert text_layout.measure_text("中", size=28) == 28
+    # Astral characters (emoji) count as one full-width glyph
+    assert text_layout.measure_text("😀") == 14
+
+def test_char_wrapping_matches_canvas():
+    layout = text_layout.layout_runs([("中" * 60, 14, False)], 720)
+    assert layout["lines"] == [(0, 51), (51, 60)]
+    assert layout["height"] == 2 * 14 * 1.5
+    # List indent shrinks the available width
+    indented = text_layout.layout_runs([("中" * 50, 14, False)], 720, indent=20)
+    assert indented["line_count"] == 1
+    assert text_layout.layout_runs([("中" * 51, 14, False)], 720, indent=20)["line_count"] == 2
+    # Empty paragraph still takes one default line
+    assert text_layout.layout_runs([], 720)["height"] == 21
+
+def test_line_height_follows_largest_font():
+    layout = text_layout.layout_runs([("a", 14, False), ("B", 24, True)], 720)
+    assert layout["height"] == 36
+
+def test_block_heights():
+    heights = [d["height"] for d in markdown_to_delta_set("# 标题\n- a\n" + "字" * 60).values()]
+    assert heights == [36, 21, 42]
+    # Markup is not measured, only rendered text
+    assert measure_markdown("**" + "字" * 51 + "**", 720)["line_count"] == 1
+    assert measure_markdown("- " + "字" * 51, 720)["line_count"] == 2
+
+def test_dividing_line_height():
+    # The canvas advances a dividing line by DIVIDING_LINE_OFFSET, not a text line
+    assert measure_markdown("a\n---\nb", 720) == {"height": 21 + 6 + 21, "line_count": 2}
+    heights = [d["height"] for d in markdown_to_delta_set("a\n---").values()]
+    assert heights == [21, 10]
+
+def test_box_capacity():
+    assert text_layout.box_capacity(280, 105) == {"lines": 5, "chars_per_line": 20}
+
+if __name__ == "__main__":
+    test_glyph_widths()
+    test_char_wrapping_matches_canvas()
+    test_line_height_follows_largest_font()
+    test_block_heights()
+    test_dividing_line_height()
+    test_box_capacity()
+    print("Test Passed!")
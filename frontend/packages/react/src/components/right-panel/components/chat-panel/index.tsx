@@ -243,6 +243,9 @@ export const ChatPanel: React.FC<ChatPanelProps> = ({ editor, activeState }) =>
             if (!reader) throw new Error("No reader available");
 
             let buffer = "";
+            // 流式回复：token 逐段拼接；attempt 变化 (评估未通过重试) 时重新开始
+            let replyText = "";
+            let replyAttempt = 0;
             
             while (true) {
                 const { done, value } = await reader.read();
@@ -257,9 +260,31 @@ export const ChatPanel: React.FC<ChatPanelProps> = ({ editor, activeState }) =>
                     try {
                         const event = JSON.parse(line);
                         if (event.type === 'status') {
+                            if (replyText) continue;
                             setChatHistory(prev => prev.map(msg => 
                                 msg.id === aiMsgId ? { ...msg, content: `🔄 ${event.content}` } : msg
                             ));
+                        } else if (event.type === 'token') {
+                            const attempt = event.attempt ?? 0;
+                            if (attempt !== replyAttempt) {
+                                replyAttempt = attempt;
+                                replyText = "";
+                            }
+                            replyText += event.content;
+                            const content = replyText;
+                            setChatHistory(prev => prev.map(msg => 
+                                msg.id === aiMsgId ? { ...msg, content } : msg
+                            ));
+                        } else if (event.type === 'delta') {
+                            // 流式 Delta 块暂不在画布上逐块渲染：预览使用 result 中的 modified_data
+                            // (块 id 与 delta 事件一致，后续接入画布时可直接复用)
+                            continue;
+                        } else if (event.type === 'reset') {
+                            // 服务端升级到更强的模型重新生成，丢弃已收到的回复
+                            replyText = "";
+                            setChatHistory(prev => prev.map(msg => 
+                                msg.id === aiMsgId ? { ...msg, content: "" } : msg
+                            ));
                         } else if (event.type === 'result') {
                             const result = event.data;
                             setChatHistory(prev => prev.map(msg => 